@@ -0,0 +1,60 @@
+import contextlib
+import json
+import os
+import tempfile
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode="w", fsync=False):
+    """
+    Open a temporary file next to path and move it over path when the block exits.
+
+    Readers see either the old file or the complete new one. If the block
+    raises, the temporary file is removed and path is left as it was.
+
+    Parameters:
+    path (str): File to replace; its directory must exist
+    mode (str): "w" or "wb"
+    fsync (bool): Flush the data to disk before the rename
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def read_manifest(path):
+    """The JSON manifest at path, or None if there is none yet"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def swap_manifest(path, manifest, replaced_files=()):
+    """
+    Point a snapshot at new data files by replacing its manifest atomically,
+    then unlink replaced_files, the data files of the previous manifest.
+
+    Processes that still map the old files keep them alive until they
+    reopen; unlinking only removes the names.
+    """
+    with atomic_write(path) as f:
+        json.dump(manifest, f)
+    directory = os.path.dirname(path) or "."
+    for file_name in replaced_files:
+        try:
+            os.remove(os.path.join(directory, file_name))
+        except OSError:
+            pass
@@ -0,0 +1,570 @@
+"""
+Latency and throughput benchmark for the scoring API.
+
+Runs entirely offline: Gemini's embed_content is replaced by a deterministic
+stub, and the embedding cache and indexes live in a temporary directory.
+
+    python benchmark.py                              # in-process test client
+    python benchmark.py --mode http --concurrency 8  # local HTTP server, 8 clients
+    python benchmark.py --mode http --base-url http://localhost:5001  # existing server
+    python benchmark.py --output results.json        # save for comparison across commits
+    EMBEDDING_PROVIDER=local python benchmark.py     # offline CPU embeddings, no stub
+
+With --base-url the server's own embedding provider is used, not the stub.
+
+Every mode reads the whole response body, so rank-matches/stream is timed
+until its last chunk has been scored; the server's own request latency
+and Server-Timing for that route stop at the headers.
+"""
+import argparse
+import atexit
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Keep the benchmark, and the startup runs it spawns, away from the real
+# caches, indexes and snapshots, and quiet unless asked
+_workdir = tempfile.mkdtemp(prefix="carbon-bench-")
+atexit.register(shutil.rmtree, _workdir, ignore_errors=True)
+for _name in (
+    "EMBEDDING_CACHE_DIR",
+    "SEMANTIC_INDEX_DIR",
+    "GEO_INDEX_DIR",
+    "SCORE_MATRIX_DIR",
+    "CATALOG_DIR",
+    "EMBEDDING_STORE_DIR",
+    "PROFILE_DIR",
+):
+    os.environ[_name] = os.path.join(_workdir, _name.lower())
+os.environ.pop("METRICS_DIR", None)
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import json_codec  # noqa: E402
+import main  # noqa: E402
+
+
+def _stub_vector(text):
+    seed = int(hashlib.md5(text.encode()).hexdigest(), 16) % (2**32)
+    return np.random.RandomState(seed).randn(768).tolist()
+
+
+def install_stub_embeddings(latency_ms=0.0):
+    """Replace the Gemini call with a deterministic local stub"""
+
+    def embed_content(model, content, task_type=None, **kwargs):
+        if latency_ms:
+            time.sleep(latency_ms / 1000)
+        if isinstance(content, str):
+            return {"embedding": _stub_vector(content)}
+        return {"embedding": [_stub_vector(text) for text in content]}
+
+    main.gemini_client().embed_content = embed_content
+
+
+def build_payloads(candidates):
+    """Request bodies per endpoint; rank-matches and the bulk scorers take `candidates` rows"""
+    rng = np.random.RandomState(0)
+    fundees = [
+        {
+            "id": i,
+            "fundee_description": f"Project {i} restores coastal wetlands and kelp forests to sequester blue carbon.",
+            "fundee_location": [
+                float(rng.uniform(-60, 60)),
+                float(rng.uniform(-180, 180)),
+            ],
+            "fundee_needs": int(rng.randint(10_000, 5_000_000)),
+            "total_credits": int(rng.randint(0, 20_000)),
+            "expected_credits": int(rng.randint(0, 20_000)),
+            "amount_invested": int(rng.randint(0, 2_000_000)),
+        }
+        for i in range(candidates)
+    ]
+    funder = {
+        "funder_description": "We fund ocean-based carbon removal with rigorous MRV.",
+        "funder_location": [37.7749, -122.4194],
+        "funder_capability": 750000,
+    }
+    columns = {
+        key: [fundee[key] for fundee in fundees]
+        for key in ("total_credits", "expected_credits", "amount_invested")
+    }
+    return {
+        "risk-score": {
+            "total_credits": 300,
+            "expected_credits": 1200,
+            "amount_invested": 50000,
+        },
+        "efficiency-score": {
+            "total_credits": 300,
+            "expected_credits": 1200,
+            "amount_invested": 50000,
+        },
+        "impact-score": {"total_credits": 1000},
+        "location-match": {
+            "funder_location": [37.7749, -122.4194],
+            "fundee_location": [37.8719, -122.2585],
+        },
+        "funding-capability-match": {
+            "funder_capability": 750000,
+            "fundee_needs": 500000,
+        },
+        "goal-alignment": {
+            "funder_description": funder["funder_description"],
+            "fundee_description": fundees[0]["fundee_description"],
+        },
+        "rank-matches": {"funder": funder, "fundees": fundees, "top_k": 10},
+        "rank-matches/stream": {
+            "funder": funder,
+            "fundees": fundees,
+            "top_k": 10,
+            "chunk_size": 250,
+        },
+        "cascade-rank-matches": {
+            "funder": funder,
+            "fundees": fundees,
+            "top_k": 10,
+            "max_distance_km": 10000,
+        },
+        "risk-score/bulk": columns,
+        "efficiency-score/bulk": columns,
+        "impact-score/bulk": {"total_credits": columns["total_credits"]},
+        "semantic-search": {
+            "query": "kelp forest restoration",
+            "kind": "fundee",
+            "top_k": 10,
+        },
+    }, fundees
+
+
+def populate_indexes(fundees):
+    """Give semantic search something to search"""
+    descriptions = [fundee["fundee_description"] for fundee in fundees]
+    main.semantic_indexes["fundee"].upsert_many(
+        zip(
+            (fundee["id"] for fundee in fundees),
+            descriptions,
+            main.get_embeddings(descriptions),
+        )
+    )
+
+
+def summarize(latencies, errors, wall_time):
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": len(latencies) / wall_time if wall_time else 0.0,
+        "mean_ms": float(latencies_ms.mean()),
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+    }
+
+
+def run_endpoint(send, endpoint, payload, requests, concurrency, warmup):
+    """Drive one endpoint with `concurrency` clients; send returns the status code"""
+    for _ in range(warmup):
+        send(endpoint, payload)
+
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one_request(_):
+        nonlocal errors
+        start = time.perf_counter()
+        status = send(endpoint, payload)
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if status >= 400:
+                errors += 1
+
+    wall_start = time.perf_counter()
+    if concurrency == 1:
+        for i in range(requests):
+            one_request(i)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(one_request, range(requests)))
+    return summarize(latencies, errors, time.perf_counter() - wall_start)
+
+
+def in_process_sender():
+    client = main.app.test_client()
+
+    def send(endpoint, payload):
+        response = client.post(f"/api/{endpoint}", json=payload)
+        # Streamed bodies are only produced as they are read
+        response.get_data()
+        return response.status_code
+
+    return send
+
+
+def http_sender(base_url):
+    import requests as http
+
+    session_local = threading.local()
+
+    def send(endpoint, payload):
+        session = getattr(session_local, "session", None)
+        if session is None:
+            session = session_local.session = http.Session()
+        return session.post(
+            f"{base_url}/api/{endpoint}", json=payload, timeout=60
+        ).status_code
+
+    return send
+
+
+def start_local_server():
+    """Serve the stubbed app on an ephemeral port in a background thread"""
+    import logging
+
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, main.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def measure_quantization(vectors, queries, top_k=10, seed=0):
+    """
+    Accuracy of the int8 embedding store against exact float64 search.
+
+    Uses clustered synthetic 768-d vectors (a few hundred topics plus noise),
+    so nearest neighbours are meaningful rather than ties between random
+    directions.
+    """
+    rng = np.random.RandomState(seed)
+    centers = rng.randn(max(1, vectors // 20), 768)
+    matrix = centers[rng.randint(len(centers), size=vectors)] + 0.6 * rng.randn(
+        vectors, 768
+    )
+    query_matrix = centers[rng.randint(len(centers), size=queries)] + 0.6 * rng.randn(
+        queries, 768
+    )
+    normalized = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+    float32_rows = normalized.astype(np.float32)
+
+    with tempfile.TemporaryDirectory(dir=_workdir) as directory:
+        store = main.QuantizedEmbeddingStore.write(
+            directory, list(range(vectors)), matrix
+        )
+
+        def rerank(ids):
+            return float32_rows[ids]
+
+        recall, recall_reranked, errors, elapsed = [], [], [], []
+        for query in query_matrix:
+            exact = normalized @ (query / np.linalg.norm(query))
+            expected = set(np.argsort(-exact)[:top_k].tolist())
+
+            start = time.perf_counter()
+            hits = store.search(query, top_k)
+            elapsed.append(time.perf_counter() - start)
+            reranked = store.search(query, top_k, rerank=rerank)
+
+            recall.append(len(expected & {i for i, _ in hits}) / top_k)
+            recall_reranked.append(len(expected & {i for i, _ in reranked}) / top_k)
+            errors.extend(abs(score - exact[i]) for i, score in hits)
+
+        return {
+            "vectors": vectors,
+            "queries": queries,
+            "top_k": top_k,
+            f"recall_at_{top_k}": float(np.mean(recall)),
+            f"recall_at_{top_k}_reranked": float(np.mean(recall_reranked)),
+            "max_abs_similarity_error": float(np.max(errors)),
+            "mean_abs_similarity_error": float(np.mean(errors)),
+            "bytes_per_vector": store.nbytes / vectors,
+            "float64_bytes_per_vector": 768 * 8,
+            "p50_search_ms": float(np.percentile(elapsed, 50) * 1000),
+        }
+
+
+def _best_ms(function, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def measure_codec(candidates, repeats=5):
+    """
+    Request/response codec cost on a rank-matches call returning every candidate.
+
+    Times decoding the request and encoding the response with the standard
+    library, orjson and MessagePack, then whole in-process requests under
+    each. Mission alignment is switched off for the requests so embedding
+    lookups do not drown out the codec.
+    """
+    from flask.json.provider import DefaultJSONProvider
+
+    payloads, _ = build_payloads(candidates)
+    payload = {
+        **payloads["rank-matches"],
+        "top_k": None,
+        "weights": {"mission_alignment": 0},
+    }
+    response = {
+        "success": True,
+        "matches": main.rank_matches(
+            payload["funder"], payload["fundees"], payload["weights"]
+        ),
+        "count": candidates,
+    }
+
+    stdlib_request = json.dumps(payload)
+    codecs = {
+        "stdlib": (
+            lambda: json.loads(stdlib_request),
+            lambda: json.dumps(response, sort_keys=True, separators=(",", ":")),
+        ),
+    }
+    if json_codec.orjson is not None:
+        codecs["orjson"] = (
+            lambda: json_codec.loads(stdlib_request),
+            lambda: json_codec.dumps(response),
+        )
+    if json_codec.msgpack_available():
+        msgpack_request = json_codec.msgpack_dumps(payload)
+        codecs["msgpack"] = (
+            lambda: json_codec.msgpack_loads(msgpack_request),
+            lambda: json_codec.msgpack_dumps(response),
+        )
+
+    results = {"candidates": candidates, "codecs": {}, "requests": {}}
+    for name, (decode, encode) in codecs.items():
+        results["codecs"][name] = {
+            "decode_ms": _best_ms(decode, repeats),
+            "encode_ms": _best_ms(encode, repeats),
+            "response_bytes": len(encode()),
+        }
+
+    client = main.app.test_client()
+    provider = main.app.json
+    msgpack_headers = {
+        "Content-Type": "application/msgpack",
+        "Accept": "application/msgpack",
+    }
+    variants = {
+        "stdlib": (DefaultJSONProvider(main.app), {"json": payload}),
+        "fast": (main.FastJSONProvider(main.app), {"json": payload}),
+    }
+    if json_codec.msgpack_available():
+        variants["msgpack"] = (
+            provider,
+            {"data": json_codec.msgpack_dumps(payload), "headers": msgpack_headers},
+        )
+    try:
+        for name, (json_provider, kwargs) in variants.items():
+            main.app.json = json_provider
+
+            def send():
+                reply = client.post("/api/rank-matches", **kwargs)
+                assert reply.status_code == 200, reply.status_code
+
+            results["requests"][name] = {"best_ms": _best_ms(send, repeats)}
+    finally:
+        main.app.json = provider
+    return results
+
+
+# New workers should be able to serve well within this
+STARTUP_BUDGET_MS = 1000
+
+_STARTUP_SCRIPT = """
+import time
+start = time.perf_counter()
+import main
+main.create_app()
+print((time.perf_counter() - start) * 1000)
+"""
+
+
+def measure_startup(runs):
+    """
+    Time from `import main` to create_app() returning, in fresh interpreters.
+
+    Warm-up is disabled in the child so only the time until the app can
+    serve is measured; with the default background warm-up, the lazily
+    imported libraries load after that point.
+    """
+    env = dict(os.environ, WARM_UP="off")
+    ready_ms = []
+    for _ in range(runs):
+        output = subprocess.check_output(
+            [sys.executable, "-c", _STARTUP_SCRIPT],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env=env,
+            text=True,
+            stderr=subprocess.DEVNULL,
+        )
+        ready_ms.append(float(output.strip().splitlines()[-1]))
+    return {
+        "runs": runs,
+        "budget_ms": STARTUP_BUDGET_MS,
+        "ready_ms": ready_ms,
+        "median_ms": float(np.median(ready_ms)),
+        "within_budget": float(np.median(ready_ms)) <= STARTUP_BUDGET_MS,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            text=True,
+            stderr=subprocess.DEVNULL,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--mode", choices=["inprocess", "http"], default="inprocess")
+    parser.add_argument(
+        "--base-url", help="benchmark an already running server (http mode)"
+    )
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument(
+        "--requests", type=int, default=200, help="requests per endpoint"
+    )
+    parser.add_argument(
+        "--warmup", type=int, default=5, help="unmeasured requests per endpoint"
+    )
+    parser.add_argument(
+        "--candidates", type=int, default=1000, help="fundees per rank-matches call"
+    )
+    parser.add_argument(
+        "--embedding-latency-ms",
+        type=float,
+        default=0.0,
+        help="simulated provider latency",
+    )
+    parser.add_argument("--endpoints", nargs="*", help="subset of endpoints to run")
+    parser.add_argument(
+        "--quantization-vectors",
+        type=int,
+        default=20000,
+        help="vectors for the int8 store accuracy check (0 to skip)",
+    )
+    parser.add_argument(
+        "--codec-candidates",
+        type=int,
+        default=10000,
+        help="candidates in the JSON/MessagePack codec comparison (0 to skip)",
+    )
+    parser.add_argument(
+        "--startup-runs",
+        type=int,
+        default=3,
+        help="cold starts to time (0 to skip)",
+    )
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    startup = None
+    if args.startup_runs:
+        startup = measure_startup(args.startup_runs)
+        print(
+            f"{'startup':28s} median {startup['median_ms']:8.1f} ms  "
+            f"budget {startup['budget_ms']} ms  "
+            f"{'ok' if startup['within_budget'] else 'OVER BUDGET'}"
+        )
+
+    quantization = None
+    if args.quantization_vectors:
+        quantization = measure_quantization(args.quantization_vectors, queries=100)
+        print(
+            f"{'int8 store':28s} recall@10 {quantization['recall_at_10']:.3f}  "
+            f"reranked {quantization['recall_at_10_reranked']:.3f}  "
+            f"max error {quantization['max_abs_similarity_error']:.4f}  "
+            f"{quantization['bytes_per_vector']:.0f} B/vector"
+        )
+
+    payloads, fundees = build_payloads(args.candidates)
+    endpoints = args.endpoints or list(payloads)
+
+    server = None
+    if args.base_url:
+        send = http_sender(args.base_url.rstrip("/"))
+    else:
+        if main.embedding_provider.name == "gemini":
+            install_stub_embeddings(args.embedding_latency_ms)
+        populate_indexes(fundees)
+        if args.mode == "http":
+            server, base_url = start_local_server()
+            send = http_sender(base_url)
+        else:
+            send = in_process_sender()
+
+    codec = None
+    if args.codec_candidates and not args.base_url:
+        codec = measure_codec(args.codec_candidates)
+        for name, stats in codec["requests"].items():
+            print(
+                f"{'codec ' + name:28s} rank-matches x{codec['candidates']} "
+                f"{stats['best_ms']:8.1f} ms"
+            )
+
+    results = {}
+    try:
+        for endpoint in endpoints:
+            stats = run_endpoint(
+                send,
+                endpoint,
+                payloads[endpoint],
+                args.requests,
+                args.concurrency,
+                args.warmup,
+            )
+            results[endpoint] = stats
+            print(
+                f"{endpoint:28s} {stats['throughput_rps']:9.1f} req/s  "
+                f"p50 {stats['p50_ms']:8.2f} ms  p95 {stats['p95_ms']:8.2f} ms  "
+                f"p99 {stats['p99_ms']:8.2f} ms  errors {stats['errors']}"
+            )
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "mode": "http" if args.base_url else args.mode,
+        "base_url": args.base_url,
+        "concurrency": args.concurrency,
+        "requests_per_endpoint": args.requests,
+        "candidates": args.candidates,
+        "embedding_provider": main.embedding_provider.name,
+        "embedding_latency_ms": args.embedding_latency_ms,
+        "startup": startup,
+        "quantization": quantization,
+        "codec": codec,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    return report
+
+
+if __name__ == "__main__":
+    main_cli(sys.argv[1:])
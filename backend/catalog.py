@@ -0,0 +1,191 @@
+import json
+import os
+import uuid
+
+import numpy as np
+
+from atomic_files import read_manifest, swap_manifest
+
+KINDS = ("fundee", "funder")
+
+# Numeric profile fields stored as float64 .npy columns (NaN when missing);
+# everything else (descriptions, names, stages, lists) goes in the manifest
+NUMERIC_COLUMNS = {
+    "fundee": (
+        "fundee_needs",
+        "total_credits",
+        "expected_credits",
+        "amount_invested",
+    ),
+    "funder": ("funder_capability",),
+}
+LOCATION_COLUMNS = {"fundee": "fundee_location", "funder": "funder_location"}
+
+
+class Catalog:
+    """
+    Read-only columnar snapshot of the seed funders and fundees.
+
+    Written by ingest.py from the archive datasets. Each kind has an
+    embedding matrix and one .npy file per numeric column, all
+    memory-mapped, plus text columns, source ids and content hashes in a
+    JSON manifest. Rows are in the fundee/funder profile schema used by
+    rank_matches, so ranking against the catalog needs no spreadsheet
+    parsing and no embedding calls for the candidates.
+
+    write() puts new files next to the old ones and swaps the manifest
+    atomically, so readers never see a half-written snapshot.
+    """
+
+    MANIFEST = "manifest.json"
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, self.MANIFEST)) as f:
+            manifest = json.load(f)
+        self.sources = manifest["sources"]
+        self._tables = {}
+        for kind in KINDS:
+            table = manifest["kinds"][kind]
+            arrays = {
+                name: self._load(file_name)
+                for name, file_name in table["files"].items()
+            }
+            self._tables[kind] = {**table, "arrays": arrays}
+        self._profiles = {}
+
+    def _load(self, file_name):
+        return np.load(os.path.join(self.directory, file_name), mmap_mode="r")
+
+    @classmethod
+    def open(cls, directory):
+        """The snapshot in directory, or None if nothing has been ingested there"""
+        if not os.path.exists(os.path.join(directory, cls.MANIFEST)):
+            return None
+        return cls(directory)
+
+    def __len__(self):
+        return sum(len(table["ids"]) for table in self._tables.values())
+
+    def ids(self, kind):
+        return self._tables[kind]["ids"]
+
+    def hashes(self, kind):
+        return self._tables[kind]["hashes"]
+
+    def embeddings(self, kind):
+        """Memory-mapped (rows, dimensions) float32 embeddings of the descriptions"""
+        return self._tables[kind]["arrays"]["embeddings"]
+
+    def profiles(self, kind):
+        """Rows of kind as profile dicts, with id set to the source id"""
+        if kind in self._profiles:
+            return self._profiles[kind]
+
+        table = self._tables[kind]
+        arrays = table["arrays"]
+        location = arrays["location"]
+        profiles = []
+        for row, item_id in enumerate(table["ids"]):
+            profile = {"id": item_id}
+            for name, values in table["text"].items():
+                profile[name] = values[row]
+            for name in NUMERIC_COLUMNS[kind]:
+                value = float(arrays[name][row])
+                profile[name] = None if np.isnan(value) else value
+            lat, lon = location[row]
+            profile[LOCATION_COLUMNS[kind]] = (
+                None if np.isnan(lat) else [float(lat), float(lon)]
+            )
+            profiles.append(profile)
+        self._profiles[kind] = profiles
+        return profiles
+
+    def stats(self):
+        return {
+            "directory": self.directory,
+            "sources": self.sources,
+            **{f"{kind}s": len(table["ids"]) for kind, table in self._tables.items()},
+            "bytes": sum(
+                array.nbytes
+                for table in self._tables.values()
+                for array in table["arrays"].values()
+            ),
+        }
+
+    @classmethod
+    def write(cls, directory, rows, sources, dimensions):
+        """
+        Write a new snapshot and open it.
+
+        Parameters:
+        directory (str): Snapshot directory, created if needed
+        rows (dict): kind -> list of (source id, content hash, profile, embedding)
+        sources (dict): Per-source metadata recorded in the manifest
+        dimensions (int): Embedding dimensions, for kinds with no rows
+        """
+        os.makedirs(directory, exist_ok=True)
+        manifest_path = os.path.join(directory, cls.MANIFEST)
+        previous = read_manifest(manifest_path)
+
+        token = uuid.uuid4().hex[:12]
+        manifest = {"sources": sources, "kinds": {}}
+        for kind in KINDS:
+            kind_rows = rows.get(kind, [])
+            profiles = [profile for _, _, profile, _ in kind_rows]
+            numeric = set(NUMERIC_COLUMNS[kind]) | {LOCATION_COLUMNS[kind]}
+            text_names = sorted(
+                {name for profile in profiles for name in profile} - numeric - {"id"}
+            )
+
+            arrays = {
+                "embeddings": (
+                    np.vstack([embedding for *_, embedding in kind_rows]).astype(
+                        np.float32
+                    )
+                    if kind_rows
+                    else np.zeros((0, dimensions), dtype=np.float32)
+                ),
+                "location": np.array(
+                    [
+                        profile.get(LOCATION_COLUMNS[kind]) or [np.nan, np.nan]
+                        for profile in profiles
+                    ],
+                    dtype=np.float64,
+                ).reshape(len(profiles), 2),
+            }
+            # NaN marks a missing value, which the scores default differently from 0
+            for name in NUMERIC_COLUMNS[kind]:
+                arrays[name] = np.array(
+                    [
+                        np.nan if profile.get(name) is None else profile[name]
+                        for profile in profiles
+                    ],
+                    dtype=np.float64,
+                )
+
+            files = {}
+            for name, array in arrays.items():
+                files[name] = f"{kind}-{name}-{token}.npy"
+                np.save(os.path.join(directory, files[name]), array)
+
+            manifest["kinds"][kind] = {
+                "ids": [source_id for source_id, *_ in kind_rows],
+                "hashes": [content_hash for _, content_hash, *_ in kind_rows],
+                "text": {
+                    name: [profile.get(name) for profile in profiles]
+                    for name in text_names
+                },
+                "files": files,
+            }
+
+        swap_manifest(
+            manifest_path,
+            manifest,
+            [
+                file_name
+                for table in (previous["kinds"].values() if previous else ())
+                for file_name in table["files"].values()
+            ],
+        )
+        return cls(directory)
@@ -0,0 +1,196 @@
+import contextlib
+import fcntl
+import json
+import os
+import threading
+
+from atomic_files import atomic_write
+
+# Logs are compacted once they hold this many records and more than
+# COMPACT_RATIO times the store's live entries
+COMPACT_MIN_RECORDS = 1000
+COMPACT_RATIO = 2
+
+
+class ChangeLog:
+    """
+    Append-only JSON-lines log of the changes to one store.
+
+    Every process serving the store (each gunicorn worker) keeps its own
+    in-memory copy and replays the log to keep it current. Writers append
+    under an exclusive flock on a sidecar lock file, and every process
+    reads the records added since its last read before it serves from its
+    copy, so all copies apply the same changes in the same order, and a
+    change costs one appended line rather than a rewrite of the store.
+
+    Once replayed records far outnumber the live entries, compact() swaps
+    in a log holding just the live entries; other processes notice the new
+    file on their next read and replay it from the start.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock_path = path + ".lock"
+        self._file_id = None
+        self._offset = 0
+        # Records in the current file up to the read offset
+        self.records = 0
+
+    @contextlib.contextmanager
+    def locked(self):
+        """Hold off writers in every process for the duration of the block"""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def read(self):
+        """
+        Records appended since the last read.
+
+        Returns:
+        tuple: (records, reset). reset is True when this is the first read
+            or the log was compacted or removed since the last one; records
+            then holds the whole log, to be replayed on an empty store.
+        """
+        return self._read(advance=True)
+
+    def peek(self):
+        """What read() would return now, without marking anything as read"""
+        return self._read(advance=False)
+
+    def _read(self, advance):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            reset = self._file_id is not None
+            if advance:
+                self._file_id, self._offset, self.records = None, 0, 0
+            return [], reset
+        if (stat.st_dev, stat.st_ino) == self._file_id and (
+            stat.st_size == self._offset
+        ):
+            return [], False
+
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return self._read(advance)
+        with f:
+            # The file opened is the authority; it may have been replaced
+            # since the stat above
+            stat = os.fstat(f.fileno())
+            file_id = (stat.st_dev, stat.st_ino)
+            reset = file_id != self._file_id or stat.st_size < self._offset
+            offset = 0 if reset else self._offset
+            f.seek(offset)
+            data = f.read()
+
+        # A writer may be part way through a line; it is read next time
+        end = data.rfind(b"\n") + 1
+        records = [json.loads(line) for line in data[:end].splitlines() if line]
+        if not advance:
+            return records, reset
+        self._file_id = file_id
+        self._offset = offset + end
+        self.records = (0 if reset else self.records) + len(records)
+        return records, reset
+
+    def append(self, records):
+        """
+        Append records; call within locked(), after read().
+
+        The log then holds nothing this process has not seen, so the
+        appended records count as read here.
+        """
+        data = b"".join(json.dumps(record).encode() + b"\n" for record in records)
+        with open(self.path, "ab") as f:
+            f.write(data)
+            f.flush()
+            stat = os.fstat(f.fileno())
+        self._file_id = (stat.st_dev, stat.st_ino)
+        self._offset = stat.st_size
+        self.records += len(records)
+
+    def needs_compaction(self, live_entries):
+        return self.records >= max(COMPACT_MIN_RECORDS, COMPACT_RATIO * live_entries)
+
+    def compact(self, records):
+        """
+        Replace the log with records, the live entries; call within locked(),
+        after read()
+        """
+        with atomic_write(self.path, "wb", fsync=True) as f:
+            for record in records:
+                f.write(json.dumps(record).encode() + b"\n")
+        # Writers are held off, so the file is still the one just written
+        stat = os.stat(self.path)
+        self._file_id = (stat.st_dev, stat.st_ino)
+        self._offset = stat.st_size
+        self.records = len(records)
+
+
+class LoggedStore:
+    """
+    Base for in-memory stores kept in step across processes by a ChangeLog.
+
+    Subclasses keep their state under self._lock and implement __len__,
+    _clear(), _replay(records) and _live_records(), the records that
+    recreate the current state. Mutators run inside _writing(), which
+    catches up with the log first, and pass their records to _log_records()
+    as they apply them. Readers call sync() before serving. Subclasses with
+    slow replays can override sync() to do that work on peek()ed records
+    before calling it, outside every lock. Without a log_path the store is
+    in-memory only.
+    """
+
+    def __init__(self, log_path=None):
+        self._log = ChangeLog(log_path) if log_path else None
+        self._lock = threading.RLock()
+
+    def sync(self):
+        """
+        Replay changes logged by other processes since the last call.
+
+        Returns:
+        int: Change records applied
+        """
+        if self._log is None:
+            return 0
+        with self._lock:
+            records, reset = self._log.read()
+            if reset:
+                self._clear()
+            if records:
+                self._replay(records)
+            return len(records)
+
+    def load(self):
+        """Replay the whole change log; returns the number of live entries"""
+        self.sync()
+        with self._lock:
+            return len(self)
+
+    @contextlib.contextmanager
+    def _writing(self):
+        """Hold off writers in this and every other process, after catching up"""
+        if self._log is None:
+            with self._lock:
+                yield
+            return
+        # Most of the catching up happens before the file lock is taken, so
+        # a slow replay does not hold up writers in other processes
+        self.sync()
+        with self._lock:
+            with self._log.locked():
+                LoggedStore.sync(self)
+                yield
+                if self._log.needs_compaction(len(self)):
+                    self._log.compact(self._live_records())
+
+    def _log_records(self, records):
+        if self._log is not None and records:
+            self._log.append(records)
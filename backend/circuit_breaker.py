@@ -0,0 +1,101 @@
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for a remote dependency.
+
+    Closed: every call is allowed. After failure_threshold consecutive
+    failures the breaker trips to open, and for cooldown seconds no call is
+    allowed, so callers can fall back immediately instead of waiting out a
+    network timeout. Once the cooldown has passed the breaker is half-open:
+    a single probe call is let through. A successful probe closes the
+    breaker; a failed one reopens it for another cooldown.
+    """
+
+    def __init__(self, failure_threshold=5, cooldown=30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self.trips = 0
+        self.successes = 0
+        self.failures = 0
+        self.rejected = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+            self._state = HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def allow(self):
+        """True if the caller may call the dependency; it must then record the outcome"""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        """Returns True if this success closed an open breaker"""
+        with self._lock:
+            self.successes += 1
+            self._consecutive_failures = 0
+            recovered = self._state != CLOSED
+            self._state = CLOSED
+            self._probe_in_flight = False
+            return recovered
+
+    def record_failure(self):
+        """Returns True if this failure tripped the breaker open"""
+        with self._lock:
+            self.failures += 1
+            self._consecutive_failures += 1
+            if self._state == HALF_OPEN or (
+                self._state == CLOSED
+                and self._consecutive_failures >= self.failure_threshold
+            ):
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+                self.trips += 1
+                return True
+            return False
+
+    def stats(self):
+        with self._lock:
+            state = self._current_state()
+            retry_in = (
+                max(0.0, self.cooldown - (time.monotonic() - self._opened_at))
+                if state == OPEN
+                else 0.0
+            )
+            return {
+                "state": state,
+                "failure_threshold": self.failure_threshold,
+                "cooldown_seconds": self.cooldown,
+                "consecutive_failures": self._consecutive_failures,
+                "retry_in_seconds": retry_in,
+                "trips": self.trips,
+                "successes": self.successes,
+                "failures": self.failures,
+                "rejected": self.rejected,
+            }
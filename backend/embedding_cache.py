@@ -0,0 +1,106 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from atomic_files import atomic_write
+
+
+def embedding_key(model, task_type, text):
+    """Content address for an embedding: a hash of everything that determines it"""
+    payload = "\0".join([model, task_type or "", text])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache.
+
+    A bounded in-process LRU sits in front of an on-disk store that survives
+    restarts. Disk entries are stored as one .npy file per key, sharded by the
+    first two hex digits of the key, and written atomically so concurrent
+    workers never read a partial file.
+
+    Only real provider embeddings should be put here; callers are responsible
+    for not caching fallback vectors.
+    """
+
+    def __init__(self, cache_dir=None, max_entries=4096):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.npy")
+
+    def _remember(self, key, embedding):
+        """Insert into the LRU tier, evicting the least recently used entries"""
+        with self._lock:
+            self._memory[key] = embedding
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                self.evictions += 1
+
+    def get(self, key):
+        """Return the cached embedding for key, or None on a miss"""
+        with self._lock:
+            embedding = self._memory.get(key)
+            if embedding is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return embedding
+
+        if self.cache_dir:
+            try:
+                embedding = np.load(self._path(key))
+            except (OSError, ValueError):
+                embedding = None
+            if embedding is not None:
+                embedding.setflags(write=False)
+                self._remember(key, embedding)
+                with self._lock:
+                    self.disk_hits += 1
+                return embedding
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, embedding):
+        """Store a real embedding in both tiers"""
+        embedding = np.array(embedding)
+        embedding.setflags(write=False)
+        self._remember(key, embedding)
+
+        if self.cache_dir:
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            try:
+                with atomic_write(path, "wb") as f:
+                    np.save(f, embedding)
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "memory_entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,226 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# google.generativeai and sklearn take about a second each to import, so they
+# are imported on first use rather than when the API process starts
+_genai = None
+_genai_api_key = None
+_genai_lock = threading.Lock()
+
+
+def configure_gemini(api_key):
+    """Set the Gemini API key; the client library itself is loaded on first use"""
+    global _genai_api_key
+    with _genai_lock:
+        _genai_api_key = api_key
+        if _genai is not None:
+            _genai.configure(api_key=api_key)
+
+
+def gemini_client():
+    """The configured google.generativeai module, imported on first call"""
+    global _genai
+    if _genai is None:
+        with _genai_lock:
+            if _genai is None:
+                import google.generativeai as genai  # type: ignore
+
+                genai.configure(api_key=_genai_api_key)
+                _genai = genai
+    return _genai
+
+
+def reset_gemini_client():
+    """Drop Gemini clients created before a fork; gRPC channels do not survive it"""
+    global _genai_lock
+    # A parent thread may have held the lock when the process forked
+    _genai_lock = threading.Lock()
+    with _genai_lock:
+        if _genai is not None:
+            # configure() discards every cached client
+            _genai.configure(api_key=_genai_api_key)
+
+
+class EmbeddingProvider:
+    """
+    Interface every embedding backend implements.
+
+    model and task_type identify the vector space and are part of the
+    embedding cache key, so switching providers never serves vectors from
+    another provider's space. embed() takes at most batch_size texts.
+    """
+
+    name = None
+    model = None
+    task_type = None
+    dimensions = 768
+    batch_size = 100
+
+    def embed(self, texts):
+        """
+        Parameters:
+        texts (list): Strings to embed, at most batch_size of them
+
+        Returns:
+        list: One vector per text, in input order
+        """
+        raise NotImplementedError
+
+    def warm_up(self):
+        """Load libraries and models ahead of the first request"""
+
+    def after_fork(self):
+        """Rebuild per-process state (clients, pools) in a forked worker"""
+
+    def queue_depth(self):
+        """Work waiting for the provider's own threads, if it has any"""
+        return 0
+
+
+class GeminiEmbeddingProvider(EmbeddingProvider):
+    """Google Gemini embeddings over the network"""
+
+    name = "gemini"
+
+    def __init__(
+        self,
+        model="models/embedding-001",
+        task_type="retrieval_document",
+        batch_size=100,
+    ):
+        self.model = model
+        self.task_type = task_type
+        # Gemini's batchEmbedContents accepts at most 100 requests per call
+        self.batch_size = min(batch_size, 100)
+
+    def embed(self, texts):
+        response = gemini_client().embed_content(
+            model=self.model, content=list(texts), task_type=self.task_type
+        )
+        vectors = response["embedding"]
+        if len(vectors) != len(texts):
+            raise ValueError(
+                f"Expected {len(texts)} embeddings, received {len(vectors)}"
+            )
+        return vectors
+
+    def warm_up(self):
+        gemini_client()
+
+    def after_fork(self):
+        reset_gemini_client()
+
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """
+    Local CPU embeddings from hashed word and character n-grams.
+
+    Word unigrams/bigrams and character 3-5 grams are hashed into the same
+    `dimensions` signed buckets, which acts as a fixed random projection of
+    their TF counts: no vocabulary to fit, no model download, and the same
+    text always maps to the same unit vector. Texts that share words or word
+    fragments score high cosine similarity, which keeps alignment scores
+    meaningful offline, if less semantic than a trained model.
+
+    Each embed() call of up to batch_size texts is split into chunks of
+    chunk_size that are vectorized on a small worker pool, so latency grows
+    with the batch in predictable steps and one big request cannot occupy
+    more than `workers` threads.
+    """
+
+    name = "local"
+    model = "local/hashing-ngrams-v1"
+    task_type = None
+
+    def __init__(self, dimensions=768, batch_size=1024, chunk_size=128, workers=2):
+        self.dimensions = dimensions
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self._vectorizers = None
+        self._lock = threading.Lock()
+        self._executor = self._make_executor()
+
+    def _make_executor(self):
+        return ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="local-embedding"
+        )
+
+    def warm_up(self):
+        if self._vectorizers is None:
+            with self._lock:
+                if self._vectorizers is None:
+                    self._vectorizers = self._make_vectorizers()
+
+    def _make_vectorizers(self):
+        from sklearn.feature_extraction.text import HashingVectorizer  # type: ignore
+
+        words = HashingVectorizer(
+            n_features=self.dimensions,
+            ngram_range=(1, 2),
+            stop_words="english",
+            norm="l2",
+        )
+        chars = HashingVectorizer(
+            n_features=self.dimensions,
+            analyzer="char_wb",
+            ngram_range=(3, 5),
+            norm="l2",
+        )
+        return words, chars
+
+    def _vectorize(self, texts):
+        from sklearn.preprocessing import normalize  # type: ignore
+
+        self.warm_up()
+        words, chars = self._vectorizers
+        features = words.transform(texts) + chars.transform(texts)
+        return normalize(features).toarray().astype(np.float32)
+
+    def embed(self, texts):
+        texts = list(texts)
+        chunks = [
+            texts[start : start + self.chunk_size]
+            for start in range(0, len(texts), self.chunk_size)
+        ]
+        if len(chunks) <= 1:
+            return list(self._vectorize(texts)) if texts else []
+        return [
+            vector
+            for matrix in self._executor.map(self._vectorize, chunks)
+            for vector in matrix
+        ]
+
+    def after_fork(self):
+        # Pool threads do not survive fork, but the executor would still count them
+        self._executor = self._make_executor()
+
+    def queue_depth(self):
+        return self._executor._work_queue.qsize()
+
+
+def create_embedding_provider(name=None):
+    """
+    Build the provider selected by name (default: EMBEDDING_PROVIDER, else gemini).
+
+    Parameters:
+    name (str): "gemini" or "local"
+
+    Returns:
+    EmbeddingProvider: The configured provider
+    """
+    name = (name or os.getenv("EMBEDDING_PROVIDER", "gemini")).lower()
+    if name == "gemini":
+        return GeminiEmbeddingProvider(
+            batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "100")),
+        )
+    if name == "local":
+        return HashingEmbeddingProvider(
+            batch_size=int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", "1024")),
+            chunk_size=int(os.getenv("LOCAL_EMBEDDING_CHUNK_SIZE", "128")),
+            workers=int(os.getenv("LOCAL_EMBEDDING_WORKERS", "2")),
+        )
+    raise ValueError(f"Unknown embedding provider: {name}")
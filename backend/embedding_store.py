@@ -0,0 +1,199 @@
+import fcntl
+import json
+import os
+import uuid
+
+import numpy as np
+
+from atomic_files import read_manifest, swap_manifest
+from top_k import top_indices
+
+
+def quantize_int8(matrix):
+    """
+    Symmetric per-row int8 quantization.
+
+    Returns:
+    tuple: (int8 codes, float32 scales) with matrix ~= codes * scales[:, None]
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    scales = np.abs(matrix).max(axis=1) / 127 if len(matrix) else np.zeros(0)
+    scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+    codes = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales
+
+
+class QuantizedEmbeddingStore:
+    """
+    Read-only embedding snapshot stored as int8 codes with a scale per vector.
+
+    Rows are L2-normalized before quantization, so a query is scored with
+    one int8 x float32 product per block of rows, and each vector takes
+    dim + 4 bytes instead of 8 * dim for float64. The codes are
+    memory-mapped, so worker processes that open the same snapshot share a
+    single copy in the page cache.
+
+    A snapshot is a manifest (ids, optional content keys, dimensions, file
+    names) plus two .npy files. write() puts new files next to the old ones
+    and swaps the manifest atomically, so readers never see a half-written
+    snapshot; writers in different processes take turns on a lock file.
+    The keys let a reader tell which ids have changed since the snapshot
+    was taken, and manifest_id which snapshot it has open.
+    """
+
+    MANIFEST = "manifest.json"
+
+    def __init__(self, directory, block_rows=8192):
+        self.directory = directory
+        self.block_rows = block_rows
+        with open(os.path.join(directory, self.MANIFEST)) as f:
+            stat = os.fstat(f.fileno())
+            manifest = json.load(f)
+        self.manifest_id = (stat.st_dev, stat.st_ino)
+        self.ids = manifest["ids"]
+        self.keys = manifest.get("keys")
+        self.dimensions = manifest["dimensions"]
+        self._rows = {item_id: row for row, item_id in enumerate(self.ids)}
+        if self.ids:
+            self.codes = np.load(
+                os.path.join(directory, manifest["codes"]), mmap_mode="r"
+            )
+            self.scales = np.load(os.path.join(directory, manifest["scales"]))
+        else:
+            self.codes = np.zeros((0, self.dimensions), dtype=np.int8)
+            self.scales = np.zeros(0, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, item_id):
+        return item_id in self._rows
+
+    def key(self, item_id):
+        """Content key stored for item_id, None if absent or written without keys"""
+        row = self._rows.get(item_id)
+        if row is None or self.keys is None:
+            return None
+        return self.keys[row]
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.scales.nbytes
+
+    @classmethod
+    def current_manifest_id(cls, directory):
+        """Identity of the snapshot now in directory, None if there is none"""
+        try:
+            stat = os.stat(os.path.join(directory, cls.MANIFEST))
+        except FileNotFoundError:
+            return None
+        return stat.st_dev, stat.st_ino
+
+    @classmethod
+    def write(cls, directory, ids, matrix, keys=None):
+        """
+        Quantize matrix (one row per id) into a new snapshot and open it.
+
+        keys, if given, is one content key per id, kept in the manifest.
+        """
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, ".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                return cls._write(directory, ids, matrix, keys)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @classmethod
+    def _write(cls, directory, ids, matrix, keys):
+        matrix = np.asarray(matrix, dtype=np.float32)
+        if matrix.ndim != 2:
+            matrix = matrix.reshape(len(ids), -1)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        codes, scales = quantize_int8(matrix / np.where(norms > 0, norms, 1.0))
+
+        manifest_path = os.path.join(directory, cls.MANIFEST)
+        previous = read_manifest(manifest_path)
+
+        token = uuid.uuid4().hex[:12]
+        manifest = {
+            "ids": list(ids),
+            "keys": None if keys is None else list(keys),
+            "dimensions": int(matrix.shape[1]),
+            "codes": f"codes-{token}.npy",
+            "scales": f"scales-{token}.npy",
+        }
+        np.save(os.path.join(directory, manifest["codes"]), codes)
+        np.save(os.path.join(directory, manifest["scales"]), scales)
+
+        swap_manifest(
+            manifest_path,
+            manifest,
+            [previous["codes"], previous["scales"]] if previous else (),
+        )
+        return cls(directory)
+
+    def vectors(self, item_ids):
+        """Dequantized float32 rows for ids in the snapshot"""
+        rows = [self._rows[item_id] for item_id in item_ids]
+        return self.codes[rows].astype(np.float32) * self.scales[rows, None]
+
+    def search(
+        self, query_embedding, top_k=10, rerank=None, rerank_factor=4, exclude=()
+    ):
+        """
+        Score every row against the query on the quantized codes.
+
+        rerank, if given, maps a list of ids to their float32 embeddings
+        (rows of None for ids it no longer knows, which are dropped). The
+        best top_k * rerank_factor candidates are then re-scored exactly.
+        Ids in exclude are never returned.
+
+        Returns:
+        list: (id, cosine similarity) pairs for the top_k rows, best first
+        """
+        n = len(self.ids)
+        if n == 0 or top_k <= 0:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+
+        # Dequantize a block at a time so temporaries stay bounded
+        scores = np.empty(n, dtype=np.float32)
+        for start in range(0, n, self.block_rows):
+            block = self.codes[start : start + self.block_rows]
+            scores[start : start + len(block)] = block.astype(np.float32) @ query
+        scores *= self.scales
+        excluded = list(
+            {self._rows[item_id] for item_id in exclude if item_id in self._rows}
+        )
+        if excluded:
+            scores[excluded] = -np.inf
+
+        k = min(int(top_k) * (rerank_factor if rerank else 1), n - len(excluded))
+        if k <= 0:
+            return []
+        top = top_indices(scores, k)
+        candidates = [self.ids[i] for i in top]
+
+        if rerank:
+            exact = []
+            for item_id, vector in zip(candidates, rerank(candidates)):
+                if vector is None:
+                    continue
+                vector = np.asarray(vector, dtype=np.float32)
+                vector_norm = np.linalg.norm(vector)
+                exact.append(
+                    (
+                        item_id,
+                        float(vector @ query / vector_norm) if vector_norm else 0.0,
+                    )
+                )
+            exact.sort(key=lambda pair: -pair[1])
+            return exact[: int(top_k)]
+
+        top = top[: int(top_k)]
+        return [(self.ids[i], float(scores[i])) for i in top]
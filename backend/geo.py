@@ -0,0 +1,165 @@
+import numpy as np
+
+from change_log import LoggedStore
+
+EARTH_RADIUS_KM = 6371
+
+
+def haversine_distances(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km; array inputs broadcast against each other"""
+    lat1_rad, lon1_rad, lat2_rad, lon2_rad = (
+        np.radians(np.asarray(value, dtype=float)) for value in (lat1, lon1, lat2, lon2)
+    )
+
+    dlon = lon2_rad - lon1_rad
+    dlat = lat2_rad - lat1_rad
+
+    a = (
+        np.sin(dlat / 2) ** 2
+        + np.cos(lat1_rad) * np.cos(lat2_rad) * np.sin(dlon / 2) ** 2
+    )
+    c = 2 * np.arcsin(np.sqrt(a))
+
+    return c * EARTH_RADIUS_KM
+
+
+def haversine_distance_matrix(lats1, lons1, lats2, lons2, chunk_size=1024):
+    """
+    Full (len(lats1), len(lats2)) distance matrix in km.
+
+    Rows are computed chunk_size at a time so the temporaries stay bounded
+    at roughly chunk_size * len(lats2) floats, however many rows there are.
+    """
+    lats1, lons1 = np.asarray(lats1, dtype=float), np.asarray(lons1, dtype=float)
+    lats2, lons2 = np.asarray(lats2, dtype=float), np.asarray(lons2, dtype=float)
+
+    distances = np.empty((lats1.shape[0], lats2.shape[0]))
+    for start in range(0, lats1.shape[0], chunk_size):
+        stop = start + chunk_size
+        distances[start:stop] = haversine_distances(
+            lats1[start:stop, None],
+            lons1[start:stop, None],
+            lats2[None, :],
+            lons2[None, :],
+        )
+    return distances
+
+
+def location_scores(distances):
+    """Convert km distances to 0-100 location match scores; NaN distances score 50"""
+    scores = np.maximum(0, 100 - (np.asarray(distances) / 200))
+    return np.where(np.isnan(scores), 50.0, scores)
+
+
+class GeoIndex(LoggedStore):
+    """
+    Ball tree over project coordinates for "everything within R km" queries.
+
+    The tree is built on radians with the haversine metric. Points can be
+    upserted and removed at any time; the tree is rebuilt lazily on the next
+    query after a change, which is O(n log n) rather than a scan per query.
+    Changes are appended to a change log shared by every process serving
+    the index, so the index survives restarts and gunicorn workers see each
+    other's updates; see change_log.py.
+    """
+
+    def __init__(self, log_path=None):
+        super().__init__(log_path)
+        self._clear()
+
+    def __len__(self):
+        return len(self._points)
+
+    def _clear(self):
+        self._points = {}
+        self._tree = None
+        self._tree_ids = []
+
+    def _replay(self, records):
+        for record in records:
+            if record["op"] == "upsert":
+                self._points[record["id"]] = (record["lat"], record["lon"])
+            else:
+                self._points.pop(record["id"], None)
+        self._tree = None
+
+    def _live_records(self):
+        return [
+            {"op": "upsert", "id": item_id, "lat": lat, "lon": lon}
+            for item_id, (lat, lon) in self._points.items()
+        ]
+
+    def upsert_many(self, points):
+        """
+        Insert or move (id, latitude, longitude) points.
+
+        Returns:
+        int: Points added or moved; points already at those coordinates are skipped
+        """
+        with self._writing():
+            records = []
+            for item_id, lat, lon in points:
+                if self._points.get(item_id) != (float(lat), float(lon)):
+                    records.append(
+                        {
+                            "op": "upsert",
+                            "id": item_id,
+                            "lat": float(lat),
+                            "lon": float(lon),
+                        }
+                    )
+            self._log_records(records)
+            self._replay(records)
+            return len(records)
+
+    def remove(self, item_id):
+        return self.remove_many([item_id]) == 1
+
+    def remove_many(self, item_ids):
+        """Remove every id in item_ids present in the index; returns how many were"""
+        with self._writing():
+            records = [
+                {"op": "remove", "id": item_id}
+                for item_id in dict.fromkeys(item_ids)
+                if item_id in self._points
+            ]
+            self._log_records(records)
+            self._replay(records)
+            return len(records)
+
+    def ids(self):
+        with self._lock:
+            self.sync()
+            return list(self._points)
+
+    def _ensure_tree(self):
+        if self._tree is None and self._points:
+            # Imported here so that loading the index does not pay for sklearn
+            from sklearn.neighbors import BallTree  # type: ignore
+
+            self._tree_ids = list(self._points)
+            coords = np.radians(np.array([self._points[i] for i in self._tree_ids]))
+            self._tree = BallTree(coords, metric="haversine")
+
+    def within_radius(self, lat, lon, radius_km):
+        """
+        Returns:
+        list: (id, distance_km) pairs within radius_km, nearest first
+        """
+        with self._lock:
+            self.sync()
+            self._ensure_tree()
+            if self._tree is None:
+                return []
+
+            query = np.radians([[float(lat), float(lon)]])
+            indices, distances = self._tree.query_radius(
+                query,
+                r=radius_km / EARTH_RADIUS_KM,
+                return_distance=True,
+                sort_results=True,
+            )
+            return [
+                (self._tree_ids[i], float(d * EARTH_RADIUS_KM))
+                for i, d in zip(indices[0], distances[0])
+            ]
@@ -0,0 +1,73 @@
+"""
+gunicorn settings for the scoring API.
+
+The app is preloaded in the master process, so embedding indexes and caches
+are loaded once and shared copy-on-write by the forked workers. Send HUP to
+the master to replace workers gracefully with a fresh config; because the
+app is preloaded, picking up new code needs a full restart (or USR2 for a
+zero-downtime binary upgrade).
+
+Workers are separate processes, so state changed through the API is kept
+consistent between them like this:
+    semantic indexes, geo index,  each change is appended to a change log
+    score matrix                  under a file lock, and every worker replays
+                                  new entries before answering (change_log.py);
+                                  keep their *_DIR directories on local disk,
+                                  where flock is reliable
+    quantized search snapshots    shared files; each worker reopens a newer
+                                  one, and answers rows changed since it from
+                                  the live semantic index
+    catalog snapshot              read-only; re-run ingest.py, then restart
+    embedding and score caches    per worker; a miss is only slower, and the
+                                  embedding cache's disk tier is shared
+    /metrics                      each worker writes its values to a file in
+                                  METRICS_DIR every few seconds, and a scrape
+                                  on any worker adds them all up (metrics.py)
+Running several hosts behind a balancer needs one writer host or shared
+storage for those directories; these files only coordinate one host.
+
+Tunables (environment variables):
+    BIND                          address to listen on (default 0.0.0.0:5001)
+    WEB_CONCURRENCY               worker processes (default 2 * CPUs + 1)
+    GUNICORN_THREADS              threads per worker (default 4)
+    GUNICORN_TIMEOUT              seconds before a silent worker is killed (default 60)
+    GUNICORN_GRACEFUL_TIMEOUT     seconds workers get to finish on restart (default 30)
+    GUNICORN_MAX_REQUESTS         recycle a worker after this many requests (default 1000, 0 = never)
+    METRICS_DIR                   where workers pool their metrics (default a new temporary
+                                  directory per server; a fixed one keeps totals across restarts)
+    WARM_UP                       "eager" (default) or "off": lazily imported libraries are loaded
+                                  in the master before forking, so workers start warm and share them;
+                                  "background" is turned into "eager", as it could still be running
+                                  when the workers fork
+"""
+import gc
+import multiprocessing
+import os
+import tempfile
+
+# Read by main.create_app() when the app is preloaded below. A background
+# warm-up could still be running when the workers fork, so it is eager here
+if os.getenv("WARM_UP", "background") == "background":
+    os.environ["WARM_UP"] = "eager"
+# Read by main when it is imported, also below
+if not os.getenv("METRICS_DIR"):
+    os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="carbon-api-metrics-")
+
+bind = os.getenv("BIND", "0.0.0.0:5001")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+worker_class = "gthread"
+preload_app = True
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = max_requests // 10
+
+
+def pre_fork(server, worker):
+    # Objects loaded so far are left out of garbage collection in the
+    # workers, so collections do not write to (and un-share) their pages
+    gc.freeze()
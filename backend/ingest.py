@@ -0,0 +1,335 @@
+"""
+Ingest the archive datasets into the catalog snapshot served by the API.
+
+Reads archive/organizations.csv and archive/ccs_map_data.xlsx in chunks,
+normalizes each row into the fundee or funder profile schema, embeds the
+descriptions in batches and writes a columnar snapshot (see catalog.py)
+that the API memory-maps at startup.
+
+Each row is identified by its source and natural key and hashed together
+with the embedding model. Re-runs reuse the stored embedding of every
+row whose hash is unchanged, and leave the snapshot untouched if
+nothing changed at all. Rows that only got a fallback embedding (the
+provider failed) are stored with RETRY_HASH instead, so the next run
+embeds them again.
+
+    python ingest.py                       # into CATALOG_DIR (default backend/.catalog)
+    python ingest.py --chunk-size 200      # smaller reads for large sources
+    EMBEDDING_PROVIDER=local python ingest.py
+"""
+import argparse
+import json
+import os
+import re
+import time
+
+import numpy as np
+
+from catalog import KINDS, Catalog
+from embedding_cache import embedding_key
+from log import logger
+
+# Content hash of rows stored with a fallback embedding; never matches a real one
+RETRY_HASH = "fallback"
+
+ARCHIVE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "archive"
+)
+
+
+def iter_csv_chunks(path, chunk_size):
+    """DataFrames of up to chunk_size rows from a CSV file"""
+    import pandas as pd
+
+    yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+def iter_xlsx_chunks(path, chunk_size):
+    """DataFrames of up to chunk_size rows from the first sheet of a workbook"""
+    import openpyxl
+    import pandas as pd
+
+    # Read-only mode streams rows instead of loading the whole sheet
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                yield pd.DataFrame(chunk, columns=header)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=header)
+    finally:
+        workbook.close()
+
+
+def _text(value):
+    """Stripped string, or None for blanks and NaN"""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _number(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if np.isnan(value) else value
+
+
+def _split_list(value):
+    """Comma-separated values, keeping commas inside parentheses"""
+    value = _text(value)
+    if not value:
+        return []
+    return [part.strip() for part in re.split(r",(?![^()]*\))", value) if part.strip()]
+
+
+def organization_records(frame):
+    """
+    Rows of organizations.csv as (kind, source key, profile).
+
+    Private-sector organizations run mCDR projects and become fundees; the
+    rest (NGOs doing philanthropic funding, research and field building)
+    become funders whose focus areas are their mCDR approaches.
+    """
+    for row in frame.to_dict("records"):
+        name = _text(row.get("Company"))
+        description = _text(row.get("Description"))
+        if not name or not description:
+            continue
+
+        sector = _text(row.get("Sector"))
+        approaches = _split_list(row.get("mCDR Approach"))
+        if sector == "Private Sector":
+            yield "fundee", name, {
+                "name": name,
+                "sector": sector,
+                "fundee_description": description,
+                "stage": _text(row.get("Activity_Type")),
+                "mcdr_type": approaches[0] if approaches else None,
+                "mcdr_approaches": approaches,
+            }
+        else:
+            yield "funder", name, {
+                "name": name,
+                "sector": sector,
+                "funder_description": description,
+                "activity_types": _split_list(row.get("Activity_Type")),
+                "focus_areas": approaches,
+            }
+
+
+def ccs_project_records(frame):
+    """
+    Rows of ccs_map_data.xlsx as fundee (kind, source key, profile).
+
+    Costs are only used as funding needs when given in US dollars; other
+    currencies are kept as cost/cost_currency without conversion.
+    """
+    for row in frame.to_dict("records"):
+        project_id = _number(row.get("Project ID"))
+        name = _text(row.get("Project Name"))
+        if project_id is None or not name:
+            continue
+
+        lat = _number(row.get("Latitude"))
+        lon = _number(row.get("Longitude"))
+        cost = _number(row.get("Cost")) or 0.0
+        currency = _text(row.get("Currency Name"))
+        yield "fundee", str(int(project_id)), {
+            "name": name,
+            "company": _text(row.get("Company")),
+            "fundee_description": _text(row.get("Project Summary")) or name,
+            "fundee_location": None if lat is None or lon is None else [lat, lon],
+            "fundee_needs": cost if currency == "US Dollar" else 0.0,
+            "cost": cost,
+            "cost_currency": currency,
+            "stage": _text(row.get("Project Phase"))
+            or _text(row.get("Overall Status")),
+            "status": _text(row.get("Overall Status")),
+            "mcdr_type": _text(row.get("Project Type")),
+            "country": _text(row.get("Country Location")),
+        }
+
+
+# name -> (path, chunk reader, row normalizer)
+SOURCES = {
+    "organizations": (
+        os.path.join(ARCHIVE_DIR, "organizations.csv"),
+        iter_csv_chunks,
+        organization_records,
+    ),
+    "ccs_map": (
+        os.path.join(ARCHIVE_DIR, "ccs_map_data.xlsx"),
+        iter_xlsx_chunks,
+        ccs_project_records,
+    ),
+}
+
+
+def description_of(kind, profile):
+    return profile.get(f"{kind}_description") or ""
+
+
+def ingest(
+    directory,
+    embed,
+    model,
+    task_type=None,
+    dimensions=768,
+    sources=None,
+    chunk_size=1000,
+    batch_size=256,
+):
+    """
+    Read every source in chunks and write the catalog snapshot if anything changed.
+
+    Parameters:
+    directory (str): Catalog snapshot directory
+    embed (callable): List of texts -> ((len(texts), dimensions) embedding
+        matrix, bool array marking fallback embeddings)
+    model (str), task_type (str): Embedding model, part of each row's content hash
+    sources (dict): As SOURCES (the default)
+    chunk_size (int): Rows read per chunk
+    batch_size (int): Changed rows embedded per embed() call
+
+    Returns:
+    dict: Row counts (new, changed, unchanged, removed, embedded, fallback)
+        and whether a new snapshot was written
+    """
+    start_time = time.time()
+    sources = SOURCES if sources is None else sources
+    previous = Catalog.open(directory)
+    known = {}
+    if previous is not None:
+        for kind in KINDS:
+            embeddings = previous.embeddings(kind)
+            for row, (source_id, content_hash) in enumerate(
+                zip(previous.ids(kind), previous.hashes(kind))
+            ):
+                known[kind, source_id] = (content_hash, embeddings[row])
+
+    rows = {kind: {} for kind in KINDS}
+    pending = []
+    counts = {"new": 0, "changed": 0, "unchanged": 0, "embedded": 0, "fallback": 0}
+    source_stats = {}
+
+    def flush():
+        if not pending:
+            return
+        vectors, fallbacks = embed(
+            [description_of(kind, profile) for kind, _, profile in pending]
+        )
+        for (kind, source_id, profile), vector, fallback in zip(
+            pending, vectors, fallbacks
+        ):
+            content_hash = RETRY_HASH if fallback else rows[kind][source_id][0]
+            rows[kind][source_id] = (content_hash, profile, np.asarray(vector))
+        fallback_count = int(np.count_nonzero(fallbacks))
+        if fallback_count:
+            logger.warning(
+                "%s of %s rows got fallback embeddings; the next run retries them",
+                fallback_count,
+                len(pending),
+            )
+        counts["embedded"] += len(pending) - fallback_count
+        counts["fallback"] += fallback_count
+        pending.clear()
+
+    for source, (path, read_chunks, normalize) in sources.items():
+        read = 0
+        for chunk in read_chunks(path, chunk_size):
+            read += len(chunk)
+            for kind, key, profile in normalize(chunk):
+                source_id = f"{source}:{key}"
+                profile = {"id": source_id, **profile}
+                content_hash = embedding_key(
+                    model, task_type, json.dumps(profile, sort_keys=True)
+                )
+                if source_id in rows[kind]:
+                    logger.warning(
+                        "Duplicate %s row %s, keeping the last", kind, source_id
+                    )
+
+                old = known.get((kind, source_id))
+                if old is not None and old[0] == content_hash:
+                    rows[kind][source_id] = (content_hash, profile, old[1])
+                    counts["unchanged"] += 1
+                    continue
+
+                counts["changed" if old is not None else "new"] += 1
+                rows[kind][source_id] = (content_hash, profile, None)
+                pending.append((kind, source_id, profile))
+                if len(pending) >= batch_size:
+                    flush()
+        source_stats[source] = {"path": os.path.basename(path), "rows": read}
+        logger.info("Read %s rows from %s", read, source)
+    flush()
+
+    counts["removed"] = sum(
+        1 for kind, source_id in known if source_id not in rows[kind]
+    )
+    written = previous is None or bool(
+        counts["new"] or counts["changed"] or counts["removed"]
+    )
+    if written:
+        catalog = Catalog.write(
+            directory,
+            {
+                kind: [
+                    (source_id, content_hash, profile, embedding)
+                    for source_id, (
+                        content_hash,
+                        profile,
+                        embedding,
+                    ) in kind_rows.items()
+                ]
+                for kind, kind_rows in rows.items()
+            },
+            source_stats,
+            dimensions,
+        )
+    else:
+        catalog = previous
+
+    return {
+        **counts,
+        **{f"{kind}s": len(kind_rows) for kind, kind_rows in rows.items()},
+        "written": written,
+        "bytes": catalog.stats()["bytes"],
+        "elapsed_seconds": time.time() - start_time,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--output", help="snapshot directory (default CATALOG_DIR)")
+    args = parser.parse_args()
+
+    # Embeddings go through the API's cache, provider and circuit breaker
+    import main as api
+
+    result = ingest(
+        args.output or api.CATALOG_DIR,
+        api.get_embeddings_with_fallbacks,
+        api.embedding_provider.model,
+        api.embedding_provider.task_type,
+        dimensions=api.embedding_provider.dimensions,
+        chunk_size=args.chunk_size,
+        batch_size=args.batch_size,
+    )
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
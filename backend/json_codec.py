@@ -0,0 +1,95 @@
+import json
+
+from flask.json.provider import DefaultJSONProvider
+
+from timings import stage
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_MIMETYPES = ("application/msgpack", "application/x-msgpack")
+
+if orjson is not None:
+    # Flask's default provider sorts keys; keep that so response bodies (and
+    # the ETags computed over them) do not depend on the codec
+    _ORJSON_OPTIONS = (
+        orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    )
+
+
+def dumps(obj):
+    """Compact JSON text for obj, through orjson when it is installed"""
+    if orjson is None:
+        return json.dumps(obj, separators=(",", ":"))
+    return orjson.dumps(obj, option=_ORJSON_OPTIONS).decode()
+
+
+def loads(s):
+    if orjson is None:
+        return json.loads(s)
+    return orjson.loads(s)
+
+
+def msgpack_available():
+    return msgpack is not None
+
+
+def msgpack_loads(data):
+    return msgpack.unpackb(data, raw=False)
+
+
+def msgpack_dumps(obj):
+    return msgpack.packb(obj, use_bin_type=True)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider that parses and serializes with orjson.
+
+    Installed as app.json, so request.json, jsonify and every other Flask
+    JSON call go through it. Output matches the default provider (sorted
+    keys, compact unless the app is in debug mode) except that non-ASCII
+    text is sent as UTF-8 rather than escaped, and NaN and infinity become
+    null, as JSON requires, instead of bare NaN. Uses the standard library
+    codec when use_orjson is False, orjson is not installed or a caller
+    passes json.dumps keyword arguments orjson does not support.
+
+    Either way, parsing and response serialization are recorded as the
+    request's parse and serialize timing stages.
+    """
+
+    def __init__(self, app, use_orjson=True):
+        super().__init__(app)
+        self.use_orjson = use_orjson and orjson is not None
+
+    def dumps(self, obj, **kwargs):
+        if not self.use_orjson or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=_ORJSON_OPTIONS).decode()
+
+    def loads(self, s, **kwargs):
+        with stage("parse"):
+            if not self.use_orjson or kwargs:
+                return super().loads(s, **kwargs)
+            return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        with stage("serialize"):
+            if not self.use_orjson:
+                return super().response(*args, **kwargs)
+
+            obj = self._prepare_response_obj(args, kwargs)
+            option = _ORJSON_OPTIONS
+            if self.compact is False or (self.compact is None and self._app.debug):
+                option |= orjson.OPT_INDENT_2
+            return self._app.response_class(
+                orjson.dumps(obj, default=self.default, option=option) + b"\n",
+                mimetype=self.mimetype,
+            )
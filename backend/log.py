@@ -0,0 +1,59 @@
+import contextvars
+import logging
+import os
+import sys
+
+# Set per request when the caller asks for the detailed calculation traces
+_request_trace = contextvars.ContextVar("request_trace", default=False)
+
+
+class _TraceLogger(logging.Logger):
+    """
+    Logger that also emits DEBUG records while a traced request is active.
+
+    Outside traced requests this is the normal cached level check, so a
+    disabled logger.debug("...%s", value) call never formats its arguments.
+    """
+
+    def isEnabledFor(self, level):
+        return _request_trace.get() or super().isEnabledFor(level)
+
+
+def _make_logger(name):
+    previous = logging.getLoggerClass()
+    logging.setLoggerClass(_TraceLogger)
+    try:
+        return logging.getLogger(name)
+    finally:
+        logging.setLoggerClass(previous)
+
+
+logger = _make_logger("carbon_api")
+
+
+def configure_logging(level=None):
+    """Attach a stderr handler to the API logger at LOG_LEVEL (default INFO)"""
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(
+            logging.Formatter("%(asctime)s %(levelname)s [%(process)d] %(message)s")
+        )
+        logger.addHandler(handler)
+        logger.propagate = False
+    logger.setLevel((level or os.getenv("LOG_LEVEL", "INFO")).upper())
+    return logger
+
+
+def set_request_trace(enabled):
+    """Turn DEBUG traces on or off for the rest of the current request"""
+    _request_trace.set(bool(enabled))
+
+
+def request_trace_enabled():
+    """True if the current request asked for DEBUG traces"""
+    return _request_trace.get()
+
+
+def trace_enabled():
+    """True if DEBUG records will be emitted, globally or for this request"""
+    return logger.isEnabledFor(logging.DEBUG)
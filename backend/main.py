@@ -1,76 +1,369 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, make_response
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity  # type: ignore
 import math
-import pandas as pd  # type: ignore
 from flask_cors import CORS  # type: ignore
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+import contextvars
+import cProfile
+import functools
+import hmac
+import importlib
+import itertools
+import json
+import threading
 import time
 from dotenv import load_dotenv
 import os
 
-# Import Google Generative AI package
-import google.generativeai as genai  # type: ignore
+from log import (
+    configure_logging,
+    logger,
+    request_trace_enabled,
+    set_request_trace,
+    trace_enabled,
+)
+from circuit_breaker import CircuitBreaker
+from embedding_cache import EmbeddingCache, embedding_key
+from memo_cache import MemoCache
+from metrics import MetricsRegistry
+from profiling import ProfileStore, StackSampler, profiled_task
+import profiling
+from timings import stage, timed
+from top_k import top_indices
+import timings
+from embedding_store import QuantizedEmbeddingStore
+from json_codec import (
+    MSGPACK_MIMETYPES,
+    FastJSONProvider,
+    dumps as fast_json_dumps,
+    msgpack_available,
+    msgpack_dumps,
+    msgpack_loads,
+)
+from catalog import Catalog
+from embedding_providers import (
+    HashingEmbeddingProvider,
+    configure_gemini,
+    create_embedding_provider,
+    gemini_client,
+    reset_gemini_client,
+)
+from score_matrix import ScoreMatrix
+from semantic_index import SemanticIndex
+from geo import GeoIndex, haversine_distance_matrix, location_scores
 
 
 # Load environment variables first
 load_dotenv(dotenv_path="secret.env")
+configure_logging()
+
+# Shared secret that enables a debug trace (request bodies and calculation
+# steps logged at DEBUG) for a request sent with "X-Debug-Trace: <token>";
+# unset disables per-request traces
+DEBUG_TRACE_TOKEN = os.getenv("DEBUG_TRACE_TOKEN")
+
+# Shared secret that runs a single /api/* request under cProfile when sent
+# as "X-Profile: <token>" or "?profile=<token>"; unset disables it. Reports
+# are stored in PROFILE_DIR and served by /api/profiles/<id>.
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+PROFILE_DIR = os.getenv(
+    "PROFILE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".profiles"),
+)
+# Stack-sample every Nth /api/* request (0 disables) into a collapsed-stack
+# file per process, PROFILE_DIR/flamegraph-<pid>.folded
+PROFILE_SAMPLE_EVERY = int(os.getenv("PROFILE_SAMPLE_EVERY", "0"))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+PROFILE_FLUSH_SECONDS = float(os.getenv("PROFILE_FLUSH_SECONDS", "10"))
 
 
 # Get the API key
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-print(f"API Key loaded: {'Yes' if GEMINI_API_KEY else 'No'}")
+logger.info("API Key loaded: %s", "Yes" if GEMINI_API_KEY else "No")
 
-# Configure the Gemini API with your key
-genai.configure(api_key=GEMINI_API_KEY)
+# Configure the Gemini API with your key; the client library is only
+# imported when it is first used
+configure_gemini(GEMINI_API_KEY)
 
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for Express.js frontend integration
 
+# "fast" (default) parses and serializes JSON with orjson when it is
+# installed; "stdlib" keeps the standard library codec
+JSON_CODEC = os.getenv("JSON_CODEC", "fast")
+app.json = FastJSONProvider(app, use_orjson=JSON_CODEC == "fast")
+
+
+# EMBEDDING_PROVIDER selects Gemini ("gemini", the default) or the offline
+# CPU backend ("local"); see embedding_providers.py
+embedding_provider = create_embedding_provider()
+logger.info("Embedding provider: %s", embedding_provider.name)
+
+# When the provider fails, texts are embedded locally rather than randomly,
+# so texts sharing vocabulary still score as related
+_fallback_provider = (
+    embedding_provider
+    if isinstance(embedding_provider, HashingEmbeddingProvider)
+    else HashingEmbeddingProvider(dimensions=embedding_provider.dimensions)
+)
+
+# After EMBEDDING_BREAKER_THRESHOLD consecutive provider failures, skip the
+# provider for EMBEDDING_BREAKER_COOLDOWN seconds and use the fallback
+embedding_breaker = CircuitBreaker(
+    failure_threshold=int(os.getenv("EMBEDDING_BREAKER_THRESHOLD", "5")),
+    cooldown=float(os.getenv("EMBEDDING_BREAKER_COOLDOWN", "30")),
+)
+
+# Embeddings are cached by content hash so unchanged descriptions never hit
+# the network twice, including across restarts
+embedding_cache = EmbeddingCache(
+    cache_dir=os.getenv(
+        "EMBEDDING_CACHE_DIR",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), ".embedding_cache"),
+    ),
+    max_entries=int(os.getenv("EMBEDDING_CACHE_SIZE", "4096")),
+)
+
+# Preloaded embedding matrices for semantic search, one per profile kind.
+# Filled from the database by the Express server (server/jobs/searchIndexes.js)
+# and kept in step across workers through a change log per kind
+SEMANTIC_INDEX_DIR = os.getenv(
+    "SEMANTIC_INDEX_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".semantic_index"),
+)
+semantic_indexes = {
+    kind: SemanticIndex(
+        log_path=os.path.join(SEMANTIC_INDEX_DIR, f"{kind}.log"),
+        embed_many=lambda texts: get_embeddings_with_fallbacks(texts),
+    )
+    for kind in ("fundee", "funder")
+}
+
+# Seed funders and fundees ingested from archive/ by ingest.py; memory-mapped
+# by create_app, None until the first ingest
+CATALOG_DIR = os.getenv(
+    "CATALOG_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".catalog"),
+)
+catalog = None
+
+# int8 memory-mapped snapshots of the semantic indexes, written when the app
+# starts (before gunicorn forks, so workers share one copy in the page
+# cache), on demand via /api/semantic-index/<kind>/snapshot, and again once
+# more than SNAPSHOT_STALE_RATIO of the rows (and at least
+# SNAPSHOT_STALE_MIN) have changed in the live index
+EMBEDDING_STORE_DIR = os.getenv(
+    "EMBEDDING_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".embedding_store"),
+)
+SNAPSHOT_STALE_RATIO = float(os.getenv("SNAPSHOT_STALE_RATIO", "0.1"))
+SNAPSHOT_STALE_MIN = int(os.getenv("SNAPSHOT_STALE_MIN", "256"))
+embedding_stores = {}
+# kind -> (store, index version, ids whose snapshot row is out of date)
+_snapshot_staleness = {}
+_snapshot_lock = threading.Lock()
+
+# Ball tree over fundee coordinates for radius queries, filled from
+# fundeetable.latitude/longitude by the Express server
+# (server/jobs/searchIndexes.js) and shared by workers through a change log
+GEO_INDEX_DIR = os.getenv(
+    "GEO_INDEX_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".geo_index"),
+)
+fundee_geo_index = GeoIndex(log_path=os.path.join(GEO_INDEX_DIR, "fundee.log"))
+
+# Memoized results of the pure per-pair scoring functions, shared by all of
+# them and keyed on the function and its JSON-normalized arguments
+score_cache = MemoCache(
+    max_entries=int(os.getenv("SCORE_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("SCORE_CACHE_TTL", "300")),
+)
+# How long clients may reuse a deterministic score response
+SCORE_CACHE_MAX_AGE = int(os.getenv("SCORE_CACHE_MAX_AGE", "300"))
+
+# Prometheus metrics served at /metrics. Updates go to per-thread shards
+# without locking and are summed on scrape. With METRICS_DIR set, gunicorn
+# workers share their values through files there, so a scrape landing on
+# any worker reports all of them (gunicorn.conf.py sets it); otherwise each
+# process reports only its own.
+metrics = MetricsRegistry(
+    prefix="carbon_api_",
+    directory=os.getenv("METRICS_DIR") or None,
+    flush_interval=float(os.getenv("METRICS_FLUSH_SECONDS", "5")),
+)
+request_latency = metrics.histogram(
+    "request_duration_seconds",
+    "Request latency by route up to the response headers; _count is the request count",
+    ("method", "route", "status"),
+)
+embedding_latency = metrics.histogram(
+    "embedding_provider_duration_seconds",
+    "Embedding provider call latency by outcome",
+    ("provider", "outcome"),
+)
+embedding_texts = metrics.counter(
+    "embedding_provider_texts_total",
+    "Texts embedded by the provider",
+    ("provider",),
+)
+embedding_fallbacks = metrics.counter(
+    "embedding_fallbacks_total",
+    "Texts given fallback embeddings, by reason (error, circuit_open, timeout)",
+    ("reason",),
+)
+
+
+def _cache_lookups():
+    embedding = embedding_cache.stats()
+    scores = score_cache.stats()
+    return {
+        ("embedding", "memory_hit"): embedding["memory_hits"],
+        ("embedding", "disk_hit"): embedding["disk_hits"],
+        ("embedding", "miss"): embedding["misses"],
+        ("score", "hit"): scores["hits"],
+        ("score", "miss"): scores["misses"],
+    }
+
+
+metrics.gauge_callback(
+    "cache_lookups_total",
+    "Cache lookups by cache and result",
+    _cache_lookups,
+    ("cache", "result"),
+    type="counter",
+)
+metrics.gauge_callback(
+    "cache_hit_ratio",
+    "Fraction of lookups served from the cache since startup",
+    lambda: {
+        ("embedding",): embedding_cache.stats()["hit_ratio"],
+        ("score",): score_cache.stats()["hit_ratio"],
+    },
+    ("cache",),
+)
+metrics.gauge_callback(
+    "cache_entries",
+    "Entries held in memory by each cache",
+    lambda: {
+        ("embedding",): embedding_cache.stats()["memory_entries"],
+        ("score",): len(score_cache),
+    },
+    ("cache",),
+)
+metrics.gauge_callback(
+    "queue_depth",
+    "Tasks waiting for a thread in each embedding pool",
+    lambda: {
+        ("embedding",): _embedding_executor._work_queue.qsize(),
+        ("provider",): embedding_provider.queue_depth(),
+    },
+    ("pool",),
+)
+metrics.gauge_callback(
+    "embedding_circuit_state",
+    "1 for the embedding circuit breaker's current state",
+    lambda: {
+        (state,): int(embedding_breaker.state == state)
+        for state in ("closed", "open", "half_open")
+    },
+    ("state",),
+)
+
+
+def memoized(function):
+    """Serve repeat calls of a pure scoring function from score_cache"""
+
+    @functools.wraps(function)
+    def wrapper(*args):
+        # Requests that ask for a trace recompute so the calculation shows up
+        # in the log; a global DEBUG level alone still uses the cache
+        if request_trace_enabled():
+            return function(*args)
+        try:
+            key = (function.__name__, json.dumps(args, sort_keys=True))
+        except (TypeError, ValueError):
+            return function(*args)
+        return score_cache.get_or_compute(key, lambda: function(*args))
+
+    return wrapper
+
 
 # Initialize the embedding model
 def initialize_gemini():
     try:
-        # Check if the model is accessible
-        models = genai.list_models()
-        print("Gemini API connection successful")
+        # Check if the model is accessible; list_models() is lazy until iterated
+        next(iter(gemini_client().list_models()), None)
+        logger.info("Gemini API connection successful")
         return True
     except Exception as e:
-        print(f"Error initializing Gemini API: {str(e)}")
+        logger.error("Error initializing Gemini API: %s", e)
         return False
 
+
+# /api/test-gemini reuses a connectivity check for this many seconds
+GEMINI_HEALTH_TTL = float(os.getenv("GEMINI_HEALTH_TTL", "60"))
+_gemini_health = None
+_gemini_health_lock = threading.Lock()
+
+
+def gemini_health():
+    """
+    Cached result of initialize_gemini, re-checked at most once per TTL.
+
+    Concurrent callers wait for a single in-flight check instead of each
+    making their own.
+
+    Returns:
+    tuple: (connected, seconds since the check ran)
+    """
+    global _gemini_health
+    with _gemini_health_lock:
+        now = time.monotonic()
+        if _gemini_health is None or now - _gemini_health[1] >= GEMINI_HEALTH_TTL:
+            _gemini_health = (initialize_gemini(), time.monotonic())
+        connected, checked_at = _gemini_health
+        return connected, time.monotonic() - checked_at
+
+
+@timed("scoring")
+@memoized
 def calculate_risk_score(data):
     """
     Calculate a simple risk score based on the provided data attributes.
-    
+
     Parameters:
     data (dict): Dictionary containing:
         - total_credits: Actual carbon credits generated
         - expected_credits: Expected carbon credits
         - amount_invested: Investment amount
-    
+
     Returns:
     float: Risk score from 0-100 (lower is better)
     """
-    # Extract the data
-    total_credits = data.get('total_credits', 0)
-    expected_credits = data.get('expected_credits', 0)
-    amount_invested = data.get('amount_invested', 0)
-    
-    print(data)
+    # Extract the data; missing values count as 0, as in calculate_risk_scores
+    total_credits = data.get("total_credits") or 0
+    expected_credits = data.get("expected_credits") or 0
+    amount_invested = data.get("amount_invested") or 0
+
+    logger.debug(
+        "Input: total_credits=%s, expected_credits=%s, amount_invested=%s",
+        total_credits,
+        expected_credits,
+        amount_invested,
+    )
 
-    print(f"Input: total_credits={total_credits}, expected_credits={expected_credits}, amount_invested={amount_invested}")
-    
     # Start with a baseline risk score
     risk_score = 50
-    
+
     # Adjust risk based on credit delivery ratio
     if expected_credits > 0:
         delivery_ratio = total_credits / expected_credits
         # Better than expected = lower risk, worse than expected = higher risk
         risk_adjustment = (delivery_ratio - 1) * -25
         risk_score += risk_adjustment
-    
+
     # Adjust risk based on cost-effectiveness
     if total_credits > 0 and amount_invested > 0:
         cost_per_ton = amount_invested / total_credits
@@ -83,20 +376,24 @@ def calculate_risk_score(data):
             risk_score -= 5
         elif cost_per_ton > 250:
             risk_score += 15
-    
+
     # Ensure risk score is between 0 and 100
     risk_score = max(0, min(100, risk_score))
-    
+
     # Round to nearest whole number
     return round(risk_score)
 
 
-
 # 2) Efficiency Score Calculation
+@timed("scoring")
+@memoized
 def calculate_efficiency_score(total_credits, expected_credits, amount_invested):
-    print("\n===== EFFICIENCY SCORE CALCULATION =====")
-    print(
-        f"Input: total_credits={total_credits}, expected_credits={expected_credits}, amount_invested={amount_invested}"
+    logger.debug("===== EFFICIENCY SCORE CALCULATION =====")
+    logger.debug(
+        "Input: total_credits=%s, expected_credits=%s, amount_invested=%s",
+        total_credits,
+        expected_credits,
+        amount_invested,
     )
 
     # Default values based on historical data
@@ -109,7 +406,7 @@ def calculate_efficiency_score(total_credits, expected_credits, amount_invested)
     # Use provided values or defaults
     tc = total_credits if total_credits is not None else defaults["total_credits"]
     if total_credits is None:
-        print(f"Using default value for total_credits: {tc}")
+        logger.debug("Using default value for total_credits: %s", tc)
 
     ec = (
         expected_credits
@@ -117,416 +414,2453 @@ def calculate_efficiency_score(total_credits, expected_credits, amount_invested)
         else defaults["expected_credits"]
     )
     if expected_credits is None:
-        print(f"Using default value for expected_credits: {ec}")
+        logger.debug("Using default value for expected_credits: %s", ec)
 
     ai = amount_invested if amount_invested is not None else defaults["amount_invested"]
     if amount_invested is None:
-        print(f"Using default value for amount_invested: {ai}")
+        logger.debug("Using default value for amount_invested: %s", ai)
 
     # Avoid division by zero
     if ai <= 0:
-        print(f"Amount invested is {ai} (≤ 0), returning efficiency score of 0")
+        logger.debug("Amount invested is %s (≤ 0), returning efficiency score of 0", ai)
         return 0
 
     # Calculate efficiency (credit per dollar)
     total_credits_sum = tc + ec
-    print(f"Total credits sum (total + expected): {tc} + {ec} = {total_credits_sum}")
+    logger.debug(
+        "Total credits sum (total + expected): %s + %s = %s", tc, ec, total_credits_sum
+    )
 
     efficiency = total_credits_sum / ai
-    print(
-        f"Raw efficiency (credits per dollar): {total_credits_sum} / {ai} = {efficiency}"
+    logger.debug(
+        "Raw efficiency (credits per dollar): %s / %s = %s",
+        total_credits_sum,
+        ai,
+        efficiency,
     )
 
     # Normalize to 0-100 scale
     # Assuming efficiency of 1 ton/$100 (0.01) is excellent
     normalized_efficiency = min(100, efficiency * 10000)
-    print(
-        f"Normalized efficiency score (0-100): {efficiency} * 10000 = {efficiency * 10000}"
+    logger.debug(
+        "Normalized efficiency score (0-100): %s * 10000 = %s",
+        efficiency,
+        efficiency * 10000,
     )
     if normalized_efficiency == 100:
-        print("Efficiency score capped at maximum (100)")
+        logger.debug("Efficiency score capped at maximum (100)")
 
-    print(f"FINAL EFFICIENCY SCORE: {normalized_efficiency}")
-    print("========================================\n")
+    logger.debug("FINAL EFFICIENCY SCORE: %s", normalized_efficiency)
+    logger.debug("========================================")
 
     return normalized_efficiency
 
 
 # 3) Impact Score Calculation
+@timed("scoring")
+@memoized
 def calculate_impact_score(total_credits):
-    print("\n===== IMPACT SCORE CALCULATION =====")
-    print(f"Input: total_credits={total_credits}")
+    logger.debug("===== IMPACT SCORE CALCULATION =====")
+    logger.debug("Input: total_credits=%s", total_credits)
 
     # Default value
     tc = total_credits if total_credits is not None else 500
     if total_credits is None:
-        print(f"Using default value for total_credits: {tc}")
+        logger.debug("Using default value for total_credits: %s", tc)
 
     # Logarithmic scaling for better distribution
     # 100 credits -> ~46 score
     # 1000 credits -> ~69 score
     # 10000 credits -> ~92 score
     if tc <= 0:
-        print(f"Total credits is {tc} (≤ 0), returning impact score of 0")
+        logger.debug("Total credits is %s (≤ 0), returning impact score of 0", tc)
         return 0
 
     log_value = math.log10(tc)
-    print(f"log10({tc}) = {log_value}")
+    logger.debug("log10(%s) = %s", tc, log_value)
 
     impact_score = min(100, 23 * log_value)
-    print(f"Raw impact score: 23 * {log_value} = {23 * log_value}")
+    logger.debug("Raw impact score: 23 * %s = %s", log_value, 23 * log_value)
 
     if impact_score == 100:
-        print("Impact score capped at maximum (100)")
+        logger.debug("Impact score capped at maximum (100)")
 
-    print(f"FINAL IMPACT SCORE: {impact_score}")
-    print("===================================\n")
+    logger.debug("FINAL IMPACT SCORE: %s", impact_score)
+    logger.debug("===================================")
 
     return impact_score
 
 
-# Update the get_embedding function to use the latest API
-def get_embedding(text):
-    """Generate embeddings using Google's Gemini embedding model"""
-    print(f"Generating embedding for text: '{text[:50]}...' (truncated)")
-    start_time = time.time()
+def _cache_key(text):
+    return embedding_key(embedding_provider.model, embedding_provider.task_type, text)
+
+
+class EmbeddingCircuitOpen(Exception):
+    """Raised instead of calling the provider while the circuit breaker is open"""
 
+
+def _provider_embed(texts):
+    """Call the embedding provider through the circuit breaker"""
+    if not embedding_breaker.allow():
+        raise EmbeddingCircuitOpen("Embedding provider circuit is open")
+
+    start_time = time.perf_counter()
     try:
-        # Use the embedding model
-        embedding_model = "models/embedding-001"
-        embedding = genai.embed_content(
-            model=embedding_model,
-            content=text,
-            task_type="retrieval_document",
+        vectors = embedding_provider.embed(texts)
+    except Exception:
+        embedding_latency.observe(
+            time.perf_counter() - start_time, embedding_provider.name, "error"
         )
+        if embedding_breaker.record_failure():
+            logger.warning(
+                "Embedding provider circuit opened after %s failures, "
+                "using fallback embeddings for %.0fs",
+                embedding_breaker.failure_threshold,
+                embedding_breaker.cooldown,
+            )
+        raise
+
+    embedding_latency.observe(
+        time.perf_counter() - start_time, embedding_provider.name, "success"
+    )
+    embedding_texts.inc(embedding_provider.name, amount=len(texts))
+    if embedding_breaker.record_success():
+        logger.info("Embedding provider recovered, circuit closed")
+    return vectors
+
+
+def get_embedding(text):
+    """Generate an embedding with the configured embedding provider"""
+    return _embed_text(text)[0]
+
+
+def _embed_text(text):
+    """
+    get_embedding, also saying whether the provider failed.
+
+    Returns:
+    tuple: (embedding, True if it is a fallback embedding)
+    """
+    cache_key = _cache_key(text)
+    cached = embedding_cache.get(cache_key)
+    if cached is not None:
+        logger.debug("Embedding cache hit for text: '%s...' (truncated)", text[:50])
+        return cached, False
+
+    logger.debug("Generating embedding for text: '%s...' (truncated)", text[:50])
+    start_time = time.time()
 
+    try:
         # Convert the embedding to a numpy array
-        embedding_np = np.array(embedding["embedding"])
+        embedding_np = np.array(_provider_embed([text])[0])
         elapsed = time.time() - start_time
-        print(
-            f"Embedding generated successfully (time: {elapsed:.2f}s, dimensions: {embedding_np.shape})"
+        logger.debug(
+            "Embedding generated successfully (time: %.2fs, dimensions: %s)",
+            elapsed,
+            embedding_np.shape,
         )
 
-        return embedding_np
+        # Only real embeddings are cached; the fallback below never is
+        embedding_cache.put(cache_key, embedding_np)
+        return embedding_np, False
+    except EmbeddingCircuitOpen:
+        logger.debug("Embedding circuit open, returning fallback embedding")
+        return _fallback_embedding(text, "circuit_open"), True
     except Exception as e:
-        print(f"Error generating embedding: {str(e)}")
-        print("Returning fallback embedding")
+        logger.warning("Error generating embedding: %s", e)
+        logger.warning("Returning fallback embedding")
+        return _fallback_embedding(text, "error"), True
 
-        # Create deterministic fallback embedding
-        import hashlib
 
-        hash_obj = hashlib.md5(text.encode())
-        seed = int(hash_obj.hexdigest(), 16) % (2**32)
-        np.random.seed(seed)
+def _fallback_embedding(text, reason):
+    """Deterministic local embedding used when the provider is unavailable"""
+    embedding_fallbacks.inc(reason)
+    return _fallback_provider.embed([text])[0]
 
-        # Create normalized random vector
-        embedding = np.random.randn(768)
-        embedding = embedding / np.linalg.norm(embedding)
 
-        return embedding
+def get_embeddings(texts):
+    """
+    Generate embeddings for many texts with batched provider calls.
 
+    Cached texts are served from the embedding cache and duplicates are only
+    embedded once. The remaining texts are sent in chunks of the provider's
+    batch_size; if a chunk fails, only its texts are retried one by one
+    through get_embedding (and its fallback). While the circuit breaker is
+    open, chunks go straight to the fallback.
 
-def calculate_goal_alignment(funder_description, fundee_description):
-    """Calculate alignment between funder and fundee based on their descriptions"""
-    print("\n===== GOAL ALIGNMENT CALCULATION =====")
-    print(f"Funder description: '{funder_description}'")
-    print(f"Fundee description: '{fundee_description}'")
+    Returns:
+    np.ndarray: float32 matrix with one row per input text, in input order
+    """
+    return get_embeddings_with_fallbacks(texts)[0]
 
-    # Get embeddings from descriptions using Gemini
-    print("\nGenerating funder embedding...")
-    funder_embedding = get_embedding(funder_description)
 
-    print("\nGenerating fundee embedding...")
-    fundee_embedding = get_embedding(fundee_description)
+def get_embeddings_with_fallbacks(texts):
+    """
+    get_embeddings, also marking the rows that are fallback embeddings, for
+    callers that store embeddings and must not keep those as final.
 
-    # Calculate cosine similarity between embeddings
-    print("\nCalculating cosine similarity between embeddings...")
-    similarity = cosine_similarity([funder_embedding], [fundee_embedding])[0][0]
-    print(f"Raw cosine similarity: {similarity}")
+    Returns:
+    tuple: (float32 matrix, bool array that is True for fallback rows)
+    """
+    texts = list(texts)
+    if not texts:
+        return (
+            np.zeros((0, embedding_provider.dimensions), dtype=np.float32),
+            np.zeros(0, dtype=bool),
+        )
 
-    # Convert to 0-100 scale
-    alignment_score = (similarity + 1) / 2 * 100
-    print(f"Normalized score (0-100): ({similarity} + 1) / 2 * 100 = {alignment_score}")
+    embeddings = {}
+    fallback_texts = set()
+    missing = []
+    for text in dict.fromkeys(texts):
+        cache_key = _cache_key(text)
+        cached = embedding_cache.get(cache_key)
+        if cached is not None:
+            embeddings[text] = cached
+        else:
+            missing.append((text, cache_key))
+
+    logger.debug(
+        "Batch embedding %s texts: %s cached or duplicate, %s to generate",
+        len(texts),
+        len(texts) - len(missing),
+        len(missing),
+    )
 
-    print(f"FINAL GOAL ALIGNMENT SCORE: {alignment_score}")
-    print("======================================\n")
+    batch_size = embedding_provider.batch_size
+    for start in range(0, len(missing), batch_size):
+        chunk = missing[start : start + batch_size]
+        start_time = time.time()
+        try:
+            vectors = _provider_embed([text for text, _ in chunk])
+        except EmbeddingCircuitOpen:
+            logger.debug(
+                "Embedding circuit open, returning %s fallback embeddings", len(chunk)
+            )
+            for text, _ in chunk:
+                embeddings[text] = _fallback_embedding(text, "circuit_open")
+                fallback_texts.add(text)
+            continue
+        except Exception as e:
+            logger.warning("Error generating embedding batch: %s", e)
+            logger.warning(
+                "Falling back to per-item embedding for %s texts", len(chunk)
+            )
+            for text, _ in chunk:
+                embeddings[text], is_fallback = _embed_text(text)
+                if is_fallback:
+                    fallback_texts.add(text)
+            continue
 
-    return alignment_score
+        elapsed = time.time() - start_time
+        logger.debug(
+            "Embedding batch of %s generated (time: %.2fs)", len(chunk), elapsed
+        )
+        for (text, cache_key), vector in zip(chunk, vectors):
+            embedding_np = np.array(vector)
+            embedding_cache.put(cache_key, embedding_np)
+            embeddings[text] = embedding_np
 
+    matrix = np.vstack([embeddings[text] for text in texts]).astype(np.float32)
+    return matrix, np.array([text in fallback_texts for text in texts], dtype=bool)
 
-# 5) Location Match Score (Haversine distance for accurate geographic calculation)
-def haversine_distance(lat1, lon1, lat2, lon2):
-    print(
-        f"Calculating Haversine distance between ({lat1}, {lon1}) and ({lat2}, {lon2})"
+
+# Independent embedding calls within a request run on this shared pool
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "8"))
+EMBEDDING_TIMEOUT = float(os.getenv("EMBEDDING_TIMEOUT", "10"))
+_embedding_executor = ThreadPoolExecutor(
+    max_workers=EMBEDDING_WORKERS, thread_name_prefix="embedding"
+)
+
+
+def _reset_after_fork():
+    """Replace per-process state a forked worker must not inherit from its parent"""
+    global _embedding_executor, _gemini_health_lock
+    # Pool threads do not survive fork, but the executor would still count them
+    _embedding_executor = ThreadPoolExecutor(
+        max_workers=EMBEDDING_WORKERS, thread_name_prefix="embedding"
+    )
+    embedding_provider.after_fork()
+    _fallback_provider.after_fork()
+    # Neither do gRPC channels
+    reset_gemini_client()
+    # A lock held by a parent thread at fork time would never be released
+    _gemini_health_lock = threading.Lock()
+    # Counts recorded before the fork belong to the parent
+    metrics.after_fork()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _await_embedding(future, text, deadline):
+    """Wait for an embedding until deadline, falling back if it has not arrived"""
+    try:
+        return future.result(timeout=max(0.0, deadline - time.monotonic()))
+    except FuturesTimeoutError:
+        logger.warning(
+            "Embedding timed out after %.1fs, returning fallback embedding",
+            EMBEDDING_TIMEOUT,
+        )
+        return _fallback_embedding(text, "timeout")
+
+
+def _staged_embedding(text, stage_name):
+    with profiled_task(), stage(stage_name):
+        return get_embedding(text)
+
+
+def submit_embeddings(texts, stages=None):
+    """
+    Start embedding independent texts in parallel on the embedding pool.
+
+    Returns a function that waits for the embeddings, in input order. Each
+    call gets EMBEDDING_TIMEOUT seconds from submission, so the caller can do
+    other work meanwhile and still waits for roughly one round trip.
+
+    Each task runs in a copy of the caller's context, so it keeps the
+    request's debug trace setting, records its time under the matching
+    entry of stages (default "embedding") in the request's timings, and is
+    profiled along with the request when that is.
+    """
+    deadline = time.monotonic() + EMBEDDING_TIMEOUT
+    stages = stages or ["embedding"] * len(texts)
+    futures = [
+        _embedding_executor.submit(
+            contextvars.copy_context().run, _staged_embedding, text, stage_name
+        )
+        for text, stage_name in zip(texts, stages)
+    ]
+
+    def wait():
+        return [
+            _await_embedding(future, text, deadline)
+            for future, text in zip(futures, texts)
+        ]
+
+    return wait
+
+
+def get_embeddings_concurrently(texts, stages=None):
+    """Embed independent texts in parallel and wait for all of them"""
+    return submit_embeddings(texts, stages)()
+
+
+def load_semantic_indexes():
+    """Build the semantic search matrices from their change logs and the embedding cache"""
+    for kind, index in semantic_indexes.items():
+        start_time = time.time()
+        count = index.load()
+        elapsed = time.time() - start_time
+        logger.info(
+            "Loaded %s %s embeddings into semantic index (%.2fs)", count, kind, elapsed
+        )
+        if count:
+            snapshot_semantic_index(kind)
+
+
+def snapshot_semantic_index(kind):
+    """Write the current semantic index of kind to a quantized store and map it"""
+    ids, matrix, keys, version = semantic_indexes[kind].snapshot()
+    store = QuantizedEmbeddingStore.write(
+        os.path.join(EMBEDDING_STORE_DIR, kind), ids, matrix, keys
+    )
+    with _snapshot_lock:
+        embedding_stores[kind] = store
+        _snapshot_staleness[kind] = (store, version, set())
+    logger.info(
+        "Wrote quantized %s snapshot: %s vectors, %s bytes",
+        kind,
+        len(store),
+        store.nbytes,
+    )
+    return store
+
+
+def _current_snapshot(kind):
+    """
+    The quantized store for kind, reopened if another worker has written a
+    newer one, and the ids whose rows in it no longer match the live index.
+
+    Returns:
+    tuple: (store or None, set of stale ids)
+    """
+    index = semantic_indexes[kind]
+    # Replays (which may embed) happen before taking the lock
+    index.sync()
+    with _snapshot_lock:
+        store = embedding_stores.get(kind)
+        if store is None:
+            return None, set()
+        directory = os.path.join(EMBEDDING_STORE_DIR, kind)
+        if QuantizedEmbeddingStore.current_manifest_id(directory) not in (
+            None,
+            store.manifest_id,
+        ):
+            try:
+                store = embedding_stores[kind] = QuantizedEmbeddingStore(directory)
+            except FileNotFoundError:
+                pass  # Replaced again while opening; the next call retries
+
+        cached_store, version, stale = _snapshot_staleness.get(kind, (None, None, None))
+        changed, version = index.changes_since(
+            version if cached_store is store else None
+        )
+        if changed is None:
+            # Compare every id: those in the snapshot and those live now
+            changed = set(store.ids) | set(index.ids())
+            stale = set()
+        for item_id in changed:
+            if store.key(item_id) == index.key(item_id):
+                stale.discard(item_id)
+            else:
+                stale.add(item_id)
+        _snapshot_staleness[kind] = (store, version, stale)
+        return store, set(stale)
+
+
+def quantized_search(kind, query_embedding, top_k, rerank=False):
+    """
+    Search the quantized snapshot of kind, corrected by the live index.
+
+    Rows changed since the snapshot are left out of the quantized scan;
+    those still in the live index are scored exactly instead, so deleted
+    ids never come back, new ids are found and edited descriptions are
+    scored on their current embedding. Once too many rows have changed the
+    snapshot is rewritten.
+
+    Parameters:
+    kind (str): "fundee" or "funder"
+    query_embedding: Query vector
+    top_k (int): Results to return
+    rerank (bool): Re-score the quantized candidates exactly
+
+    Returns:
+    list: (id, cosine similarity) pairs, best first, or None without a snapshot
+    """
+    index = semantic_indexes[kind]
+    store, stale = _current_snapshot(kind)
+    if store is None:
+        return None
+    if len(stale) > max(SNAPSHOT_STALE_MIN, SNAPSHOT_STALE_RATIO * len(store)):
+        logger.info("Rewriting %s snapshot: %s rows changed", kind, len(stale))
+        store = snapshot_semantic_index(kind)
+        stale = set()
+
+    hits = store.search(
+        query_embedding,
+        top_k,
+        rerank=index.vectors if rerank else None,
+        exclude=stale,
     )
+    if stale:
+        query = np.asarray(query_embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+        hits.extend(
+            (item_id, float(vector @ query))
+            for item_id, vector in zip(stale, index.vectors(list(stale)))
+            if vector is not None
+        )
+        hits.sort(key=lambda pair: -pair[1])
+    return hits[:top_k]
+
+
+def load_catalog():
+    """Memory-map the ingested catalog snapshot, if there is one"""
+    global catalog
+    catalog = Catalog.open(CATALOG_DIR)
+    if catalog is None:
+        logger.info("No catalog snapshot in %s (run ingest.py)", CATALOG_DIR)
+    else:
+        logger.info(
+            "Mapped catalog: %s fundees, %s funders",
+            len(catalog.ids("fundee")),
+            len(catalog.ids("funder")),
+        )
+    return catalog
+
 
-    # Convert latitude and longitude from degrees to radians
-    lat1_rad, lon1_rad, lat2_rad, lon2_rad = map(math.radians, [lat1, lon1, lat2, lon2])
-    print(
-        f"Converting to radians: ({lat1_rad}, {lon1_rad}) and ({lat2_rad}, {lon2_rad})"
+def calculate_goal_alignment(funder_description, fundee_description):
+    """Calculate alignment between funder and fundee based on their descriptions"""
+    logger.debug("===== GOAL ALIGNMENT CALCULATION =====")
+    logger.debug("Funder description: '%s'", funder_description)
+    logger.debug("Fundee description: '%s'", fundee_description)
+
+    # Embed both descriptions at once
+    logger.debug("Generating funder and fundee embeddings...")
+    funder_embedding, fundee_embedding = get_embeddings_concurrently(
+        [funder_description, fundee_description],
+        stages=["embedding-funder", "embedding-fundee"],
     )
 
-    # Haversine formula
-    dlon = lon2_rad - lon1_rad
-    dlat = lat2_rad - lat1_rad
-    print(f"Delta latitude: {dlat}, Delta longitude: {dlon}")
+    return goal_alignment_from_embeddings(funder_embedding, fundee_embedding)
+
+
+@timed("similarity")
+def goal_alignment_from_embeddings(funder_embedding, fundee_embedding):
+    """Goal alignment score (0-100) from two already generated embeddings"""
+    from sklearn.metrics.pairwise import cosine_similarity  # type: ignore
 
-    a = (
-        math.sin(dlat / 2) ** 2
-        + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon / 2) ** 2
+    # Calculate cosine similarity between embeddings
+    logger.debug("Calculating cosine similarity between embeddings...")
+    similarity = cosine_similarity([funder_embedding], [fundee_embedding])[0][0]
+    logger.debug("Raw cosine similarity: %s", similarity)
+
+    # Convert to 0-100 scale
+    alignment_score = (similarity + 1) / 2 * 100
+    logger.debug(
+        "Normalized score (0-100): (%s + 1) / 2 * 100 = %s", similarity, alignment_score
     )
-    print(f"Haversine formula 'a' component: {a}")
 
-    c = 2 * math.asin(math.sqrt(a))
-    print(f"Haversine formula 'c' component: {c}")
+    logger.debug("FINAL GOAL ALIGNMENT SCORE: %s", alignment_score)
+    logger.debug("======================================")
+
+    return alignment_score
 
-    r = 6371  # Radius of Earth in kilometers
-    distance = c * r
-    print(f"Final distance: {distance} km")
 
-    return distance
+# 5) Location Match Score (Haversine distance for accurate geographic calculation)
+def haversine_distance(lat1, lon1, lat2, lon2):
+    """Distance in km between two points; a 1x1 case of the vectorized matrix"""
+    return float(haversine_distance_matrix([lat1], [lon1], [lat2], [lon2])[0, 0])
 
 
+@timed("scoring")
+@memoized
 def calculate_location_match(funder_location, fundee_location):
-    print("\n===== LOCATION MATCH CALCULATION =====")
-    print(f"Funder location: {funder_location}")
-    print(f"Fundee location: {fundee_location}")
+    logger.debug("===== LOCATION MATCH CALCULATION =====")
+    logger.debug("Funder location: %s", funder_location)
+    logger.debug("Fundee location: %s", fundee_location)
 
     try:
         # Extract latitude and longitude
         funder_lat, funder_lon = funder_location
         fundee_lat, fundee_lon = fundee_location
 
-        # Calculate distance using Haversine formula
-        distance = haversine_distance(funder_lat, funder_lon, fundee_lat, fundee_lon)
-        print(f"Distance between locations: {distance:.2f} km")
+        # Calculate distance using the vectorized Haversine matrix
+        distance = haversine_distance_matrix(
+            [funder_lat], [funder_lon], [fundee_lat], [fundee_lon]
+        )[0, 0]
+        logger.debug("Distance between locations: %.2f km", distance)
 
         # Convert to score (closer = higher score)
         # 20000 km is approximately half the Earth's circumference
-        location_score = max(0, 100 - (distance / 200))  # Normalize to 0-100
-        print(
-            f"Location score formula: max(0, 100 - ({distance} / 200)) = {location_score}"
+        location_score = float(location_scores(distance))  # Normalize to 0-100
+        logger.debug(
+            "Location score formula: max(0, 100 - (%s / 200)) = %s",
+            distance,
+            location_score,
         )
 
-        print(f"FINAL LOCATION MATCH SCORE: {location_score}")
-        print("=====================================\n")
+        logger.debug("FINAL LOCATION MATCH SCORE: %s", location_score)
+        logger.debug("=====================================")
 
         return location_score
     except Exception as e:
-        print(f"Error calculating location match: {str(e)}")
-        print("Using default score of 50")
+        logger.debug("Error calculating location match: %s", e)
+        logger.debug("Using default score of 50")
         # Return default score if calculation fails
         return 50
 
 
 # 6) Funding Capability Match Score
+@timed("scoring")
+@memoized
 def calculate_funding_capability_match(funder_capability, fundee_needs):
-    print("\n===== FUNDING CAPABILITY MATCH CALCULATION =====")
-    print(f"Funder capability: {funder_capability}")
-    print(f"Fundee needs: {fundee_needs}")
+    logger.debug("===== FUNDING CAPABILITY MATCH CALCULATION =====")
+    logger.debug("Funder capability: %s", funder_capability)
+    logger.debug("Fundee needs: %s", fundee_needs)
 
     # Simple comparison check
     if fundee_needs <= 0:
-        print(
-            f"Fundee needs is {fundee_needs} (≤ 0), returning perfect match score of 100"
+        logger.debug(
+            "Fundee needs is %s (≤ 0), returning perfect match score of 100",
+            fundee_needs,
         )
         return 100  # No needs means perfect match
 
     if funder_capability >= fundee_needs:
         match_score = 100  # Can fully fund the needs
-        print(
-            f"Funder can fully meet fundee needs ({funder_capability} ≥ {fundee_needs}), score = 100"
+        logger.debug(
+            "Funder can fully meet fundee needs (%s ≥ %s), score = 100",
+            funder_capability,
+            fundee_needs,
         )
     else:
         # Partial match percentage
         match_score = (funder_capability / fundee_needs) * 100
-        print(
-            f"Partial funding match: ({funder_capability} / {fundee_needs}) * 100 = {match_score}"
+        logger.debug(
+            "Partial funding match: (%s / %s) * 100 = %s",
+            funder_capability,
+            fundee_needs,
+            match_score,
         )
 
-    print(f"FINAL FUNDING CAPABILITY MATCH SCORE: {match_score}")
-    print("==============================================\n")
+    logger.debug("FINAL FUNDING CAPABILITY MATCH SCORE: %s", match_score)
+    logger.debug("==============================================")
 
     return match_score
-@app.route('/api/risk-score', methods=['POST'])
-def risk_score_endpoint():
-    try:
-        data = request.json
 
-        
-        # Create data dictionary with only the necessary fields
-        risk_data = {
-            'total_credits': data.get('total_credits'),
-            'expected_credits': data.get('expected_credits'),
-            'amount_invested': data.get('amount_invested')
-        }
-        
-        # Calculate the risk score
-        risk_score = calculate_risk_score(risk_data)
-        
-        return jsonify({
-            'success': True,
-            'risk_score': risk_score
-        })
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
 
-@app.route("/api/efficiency-score", methods=["POST"])
-def efficiency_score_endpoint():
-    try:
-        print("\n[ENDPOINT] Processing /api/efficiency-score request")
-        data = request.json
-        total_credits = data.get("total_credits")
-        expected_credits = data.get("expected_credits")
-        amount_invested = data.get("amount_invested")
+# Combined per-pair scores for one funder/fundee card
+DYNAMIC_SCORE_FIELDS = (
+    "funder_description",
+    "fundee_description",
+    "funder_location",
+    "fundee_location",
+    "funder_capability",
+    "fundee_needs",
+)
 
-        efficiency_score = calculate_efficiency_score(
-            total_credits, expected_credits, amount_invested
-        )
 
-        print(f"[ENDPOINT] Returning efficiency score: {efficiency_score}")
-        return jsonify({"success": True, "efficiency_score": efficiency_score})
-    except Exception as e:
-        print(f"[ERROR] Efficiency score calculation failed: {str(e)}")
-        return jsonify({"error": str(e)}), 500
+def calculate_dynamic_scores(data):
+    """
+    Goal alignment, location match and funding capability match in one pass.
 
+    The two embeddings are started on the embedding pool first, and the
+    location and funding stages run while they are in flight.
 
-@app.route("/api/impact-score", methods=["POST"])
-def impact_score_endpoint():
-    try:
-        print("\n[ENDPOINT] Processing /api/impact-score request")
-        data = request.json
-        total_credits = data.get("total_credits")
+    Returns:
+    tuple: (scores dict, per-stage timings in milliseconds)
+    """
+    stage_ms = {}
+    start = time.perf_counter()
 
-        impact_score = calculate_impact_score(total_credits)
+    wait_for_embeddings = submit_embeddings(
+        [data["funder_description"], data["fundee_description"]],
+        stages=["embedding-funder", "embedding-fundee"],
+    )
 
-        print(f"[ENDPOINT] Returning impact score: {impact_score}")
-        return jsonify({"success": True, "impact_score": impact_score})
-    except Exception as e:
-        print(f"[ERROR] Impact score calculation failed: {str(e)}")
-        return jsonify({"error": str(e)}), 500
+    stage_start = time.perf_counter()
+    location_score = calculate_location_match(
+        data["funder_location"], data["fundee_location"]
+    )
+    stage_ms["location_match_ms"] = (time.perf_counter() - stage_start) * 1000
 
+    stage_start = time.perf_counter()
+    funding_score = calculate_funding_capability_match(
+        data["funder_capability"], data["fundee_needs"]
+    )
+    stage_ms["funding_capability_match_ms"] = (time.perf_counter() - stage_start) * 1000
+
+    # The embeddings have been in flight since the start; this stage is the
+    # wait for whatever is left of them plus the similarity
+    stage_start = time.perf_counter()
+    funder_embedding, fundee_embedding = wait_for_embeddings()
+    alignment_score = goal_alignment_from_embeddings(funder_embedding, fundee_embedding)
+    stage_ms["goal_alignment_ms"] = (time.perf_counter() - stage_start) * 1000
+
+    stage_ms["total_ms"] = (time.perf_counter() - start) * 1000
+    scores = {
+        "goal_alignment_score": float(alignment_score),
+        "location_match_score": location_score,
+        "funding_capability_match_score": funding_score,
+    }
+    return scores, stage_ms
 
-@app.route("/api/goal-alignment", methods=["POST"])
-def goal_alignment_endpoint():
-    try:
-        print("\n[ENDPOINT] Processing /api/goal-alignment request")
-        data = request.json
-        if (
-            not data
-            or "funder_description" not in data
-            or "fundee_description" not in data
-        ):
-            print("Error: Missing description data")
-            return jsonify({"error": "Missing description data"}), 400
 
-        funder_description = data["funder_description"]
-        fundee_description = data["fundee_description"]
+# 7) Vectorized scoring over many fundees at once
+# These mirror the scalar calculate_* functions above, but take one value per
+# candidate and operate on whole NumPy arrays instead of looping in Python.
+def _to_float_array(values, default=0.0):
+    """Convert a list that may contain None into a float array, substituting default"""
+    return np.array(
+        [default if value is None else value for value in values], dtype=float
+    )
 
-        alignment_score = calculate_goal_alignment(
-            funder_description, fundee_description
-        )
 
-        print(f"[ENDPOINT] Returning goal alignment score: {alignment_score}")
-        return jsonify({"success": True, "goal_alignment_score": alignment_score})
-    except Exception as e:
-        print(f"[ERROR] Goal alignment calculation failed: {str(e)}")
-        return jsonify({"error": str(e)}), 500
+def _to_location_arrays(locations):
+    """Split [lat, lon] pairs into two arrays; malformed entries become NaN"""
+    lats = np.full(len(locations), np.nan)
+    lons = np.full(len(locations), np.nan)
+    for i, location in enumerate(locations):
+        try:
+            lat, lon = location
+            lats[i], lons[i] = float(lat), float(lon)
+        except (TypeError, ValueError):
+            continue
+    return lats, lons
 
 
-@app.route("/api/location-match", methods=["POST"])
-def location_match_endpoint():
-    try:
-        print("\n[ENDPOINT] Processing /api/location-match request")
-        data = request.json
-        if not data or "funder_location" not in data or "fundee_location" not in data:
-            print("Error: Missing location data")
-            return jsonify({"error": "Missing location data"}), 400
+_log10 = np.frompyfunc(math.log10, 1, 1)
 
-        funder_location = data["funder_location"]
-        fundee_location = data["fundee_location"]
 
-        location_score = calculate_location_match(funder_location, fundee_location)
+@timed("scoring")
+def calculate_risk_scores(total_credits, expected_credits, amount_invested):
+    """Vectorized calculate_risk_score; missing values are treated as 0"""
+    tc = _to_float_array(total_credits)
+    ec = _to_float_array(expected_credits)
+    ai = _to_float_array(amount_invested)
 
-        print(f"[ENDPOINT] Returning location match score: {location_score}")
-        return jsonify({"success": True, "location_match_score": location_score})
-    except Exception as e:
-        print(f"[ERROR] Location match calculation failed: {str(e)}")
-        return jsonify({"error": str(e)}), 500
+    risk_scores = np.full(tc.shape, 50.0)
 
+    # Adjust risk based on credit delivery ratio
+    has_expected = ec > 0
+    delivery_ratio = np.divide(tc, ec, out=np.ones_like(tc), where=has_expected)
+    risk_scores += np.where(has_expected, (delivery_ratio - 1) * -25, 0.0)
 
-@app.route("/api/funding-capability-match", methods=["POST"])
-def funding_capability_match_endpoint():
-    try:
-        print("\n[ENDPOINT] Processing /api/funding-capability-match request")
-        data = request.json
-        if not data or "funder_capability" not in data or "fundee_needs" not in data:
-            print("Error: Missing capability/needs data")
-            return jsonify({"error": "Missing capability/needs data"}), 400
+    # Adjust risk based on cost-effectiveness
+    has_cost = (tc > 0) & (ai > 0)
+    cost_per_ton = np.divide(ai, tc, out=np.zeros_like(tc), where=has_cost)
+    cost_adjustment = np.select(
+        [cost_per_ton < 50, cost_per_ton < 100, cost_per_ton < 150, cost_per_ton > 250],
+        [-15.0, -10.0, -5.0, 15.0],
+        default=0.0,
+    )
+    risk_scores += np.where(has_cost, cost_adjustment, 0.0)
 
-        funder_capability = data["funder_capability"]
-        fundee_needs = data["fundee_needs"]
+    return np.round(np.clip(risk_scores, 0, 100))
 
-        match_score = calculate_funding_capability_match(
-            funder_capability, fundee_needs
-        )
 
-        print(f"[ENDPOINT] Returning funding capability match score: {match_score}")
-        return jsonify({"success": True, "funding_capability_match_score": match_score})
-    except Exception as e:
-        print(f"[ERROR] Funding capability match calculation failed: {str(e)}")
-        return jsonify({"error": str(e)}), 500
+@timed("scoring")
+def calculate_efficiency_scores(total_credits, expected_credits, amount_invested):
+    """Vectorized calculate_efficiency_score, with the same None defaults"""
+    tc = _to_float_array(total_credits, default=500)
+    ec = _to_float_array(expected_credits, default=1000)
+    ai = _to_float_array(amount_invested, default=100000)
 
+    has_investment = ai > 0
+    efficiency = np.divide(tc + ec, ai, out=np.zeros_like(ai), where=has_investment)
+    return np.where(has_investment, np.minimum(100, efficiency * 10000), 0.0)
 
-@app.route("/", methods=["GET"])
-def health_check():
-    print("\n[ENDPOINT] Health check requested")
-    return jsonify({"status": "API is running"})
 
+@timed("scoring")
+def calculate_impact_scores(total_credits):
+    """Vectorized calculate_impact_score, with the same None default"""
+    tc = _to_float_array(total_credits, default=500)
 
-# Add debugging for incoming requests
-@app.before_request
-def log_request_info():
-    print(f"\n[REQUEST] {request.method} {request.path}")
-    if request.headers:
-        print(f"[HEADERS] Content-Type: {request.headers.get('Content-Type')}")
-    if request.is_json:
-        print(f"[DATA] JSON data received: {request.json}")
+    # np.log10 can differ from math.log10 in the last bit, so apply the same
+    # libm routine element-wise to keep results identical to the scalar version
+    has_credits = tc > 0
+    log_value = np.zeros_like(tc)
+    log_value[has_credits] = _log10(tc[has_credits])
+    return np.where(has_credits, np.minimum(100, 23 * log_value), 0.0)
 
 
-# Add a test endpoint for checking Gemini connectivity
-@app.route("/api/test-gemini", methods=["GET"])
-def test_gemini():
+@timed("scoring")
+def calculate_location_matches(funder_location, fundee_locations):
+    """Vectorized calculate_location_match; unusable locations score 50"""
+    fundee_lats, fundee_lons = _to_location_arrays(fundee_locations)
     try:
-        print("\n[ENDPOINT] Testing Gemini API connection")
-        result = initialize_gemini()
-        if result:
-            return jsonify(
-                {"success": True, "message": "Gemini API connection successful"}
-            )
-        else:
-            return (
-                jsonify(
-                    {"success": False, "message": "Failed to connect to Gemini API"}
-                ),
-                500,
-            )
-    except Exception as e:
-        print(f"[ERROR] Gemini API test failed: {str(e)}")
-        return jsonify({"success": False, "error": str(e)}), 500
+        funder_lat, funder_lon = (float(value) for value in funder_location)
+    except (TypeError, ValueError):
+        return np.full(len(fundee_locations), 50.0)
 
+    distances = haversine_distance_matrix(
+        [funder_lat], [funder_lon], fundee_lats, fundee_lons
+    )
+    return location_scores(distances[0])
 
-if __name__ == "__main__":
-    print("\n====== STARTING CARBON API SERVER ======")
-    print("Starting Flask server...")
-    print("Testing Gemini API connection...")
-    if initialize_gemini():
-        print("Gemini API connection successful!")
-    else:
-        print(
-            "Warning: Could not connect to Gemini API. Please check your API key and internet connection."
-        )
 
-    print("\nServer is ready to accept requests")
-    print("======================================\n")
-    app.run(debug=True, host="0.0.0.0", port=5001)
+@timed("scoring")
+def calculate_funding_capability_matches(funder_capability, fundee_needs):
+    """
+    Vectorized calculate_funding_capability_match.
+
+    funder_capability is one number, or a column of shape (funders, 1) to
+    score every funder against every fundee at once.
+    """
+    needs, capability = np.broadcast_arrays(
+        _to_float_array(fundee_needs), np.asarray(funder_capability, dtype=float)
+    )
+
+    partial = (
+        np.divide(capability, needs, out=np.ones(needs.shape), where=needs > 0) * 100
+    )
+    return np.where((needs <= 0) | (capability >= needs), 100.0, partial)
+
+
+def calculate_goal_alignments(funder_description, fundee_descriptions):
+    """Goal alignment of one funder against many fundees in a single matrix product"""
+    # The funder embedding is fetched on the pool while the fundee batch runs here
+    wait_for_funder = submit_embeddings(
+        [funder_description], stages=["embedding-funder"]
+    )
+    with stage("embedding-fundee"):
+        fundee_embeddings = get_embeddings(fundee_descriptions)
+    [funder_embedding] = wait_for_funder()
+    return goal_alignments_from_embeddings(funder_embedding, fundee_embeddings)
+
+
+@timed("similarity")
+def goal_alignments_from_embeddings(funder_embedding, fundee_embeddings):
+    """Goal alignment scores (0-100) of one funder embedding against a matrix of them"""
+    # Cosine similarity, matching sklearn's handling of zero-norm vectors
+    funder_norm = np.linalg.norm(funder_embedding) or 1.0
+    fundee_norms = np.linalg.norm(fundee_embeddings, axis=1)
+    fundee_norms[fundee_norms == 0] = 1.0
+    similarities = (fundee_embeddings @ funder_embedding) / (fundee_norms * funder_norm)
+
+    return (similarities + 1) / 2 * 100
+
+
+# Weights follow CarbonMatchmaker.rank_matches in archive/text.txt
+DEFAULT_RANK_WEIGHTS = {
+    "mission_alignment": 0.3,
+    "funding_match": 0.2,
+    "risk_compatibility": 0.15,
+    "impact_score": 0.2,
+    "location": 0.1,
+    "efficiency": 0.05,
+}
+
+
+def _resolve_rank_weights(weights):
+    """Defaults overlaid with the caller's weights; unknown keys are an error"""
+    weights = {**DEFAULT_RANK_WEIGHTS, **(weights or {})}
+    unknown = set(weights) - set(DEFAULT_RANK_WEIGHTS)
+    if unknown:
+        raise ValueError(f"Unknown weight keys: {sorted(unknown)}")
+    return weights
+
+
+def _rank_components(funder, fundees, weights, include_alignment=True):
+    """
+    Vectorized component scores for rank_matches, keyed by weight name.
+
+    Components with zero weight are skipped, which avoids embedding calls
+    entirely when mission_alignment is switched off.
+    """
+
+    def column(key):
+        return [fundee.get(key) for fundee in fundees]
+
+    components = {}
+    if include_alignment and weights["mission_alignment"]:
+        components["mission_alignment"] = calculate_goal_alignments(
+            funder.get("funder_description", ""),
+            [description or "" for description in column("fundee_description")],
+        )
+    if weights["funding_match"]:
+        components["funding_match"] = calculate_funding_capability_matches(
+            funder.get("funder_capability") or 0, column("fundee_needs")
+        )
+    if weights["risk_compatibility"]:
+        # Risk score is lower-is-better, so invert it for the composite
+        components["risk_compatibility"] = 100 - calculate_risk_scores(
+            column("total_credits"),
+            column("expected_credits"),
+            column("amount_invested"),
+        )
+    if weights["impact_score"]:
+        components["impact_score"] = calculate_impact_scores(column("total_credits"))
+    if weights["location"]:
+        components["location"] = calculate_location_matches(
+            funder.get("funder_location"), column("fundee_location")
+        )
+    if weights["efficiency"]:
+        components["efficiency"] = calculate_efficiency_scores(
+            column("total_credits"),
+            column("expected_credits"),
+            column("amount_invested"),
+        )
+    return components
+
+
+@timed("scoring")
+def _composite_scores(components, weights, n):
+    composite = np.zeros(n)
+    for name, scores in components.items():
+        composite += weights[name] * scores
+    return composite
+
+
+_top_indices = timed("scoring")(top_indices)
+
+
+def _match_dicts(fundees, positions, composite, components, top):
+    """Match dicts for rows top of the score arrays; positions maps rows to fundees"""
+    results = []
+    for i in top:
+        index = int(positions[i])
+        match = {
+            "index": index,
+            "id": fundees[index].get("id"),
+            "composite_score": float(composite[i]),
+        }
+        for name, scores in components.items():
+            match[name] = float(scores[i])
+        results.append(match)
+    return results
+
+
+def rank_matches(funder, fundees, weights=None, top_k=None):
+    """
+    Rank fundees for one funder by a weighted composite of the sub-scores.
+
+    Parameters:
+    funder (dict): funder_description, funder_location, funder_capability
+    fundees (list): Dicts with fundee_description, fundee_location, fundee_needs,
+        total_credits, expected_credits and amount_invested
+    weights (dict): Subset of DEFAULT_RANK_WEIGHTS keys; missing keys use defaults
+    top_k (int): Number of matches to return (all when None)
+
+    Returns:
+    list: Match dicts sorted by composite_score (0-100, higher is better)
+    """
+    weights = _resolve_rank_weights(weights)
+
+    n = len(fundees)
+    if n == 0:
+        return []
+
+    components = _rank_components(funder, fundees, weights)
+    composite = _composite_scores(components, weights, n)
+    top = _top_indices(composite, top_k)
+    return _match_dicts(fundees, np.arange(n), composite, components, top)
+
+
+# Candidates scored per chunk by iter_rank_matches
+RANK_STREAM_CHUNK_SIZE = int(os.getenv("RANK_STREAM_CHUNK_SIZE", "500"))
+
+
+def _int_option(value, name, minimum):
+    """value as an int of at least minimum (None stays None); ValueError otherwise"""
+    if value is None:
+        return None
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be an integer") from None
+    if number < minimum:
+        raise ValueError(f"{name} must be at least {minimum}")
+    return number
+
+
+def iter_rank_matches(funder, fundees, weights=None, top_k=None, chunk_size=None):
+    """
+    Score fundees chunk_size at a time, yielding events as each chunk is done.
+
+    Only one chunk's scores are held at a time, plus the running top_k, so
+    the time to the first event and the working memory do not grow with the
+    number of candidates.
+
+    Returns:
+    iterator: Event dicts: {"event": "chunk", "offset", "matches"} with every
+        match dict of the chunk in input order; then, when top_k is set,
+        {"event": "top_k", "matches"} with the provisional top_k so far; and
+        finally {"event": "done", "count"}. The last top_k event equals
+        rank_matches(funder, fundees, weights, top_k).
+
+    Invalid weights, top_k or chunk_size raise ValueError from this call,
+    before any event is produced, rather than partway through the stream.
+    """
+    weights = _resolve_rank_weights(weights)
+    return _rank_match_events(
+        funder,
+        fundees,
+        weights,
+        _int_option(top_k, "top_k", minimum=0),
+        _int_option(chunk_size, "chunk_size", minimum=1) or RANK_STREAM_CHUNK_SIZE,
+    )
+
+
+def _rank_match_events(funder, fundees, weights, top_k, chunk_size):
+    best_scores = np.zeros(0)
+    best_matches = []
+    for offset in range(0, len(fundees), chunk_size):
+        chunk = fundees[offset : offset + chunk_size]
+        components = _rank_components(funder, chunk, weights)
+        composite = _composite_scores(components, weights, len(chunk))
+        matches = _match_dicts(
+            chunk, np.arange(len(chunk)), composite, components, range(len(chunk))
+        )
+        for match in matches:
+            match["index"] += offset
+        yield {"event": "chunk", "offset": offset, "matches": matches}
+
+        if top_k is not None:
+            candidates = np.concatenate([best_scores, composite])
+            pool = best_matches + matches
+            top = _top_indices(candidates, top_k)
+            best_scores = candidates[top]
+            best_matches = [pool[i] for i in top]
+            yield {"event": "top_k", "matches": best_matches}
+
+    yield {"event": "done", "count": len(fundees)}
+
+
+def rank_catalog_matches(funder, weights=None, top_k=10):
+    """
+    Rank the catalog's fundees for one funder.
+
+    As rank_matches, except that mission alignment uses the embeddings
+    stored in the catalog snapshot, so only the funder description is
+    embedded. Match dicts also carry the catalog name of each fundee.
+    """
+    weights = _resolve_rank_weights(weights)
+    fundees = catalog.profiles("fundee")
+    n = len(fundees)
+    if n == 0:
+        return []
+
+    components = _rank_components(funder, fundees, weights, include_alignment=False)
+    if weights["mission_alignment"]:
+        with stage("embedding-funder"):
+            funder_embedding = get_embedding(funder.get("funder_description", ""))
+        components["mission_alignment"] = goal_alignments_from_embeddings(
+            funder_embedding, catalog.embeddings("fundee")
+        )
+    composite = _composite_scores(components, weights, n)
+    top = _top_indices(composite, top_k)
+    matches = _match_dicts(fundees, np.arange(n), composite, components, top)
+    for match in matches:
+        match["name"] = fundees[match["index"]].get("name")
+    return matches
+
+
+def composite_score_block(funders, fundees, weights=None):
+    """
+    Composite scores of every funder against every fundee.
+
+    Each row is what rank_matches computes for that funder, but all rows are
+    scored together: one embedding batch per side, one similarity matrix
+    product and broadcast numeric scores.
+
+    Returns:
+    np.ndarray: (len(funders), len(fundees)) composite scores
+    """
+    weights = _resolve_rank_weights(weights)
+    composite = np.zeros((len(funders), len(fundees)))
+    if not funders or not fundees:
+        return composite
+
+    def column(items, key):
+        return [item.get(key) for item in items]
+
+    if weights["mission_alignment"]:
+        with stage("embedding-funder"):
+            funder_embeddings = get_embeddings(
+                [text or "" for text in column(funders, "funder_description")]
+            )
+        with stage("embedding-fundee"):
+            fundee_embeddings = get_embeddings(
+                [text or "" for text in column(fundees, "fundee_description")]
+            )
+        # Cosine similarity, matching sklearn's handling of zero-norm vectors
+        with stage("similarity"):
+            funder_norms = np.linalg.norm(funder_embeddings, axis=1)
+            funder_norms[funder_norms == 0] = 1.0
+            fundee_norms = np.linalg.norm(fundee_embeddings, axis=1)
+            fundee_norms[fundee_norms == 0] = 1.0
+            similarities = (funder_embeddings @ fundee_embeddings.T) / np.outer(
+                funder_norms, fundee_norms
+            )
+        composite += weights["mission_alignment"] * ((similarities + 1) / 2 * 100)
+    if weights["funding_match"]:
+        capabilities = [
+            capability or 0 for capability in column(funders, "funder_capability")
+        ]
+        composite += weights["funding_match"] * calculate_funding_capability_matches(
+            _to_float_array(capabilities)[:, None], column(fundees, "fundee_needs")
+        )
+    if weights["risk_compatibility"]:
+        composite += weights["risk_compatibility"] * (
+            100
+            - calculate_risk_scores(
+                column(fundees, "total_credits"),
+                column(fundees, "expected_credits"),
+                column(fundees, "amount_invested"),
+            )
+        )
+    if weights["impact_score"]:
+        composite += weights["impact_score"] * calculate_impact_scores(
+            column(fundees, "total_credits")
+        )
+    if weights["location"]:
+        funder_lats, funder_lons = _to_location_arrays(
+            column(funders, "funder_location")
+        )
+        fundee_lats, fundee_lons = _to_location_arrays(
+            column(fundees, "fundee_location")
+        )
+        composite += weights["location"] * location_scores(
+            haversine_distance_matrix(
+                funder_lats, funder_lons, fundee_lats, fundee_lons
+            )
+        )
+    if weights["efficiency"]:
+        composite += weights["efficiency"] * calculate_efficiency_scores(
+            column(fundees, "total_credits"),
+            column(fundees, "expected_credits"),
+            column(fundees, "amount_invested"),
+        )
+    return composite
+
+
+# Materialized funder x fundee composite scores, updated one row or column
+# at a time as profiles change (see /api/score-matrix). Workers share
+# updates through a change log and replay each other's before answering.
+SCORE_MATRIX_DIR = os.getenv(
+    "SCORE_MATRIX_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".score_matrix"),
+)
+score_matrix = ScoreMatrix(
+    composite_score_block,
+    log_path=os.path.join(SCORE_MATRIX_DIR, "profiles.log"),
+)
+
+
+# Candidates passed on to the semantic stage of cascade_rank_matches
+CASCADE_SEMANTIC_TOP_M = int(os.getenv("CASCADE_SEMANTIC_TOP_M", "100"))
+
+
+def _membership_mask(values, allowed):
+    """True where a value is in allowed (case-insensitive) or missing"""
+    values = np.array(
+        [str(value).strip().lower() if value else "" for value in values], dtype=object
+    )
+    allowed = [str(value).strip().lower() for value in allowed]
+    return (values == "") | np.isin(values, allowed)
+
+
+def cascade_rank_matches(
+    funder,
+    fundees,
+    weights=None,
+    top_k=10,
+    semantic_top_m=None,
+    max_distance_km=None,
+):
+    """
+    Rank fundees in three stages so only promising candidates are embedded.
+
+    1. Hard filters drop fundees whose needs exceed funder_capability, whose
+       stage is not in funding_stages, whose mcdr_type is not in focus_areas,
+       or (with max_distance_km) that are too far away. Each filter applies
+       only when the funder states it; fundees missing the field pass.
+    2. The survivors get the cheap numeric scores, and the best
+       semantic_top_m by that partial composite move on.
+    3. Mission alignment is added for those, and they are ranked by the
+       full composite, exactly as rank_matches would score them.
+
+    Parameters:
+    funder (dict): As for rank_matches, plus optional funding_stages and focus_areas
+    fundees (list): As for rank_matches, plus optional stage and mcdr_type
+    weights (dict): As for rank_matches
+    top_k (int): Number of matches to return; when None, every shortlisted
+        candidate: all survivors of stage 1 if mission_alignment has no
+        weight, otherwise the semantic_top_m from stage 2
+    semantic_top_m (int): Candidates embedded in stage 3 (CASCADE_SEMANTIC_TOP_M)
+    max_distance_km (float): Distance cutoff from funder_location (none when None)
+
+    Returns:
+    tuple: (match dicts as from rank_matches, per-stage report)
+    """
+    weights = _resolve_rank_weights(weights)
+    if semantic_top_m is None:
+        semantic_top_m = CASCADE_SEMANTIC_TOP_M
+    if top_k is not None:
+        semantic_top_m = max(int(semantic_top_m), int(top_k))
+
+    n = len(fundees)
+
+    def column(key):
+        return [fundee.get(key) for fundee in fundees]
+
+    # Stage 1: boolean masks; a candidate is counted against the first filter
+    # that rejects it
+    keep = np.ones(n, dtype=bool)
+    dropped_by = {}
+
+    def apply_filter(name, passes):
+        nonlocal keep
+        dropped_by[name] = int(np.count_nonzero(keep & ~passes))
+        keep &= passes
+
+    capability = funder.get("funder_capability")
+    if capability:
+        needs = _to_float_array(column("fundee_needs"), default=np.nan)
+        apply_filter("funding", ~(needs > float(capability)))
+    if funder.get("funding_stages"):
+        apply_filter(
+            "stage", _membership_mask(column("stage"), funder["funding_stages"])
+        )
+    if funder.get("focus_areas"):
+        apply_filter(
+            "focus_area", _membership_mask(column("mcdr_type"), funder["focus_areas"])
+        )
+    if max_distance_km is not None and funder.get("funder_location"):
+        funder_lats, funder_lons = _to_location_arrays([funder["funder_location"]])
+        lats, lons = _to_location_arrays(column("fundee_location"))
+        distances = haversine_distance_matrix(funder_lats, funder_lons, lats, lons)[0]
+        apply_filter("distance", ~(distances > float(max_distance_km)))
+
+    positions = np.flatnonzero(keep)
+    survivors = [fundees[i] for i in positions]
+
+    # Stage 2: cheap scores on the survivors, keep the best semantic_top_m
+    cheap = _rank_components(funder, survivors, weights, include_alignment=False)
+    shortlist = np.arange(len(survivors))
+    if weights["mission_alignment"]:
+        shortlist = _top_indices(
+            _composite_scores(cheap, weights, len(survivors)), semantic_top_m
+        )
+
+    # Stage 3: embed the shortlist only and rank on the full composite
+    shortlisted = [survivors[i] for i in shortlist]
+    components = {}
+    if weights["mission_alignment"] and shortlisted:
+        components["mission_alignment"] = calculate_goal_alignments(
+            funder.get("funder_description", ""),
+            [fundee.get("fundee_description") or "" for fundee in shortlisted],
+        )
+    components.update({name: scores[shortlist] for name, scores in cheap.items()})
+    composite = _composite_scores(components, weights, len(shortlist))
+    top = _top_indices(composite, top_k)
+    matches = _match_dicts(fundees, positions[shortlist], composite, components, top)
+
+    report = {
+        "candidates": n,
+        "stages": [
+            {
+                "stage": "filters",
+                "dropped": n - len(survivors),
+                "dropped_by": dropped_by,
+                "remaining": len(survivors),
+            },
+            {
+                "stage": "cheap_scores",
+                "dropped": len(survivors) - len(shortlist),
+                "remaining": len(shortlist),
+            },
+            {
+                "stage": "semantic",
+                "dropped": len(shortlist) - len(matches),
+                "remaining": len(matches),
+            },
+        ],
+        "embedded": len(shortlisted) if weights["mission_alignment"] else 0,
+    }
+    logger.debug("Cascade ranking report: %s", report)
+    return matches, report
+
+
+# Bump when the risk/efficiency/impact formulas change, so that every stored
+# base score is treated as stale on the next precomputation run
+BASE_SCORE_VERSION = 1
+
+
+def base_score_inputs(total_credits, expected_credits, amount_invested):
+    """Fingerprint of everything the base scores of one fundee depend on"""
+    return f"v{BASE_SCORE_VERSION}:{total_credits}:{expected_credits}:{amount_invested}"
+
+
+def calculate_base_scores(
+    ids, total_credits, expected_credits, amount_invested, previous_inputs=None
+):
+    """
+    Risk, efficiency and impact scores for a whole table of fundees.
+
+    Rows whose base_score_inputs fingerprint matches previous_inputs are
+    skipped, so a re-run only recomputes fundees whose inputs changed.
+
+    Returns:
+    list: One dict per recomputed fundee with its scores and new fingerprint
+    """
+    inputs = [
+        base_score_inputs(tc, ec, ai)
+        for tc, ec, ai in zip(total_credits, expected_credits, amount_invested)
+    ]
+    previous_inputs = previous_inputs or [None] * len(ids)
+    changed = [
+        i for i, (new, old) in enumerate(zip(inputs, previous_inputs)) if new != old
+    ]
+    if not changed:
+        return []
+
+    def rows(column):
+        return [column[i] for i in changed]
+
+    risk = calculate_risk_scores(
+        rows(total_credits), rows(expected_credits), rows(amount_invested)
+    )
+    efficiency = calculate_efficiency_scores(
+        rows(total_credits), rows(expected_credits), rows(amount_invested)
+    )
+    impact = calculate_impact_scores(rows(total_credits))
+
+    return [
+        {
+            "id": ids[i],
+            "risk_score": int(risk[j]),
+            "efficiency_score": float(efficiency[j]),
+            "impact_score": float(impact[j]),
+            "base_scores_inputs": inputs[i],
+        }
+        for j, i in enumerate(changed)
+    ]
+
+
+def _request_data():
+    """
+    Decoded request data, parsed at most once per request.
+
+    POST bodies are JSON, or MessagePack when sent with a MessagePack
+    Content-Type; for GET, query parameters are decoded as JSON where
+    possible.
+    """
+    if request.method != "GET":
+        if request.mimetype not in MSGPACK_MIMETYPES:
+            # Werkzeug caches the parsed JSON on the request
+            return request.json
+        if "msgpack_body" not in g:
+            g.msgpack_body = msgpack_loads(request.get_data(cache=False))
+        return g.msgpack_body
+    data = {}
+    for key, value in request.args.items():
+        try:
+            data[key] = json.loads(value)
+        except ValueError:
+            data[key] = value
+    return data
+
+
+def _respond(payload):
+    """payload as MessagePack if the client prefers it, otherwise as JSON"""
+    if msgpack_available():
+        best = request.accept_mimetypes.best_match(
+            ("application/json",) + MSGPACK_MIMETYPES
+        )
+        if best in MSGPACK_MIMETYPES:
+            with stage("serialize"):
+                return Response(msgpack_dumps(payload), mimetype=best)
+    return jsonify(payload)
+
+
+def cacheable(view):
+    """
+    Mark a deterministic endpoint's successful GET responses as cacheable.
+
+    Adds an ETag over the response body and a Cache-Control max-age, and a
+    GET or HEAD whose If-None-Match already names that ETag gets an empty
+    304. POST responses are left alone: caches do not reuse them, and
+    RFC 9110 would have a matching If-None-Match on a POST answered 412.
+    """
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        response = make_response(view(*args, **kwargs))
+        if response.status_code != 200 or request.method not in ("GET", "HEAD"):
+            return response
+
+        response.add_etag()
+        response.cache_control.public = True
+        response.cache_control.max_age = SCORE_CACHE_MAX_AGE
+        if request.if_none_match.contains(response.get_etag()[0]):
+            response.status_code = 304
+            response.set_data(b"")
+        return response
+
+    return wrapper
+
+
+@app.route("/api/risk-score", methods=["GET", "POST"])
+@cacheable
+def risk_score_endpoint():
+    try:
+        data = _request_data()
+
+        # Create data dictionary with only the necessary fields
+        risk_data = {
+            "total_credits": data.get("total_credits"),
+            "expected_credits": data.get("expected_credits"),
+            "amount_invested": data.get("amount_invested"),
+        }
+
+        # Calculate the risk score
+        risk_score = calculate_risk_score(risk_data)
+
+        return jsonify({"success": True, "risk_score": risk_score})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def _bulk_columns(data, keys):
+    """Pull equal-length columns out of a bulk request; absent columns are all None"""
+    present = [key for key in keys if key in data and data[key] is not None]
+    lengths = {len(data[key]) for key in present}
+    if len(lengths) > 1:
+        raise ValueError("All columns must have the same length")
+    n = lengths.pop() if lengths else 0
+    return [data[key] if key in present else [None] * n for key in keys]
+
+
+@app.route("/api/risk-score/bulk", methods=["POST"])
+def risk_score_bulk_endpoint():
+    try:
+        logger.debug("[ENDPOINT] Processing /api/risk-score/bulk request")
+        data = _request_data() or {}
+        try:
+            columns = _bulk_columns(
+                data, ("total_credits", "expected_credits", "amount_invested")
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        risk_scores = calculate_risk_scores(*columns)
+        return _respond(
+            {"success": True, "risk_scores": risk_scores.astype(int).tolist()}
+        )
+    except Exception as e:
+        logger.error("Bulk risk score calculation failed: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/efficiency-score/bulk", methods=["POST"])
+def efficiency_score_bulk_endpoint():
+    try:
+        logger.debug("[ENDPOINT] Processing /api/efficiency-score/bulk request")
+        data = _request_data() or {}
+        try:
+            columns = _bulk_columns(
+                data, ("total_credits", "expected_credits", "amount_invested")
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        efficiency_scores = calculate_efficiency_scores(*columns)
+        return _respond(
+            {"success": True, "efficiency_scores": efficiency_scores.tolist()}
+        )
+    except Exception as e:
+        logger.error("Bulk efficiency score calculation failed: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/impact-score/bulk", methods=["POST"])
+def impact_score_bulk_endpoint():
+    try:
+        logger.debug("[ENDPOINT] Processing /api/impact-score/bulk request")
+        data = _request_data() or {}
+        [total_credits] = _bulk_columns(data, ("total_credits",))
+
+        impact_scores = calculate_impact_scores(total_credits)
+        return _respond({"success": True, "impact_scores": impact_scores.tolist()})
+    except Exception as e:
+        logger.error("Bulk impact score calculation failed: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/efficiency-score", methods=["GET", "POST"])
+@cacheable
+def efficiency_score_endpoint():
+    try:
+        logger.debug("[ENDPOINT] Processing /api/efficiency-score request")
+        data = _request_data()
+        total_credits = data.get("total_credits")
+        expected_credits = data.get("expected_credits")
+        amount_invested = data.get("amount_invested")
+
+        efficiency_score = calculate_efficiency_score(
+            total_credits, expected_credits, amount_invested
+        )
+
+        logger.debug("[ENDPOINT] Returning efficiency score: %s", efficiency_score)
+        return jsonify({"success": True, "efficiency_score": efficiency_score})
+    except Exception as e:
+        logger.error("Efficiency score calculation failed: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/impact-score", methods=["GET", "POST"])
+@cacheable
+def impact_score_endpoint():
+    try:
+        logger.debug("[ENDPOINT] Processing /api/impact-score request")
+        data = _request_data()
+        total_credits = data.get("total_credits")
+
+        impact_score = calculate_impact_score(total_credits)
+
+        logger.debug("[ENDPOINT] Returning impact score: %s", impact_score)
+        return jsonify({"success": True, "impact_score": impact_score})
+    except Exception as e:
+        logger.error("Impact score calculation failed: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/goal-alignment", methods=["POST"])
+def goal_alignment_endpoint():
+    try:
+        logger.debug("[ENDPOINT] Processing /api/goal-alignment request")
+        data = _request_data()
+        if (
+            not data
+            or "funder_description" not in data
+            or "fundee_description" not in data
+        ):
+            logger.debug("Error: Missing description data")
+            return jsonify({"error": "Missing description data"}), 400
+
+        funder_description = data["funder_description"]
+        fundee_description = data["fundee_description"]
+
+        alignment_score = calculate_goal_alignment(
+            funder_description, fundee_description
+        )
+
+        logger.debug("[ENDPOINT] Returning goal alignment score: %s", alignment_score)
+        return jsonify({"success": True, "goal_alignment_score": alignment_score})
+    except Exception as e:
+        logger.error("Goal alignment calculation failed: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/location-match", methods=["GET", "POST"])
+@cacheable
+def location_match_endpoint():
+    try:
+        logger.debug("[ENDPOINT] Processing /api/location-match request")
+        data = _request_data()
+        if not data or "funder_location" not in data or "fundee_location" not in data:
+            logger.debug("Error: Missing location data")
+            return jsonify({"error": "Missing location data"}), 400
+
+        funder_location = data["funder_location"]
+        fundee_location = data["fundee_location"]
+
+        location_score = calculate_location_match(funder_location, fundee_location)
+
+        logger.debug("[ENDPOINT] Returning location match score: %s", location_score)
+        return jsonify({"success": True, "location_match_score": location_score})
+    except Exception as e:
+        logger.error("Location match calculation failed: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/funding-capability-match", methods=["GET", "POST"])
+@cacheable
+def funding_capability_match_endpoint():
+    try:
+        logger.debug("[ENDPOINT] Processing /api/funding-capability-match request")
+        data = _request_data()
+        if not data or "funder_capability" not in data or "fundee_needs" not in data:
+            logger.debug("Error: Missing capability/needs data")
+            return jsonify({"error": "Missing capability/needs data"}), 400
+
+        funder_capability = data["funder_capability"]
+        fundee_needs = data["fundee_needs"]
+
+        match_score = calculate_funding_capability_match(
+            funder_capability, fundee_needs
+        )
+
+        logger.debug(
+            "[ENDPOINT] Returning funding capability match score: %s", match_score
+        )
+        return jsonify({"success": True, "funding_capability_match_score": match_score})
+    except Exception as e:
+        logger.error("Funding capability match calculation failed: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/dynamic-scores", methods=["POST"])
+def dynamic_scores_endpoint():
+    try:
+        logger.debug("[ENDPOINT] Processing /api/dynamic-scores request")
+        data = _request_data()
+        missing = [
+            field for field in DYNAMIC_SCORE_FIELDS if not data or field not in data
+        ]
+        if missing:
+            logger.debug("Error: Missing fields %s", missing)
+            return jsonify({"error": f"Missing fields: {', '.join(missing)}"}), 400
+
+        scores, stage_ms = calculate_dynamic_scores(data)
+
+        logger.debug("[ENDPOINT] Returning dynamic scores: %s", scores)
+        return jsonify({"success": True, **scores, "timings": stage_ms})
+    except Exception as e:
+        logger.error("Dynamic score calculation failed: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/rank-matches", methods=["POST"])
+def rank_matches_endpoint():
+    try:
+        logger.debug("[ENDPOINT] Processing /api/rank-matches request")
+        data = _request_data()
+        if not data or "funder" not in data or "fundees" not in data:
+            logger.debug("Error: Missing funder/fundees data")
+            return jsonify({"error": "Missing funder/fundees data"}), 400
+
+        try:
+            matches = rank_matches(
+                data["funder"],
+                data["fundees"],
+                weights=data.get("weights"),
+                top_k=data.get("top_k"),
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        logger.debug("[ENDPOINT] Returning %s ranked matches", len(matches))
+        return _respond(
+            {"success": True, "matches": matches, "count": len(data["fundees"])}
+        )
+    except Exception as e:
+        logger.error("Match ranking failed: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/catalog/rank-matches", methods=["POST"])
+def catalog_rank_matches_endpoint():
+    try:
+        logger.debug("[ENDPOINT] Processing /api/catalog/rank-matches request")
+        data = _request_data()
+        if not data or "funder" not in data:
+            logger.debug("Error: Missing funder data")
+            return jsonify({"error": "Missing funder data"}), 400
+        if catalog is None:
+            return jsonify({"error": "No catalog snapshot, run ingest.py"}), 404
+
+        try:
+            matches = rank_catalog_matches(
+                data["funder"],
+                weights=data.get("weights"),
+                top_k=data.get("top_k", 10),
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        logger.debug("[ENDPOINT] Returning %s catalog matches", len(matches))
+        return jsonify(
+            {
+                "success": True,
+                "matches": matches,
+                "count": len(catalog.ids("fundee")),
+            }
+        )
+    except Exception as e:
+        logger.error("Catalog match ranking failed: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/catalog", methods=["GET"])
+def catalog_stats():
+    return jsonify(
+        {"success": True, "catalog": catalog.stats() if catalog is not None else None}
+    )
+
+
+@app.route("/api/rank-matches/stream", methods=["POST"])
+def rank_matches_stream_endpoint():
+    try:
+        logger.debug("[ENDPOINT] Processing /api/rank-matches/stream request")
+        data = _request_data()
+        if not data or "funder" not in data or "fundees" not in data:
+            logger.debug("Error: Missing funder/fundees data")
+            return jsonify({"error": "Missing funder/fundees data"}), 400
+
+        if not isinstance(data["funder"], dict) or not isinstance(
+            data["fundees"], list
+        ):
+            return jsonify({"error": "funder must be an object, fundees a list"}), 400
+
+        # Everything is validated here, while a 400 can still be sent
+        try:
+            events = iter_rank_matches(
+                data["funder"],
+                data["fundees"],
+                weights=data.get("weights"),
+                top_k=data.get("top_k"),
+                chunk_size=data.get("chunk_size"),
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        # Server-Sent Events when asked for, newline-delimited JSON otherwise.
+        # Chunks are scored as the body is read, after the request metrics
+        # and Server-Timing are recorded, so those stop at the headers
+        sse = "text/event-stream" in request.headers.get("Accept", "")
+
+        def generate():
+            try:
+                for event in events:
+                    body = fast_json_dumps(event)
+                    yield f"event: {event['event']}\ndata: {body}\n\n" if sse else body + "\n"
+            except Exception as e:
+                # Headers are already sent, so the error goes into the stream
+                logger.error("Streaming match ranking failed: %s", e)
+                body = fast_json_dumps({"event": "error", "error": str(e)})
+                yield f"event: error\ndata: {body}\n\n" if sse else body + "\n"
+
+        return Response(
+            generate(),
+            mimetype="text/event-stream" if sse else "application/x-ndjson",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+    except Exception as e:
+        logger.error("Streaming match ranking failed: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/cascade-rank-matches", methods=["POST"])
+def cascade_rank_matches_endpoint():
+    try:
+        logger.debug("[ENDPOINT] Processing /api/cascade-rank-matches request")
+        data = _request_data()
+        if not data or "funder" not in data or "fundees" not in data:
+            logger.debug("Error: Missing funder/fundees data")
+            return jsonify({"error": "Missing funder/fundees data"}), 400
+
+        try:
+            matches, report = cascade_rank_matches(
+                data["funder"],
+                data["fundees"],
+                weights=data.get("weights"),
+                top_k=data.get("top_k", 10),
+                semantic_top_m=data.get("semantic_top_m"),
+                max_distance_km=data.get("max_distance_km"),
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        logger.debug("[ENDPOINT] Returning %s ranked matches", len(matches))
+        return jsonify(
+            {
+                "success": True,
+                "matches": matches,
+                "count": len(data["fundees"]),
+                "report": report,
+            }
+        )
+    except Exception as e:
+        logger.error("Cascade match ranking failed: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+SCORE_MATRIX_KINDS = ("funder", "fundee")
+
+
+@app.route("/api/score-matrix/<kind>", methods=["POST"])
+def score_matrix_upsert_endpoint(kind):
+    try:
+        logger.debug("[ENDPOINT] Processing /api/score-matrix/%s upsert", kind)
+        if kind not in SCORE_MATRIX_KINDS:
+            return jsonify({"error": f"Unknown kind: {kind}"}), 404
+
+        data = _request_data()
+        if not data or "id" not in data:
+            logger.debug("Error: Missing id")
+            return jsonify({"error": "Missing id"}), 400
+
+        profile = {key: value for key, value in data.items() if key != "id"}
+        # Embed outside the matrix lock so reads are not held up by the provider
+        with stage(f"embedding-{kind}"):
+            get_embedding(profile.get(f"{kind}_description") or "")
+        if kind == "funder":
+            recomputed = score_matrix.upsert_funder(int(data["id"]), profile)
+        else:
+            recomputed = score_matrix.upsert_fundee(int(data["id"]), profile)
+
+        funders, fundees = score_matrix.shape
+        return jsonify(
+            {
+                "success": True,
+                "recomputed": recomputed,
+                "funders": funders,
+                "fundees": fundees,
+            }
+        )
+    except Exception as e:
+        logger.error("Score matrix upsert failed: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/score-matrix/<kind>/<int:item_id>", methods=["DELETE"])
+def score_matrix_delete_endpoint(kind, item_id):
+    try:
+        if kind not in SCORE_MATRIX_KINDS:
+            return jsonify({"error": f"Unknown kind: {kind}"}), 404
+
+        if kind == "funder":
+            removed = score_matrix.remove_funder(item_id)
+        else:
+            removed = score_matrix.remove_fundee(item_id)
+        return jsonify({"success": True, "removed": removed})
+    except Exception as e:
+        logger.error("Score matrix delete failed: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/score-matrix/funder/<int:funder_id>/matches", methods=["GET"])
+def score_matrix_matches_endpoint(funder_id):
+    try:
+        top_k = request.args.get("top_k", default=10, type=int)
+        matches = score_matrix.top_matches(funder_id, top_k)
+        if matches is None:
+            return jsonify({"error": "Funder not found"}), 404
+
+        return jsonify(
+            {
+                "success": True,
+                "matches": [
+                    {"id": fundee_id, "composite_score": score}
+                    for fundee_id, score in matches
+                ],
+            }
+        )
+    except Exception as e:
+        logger.error("Score matrix lookup failed: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/score-matrix", methods=["GET"])
+def score_matrix_stats():
+    return jsonify({"success": True, "score_matrix": score_matrix.stats()})
+
+
+@app.route("/api/semantic-search", methods=["POST"])
+def semantic_search_endpoint():
+    try:
+        logger.debug("[ENDPOINT] Processing /api/semantic-search request")
+        data = _request_data()
+        if not data or not data.get("query"):
+            logger.debug("Error: Missing query")
+            return jsonify({"error": "Missing query"}), 400
+
+        kind = data.get("kind", "fundee")
+        if kind not in semantic_indexes:
+            return jsonify({"error": f"Unknown kind: {kind}"}), 400
+
+        # One embedding for the query, one matrix-vector product for the index
+        with stage("embedding-query"):
+            query_embedding = get_embedding(data["query"])
+        top_k = int(data.get("top_k", 10))
+        if data.get("quantized"):
+            with stage("similarity"):
+                hits = quantized_search(
+                    kind, query_embedding, top_k, rerank=bool(data.get("rerank"))
+                )
+            if hits is None:
+                return jsonify({"error": f"No quantized snapshot for {kind}"}), 404
+        else:
+            with stage("similarity"):
+                hits = semantic_indexes[kind].search(query_embedding, top_k)
+
+        results = [
+            {
+                "id": item_id,
+                "similarity": similarity,
+                "score": (similarity + 1) / 2 * 100,
+            }
+            for item_id, similarity in hits
+        ]
+        logger.debug("[ENDPOINT] Returning %s semantic search results", len(results))
+        return jsonify({"success": True, "results": results})
+    except Exception as e:
+        logger.error("Semantic search failed: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/semantic-index/<kind>", methods=["POST"])
+def semantic_index_upsert_endpoint(kind):
+    """
+    Add or update profiles in the semantic index of kind.
+
+    The body is one {"id", "description"} or {"items": [...]} with many. With
+    "replace": true, ids missing from items are removed, so a full table
+    sync also drops deleted rows. Unchanged descriptions are skipped.
+    """
+    try:
+        logger.debug("[ENDPOINT] Processing /api/semantic-index/%s upsert", kind)
+        if kind not in semantic_indexes:
+            return jsonify({"error": f"Unknown kind: {kind}"}), 400
+
+        data = _request_data()
+        items = data.get("items", [data]) if isinstance(data, dict) else None
+        if not isinstance(items, list) or any(
+            not isinstance(item, dict) or "id" not in item or "description" not in item
+            for item in items
+        ):
+            logger.debug("Error: Missing id/description")
+            return jsonify({"error": "Missing id/description"}), 400
+
+        # Rows without a description are not searchable, so they are dropped
+        described = [
+            (int(item["id"]), item["description"])
+            for item in items
+            if item["description"]
+        ]
+        index = semantic_indexes[kind]
+        with stage(f"embedding-{kind}"):
+            embeddings, fallbacks = get_embeddings_with_fallbacks(
+                [description for _, description in described]
+            )
+        # Fallback rows are searchable, and embedded again when re-sent
+        updated = index.upsert_many(
+            (
+                (item_id, description, embedding)
+                for (item_id, description), embedding in zip(described, embeddings)
+            ),
+            fallback_ids={
+                item_id
+                for (item_id, _), fallback in zip(described, fallbacks)
+                if fallback
+            },
+        )
+
+        keep = {item_id for item_id, _ in described}
+        if data.get("replace"):
+            stale = [item_id for item_id in index.ids() if item_id not in keep]
+        else:
+            stale = [int(item["id"]) for item in items if not item["description"]]
+        removed = index.remove_many(stale)
+
+        return jsonify(
+            {
+                "success": True,
+                "updated": updated,
+                "removed": removed,
+                "fallback": int(np.count_nonzero(fallbacks)),
+                "size": len(index),
+            }
+        )
+    except Exception as e:
+        logger.error("Semantic index upsert failed: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/semantic-index/<kind>/snapshot", methods=["POST"])
+def semantic_index_snapshot_endpoint(kind):
+    try:
+        logger.debug("[ENDPOINT] Processing /api/semantic-index/%s/snapshot", kind)
+        if kind not in semantic_indexes:
+            return jsonify({"error": f"Unknown kind: {kind}"}), 400
+
+        store = snapshot_semantic_index(kind)
+        return jsonify({"success": True, "size": len(store), "bytes": store.nbytes})
+    except Exception as e:
+        logger.error("Semantic index snapshot failed: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/semantic-index/<kind>/<int:item_id>", methods=["DELETE"])
+def semantic_index_delete_endpoint(kind, item_id):
+    try:
+        logger.debug(
+            "[ENDPOINT] Processing /api/semantic-index/%s/%s delete", kind, item_id
+        )
+        if kind not in semantic_indexes:
+            return jsonify({"error": f"Unknown kind: {kind}"}), 400
+
+        if not semantic_indexes[kind].remove(item_id):
+            return jsonify({"error": f"{kind} {item_id} not found"}), 404
+        return jsonify(
+            {"success": True, "id": item_id, "size": len(semantic_indexes[kind])}
+        )
+    except Exception as e:
+        logger.error("Semantic index delete failed: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/base-scores", methods=["POST"])
+def base_scores_endpoint():
+    try:
+        logger.debug("[ENDPOINT] Processing /api/base-scores request")
+        data = _request_data()
+        if not data or "ids" not in data:
+            logger.debug("Error: Missing ids")
+            return jsonify({"error": "Missing ids"}), 400
+
+        n = len(data["ids"])
+        columns = {
+            key: data.get(key) or [None] * n
+            for key in ("total_credits", "expected_credits", "amount_invested")
+        }
+        previous_inputs = data.get("previous_inputs") or [None] * n
+        if any(len(column) != n for column in [*columns.values(), previous_inputs]):
+            return jsonify({"error": "All columns must have one value per id"}), 400
+
+        scores = calculate_base_scores(
+            data["ids"], previous_inputs=previous_inputs, **columns
+        )
+
+        logger.debug(
+            "[ENDPOINT] Recomputed base scores for %s of %s fundees", len(scores), n
+        )
+        return jsonify(
+            {"success": True, "scores": scores, "total": n, "recomputed": len(scores)}
+        )
+    except Exception as e:
+        logger.error("Base score precomputation failed: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/location-matrix", methods=["POST"])
+def location_matrix_endpoint():
+    try:
+        logger.debug("[ENDPOINT] Processing /api/location-matrix request")
+        data = _request_data()
+        if not data or "funder_locations" not in data or "fundee_locations" not in data:
+            logger.debug("Error: Missing location data")
+            return jsonify({"error": "Missing location data"}), 400
+
+        funder_lats, funder_lons = _to_location_arrays(data["funder_locations"])
+        fundee_lats, fundee_lons = _to_location_arrays(data["fundee_locations"])
+        distances = haversine_distance_matrix(
+            funder_lats, funder_lons, fundee_lats, fundee_lons
+        )
+
+        return jsonify(
+            {
+                "success": True,
+                "location_match_scores": location_scores(distances).tolist(),
+                "distances_km": np.where(np.isnan(distances), None, distances).tolist(),
+            }
+        )
+    except Exception as e:
+        logger.error("Location matrix calculation failed: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/geo-index", methods=["POST"])
+def geo_index_upsert_endpoint():
+    """
+    Add or move fundees in the radius index.
+
+    The body is {"fundees": [{"id", "latitude", "longitude"}, ...]}. Fundees
+    without coordinates are removed, and with "replace": true so is every
+    id missing from fundees, so a full table sync also drops deleted rows.
+    """
+    try:
+        logger.debug("[ENDPOINT] Processing /api/geo-index upsert")
+        data = _request_data()
+        if not data or not isinstance(data.get("fundees"), list):
+            logger.debug("Error: Missing fundees data")
+            return jsonify({"error": "Missing fundees data"}), 400
+
+        points = []
+        unlocated = []
+        for fundee in data["fundees"]:
+            if fundee.get("latitude") is None or fundee.get("longitude") is None:
+                unlocated.append(int(fundee["id"]))
+            else:
+                points.append(
+                    (int(fundee["id"]), fundee["latitude"], fundee["longitude"])
+                )
+
+        updated = fundee_geo_index.upsert_many(points)
+        if data.get("replace"):
+            keep = {item_id for item_id, _, _ in points}
+            unlocated = [i for i in fundee_geo_index.ids() if i not in keep]
+        removed = fundee_geo_index.remove_many(unlocated)
+        return jsonify(
+            {
+                "success": True,
+                "updated": updated,
+                "removed": removed,
+                "size": len(fundee_geo_index),
+            }
+        )
+    except Exception as e:
+        logger.error("Geo index upsert failed: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/geo-index/<int:item_id>", methods=["DELETE"])
+def geo_index_delete_endpoint(item_id):
+    if not fundee_geo_index.remove(item_id):
+        return jsonify({"error": f"fundee {item_id} not found"}), 404
+    return jsonify({"success": True, "id": item_id, "size": len(fundee_geo_index)})
+
+
+@app.route("/api/within-radius", methods=["POST"])
+def within_radius_endpoint():
+    try:
+        logger.debug("[ENDPOINT] Processing /api/within-radius request")
+        data = _request_data()
+        if not data or "location" not in data or "radius_km" not in data:
+            logger.debug("Error: Missing location/radius data")
+            return jsonify({"error": "Missing location/radius data"}), 400
+
+        lat, lon = data["location"]
+        hits = fundee_geo_index.within_radius(lat, lon, float(data["radius_km"]))
+        results = [
+            {"id": item_id, "distance_km": distance} for item_id, distance in hits
+        ]
+        return jsonify({"success": True, "results": results, "count": len(results)})
+    except Exception as e:
+        logger.error("Radius query failed: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/", methods=["GET"])
+def health_check():
+    logger.debug("[ENDPOINT] Health check requested")
+    return jsonify({"status": "API is running"})
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    if request.path.startswith("/api/"):
+        timings.begin_request()
+
+
+@app.after_request
+def record_request_metrics(response):
+    start = g.get("request_start")
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        request_latency.observe(
+            time.perf_counter() - start,
+            request.method,
+            route,
+            str(response.status_code),
+        )
+    return response
+
+
+profile_store = ProfileStore(PROFILE_DIR)
+# Only one request per process is profiled at a time, which bounds the
+# overhead and keeps cProfile's per-thread hook from being shared
+_profile_lock = threading.Lock()
+_sampled_requests = itertools.count(1)
+_stack_samplers = {}
+_last_sample_flush = 0.0
+
+
+def stack_sampler():
+    """This process's StackSampler; created after fork so each worker writes its own"""
+    pid = os.getpid()
+    sampler = _stack_samplers.get(pid)
+    if sampler is None:
+        sampler = _stack_samplers[pid] = StackSampler(
+            os.path.join(PROFILE_DIR, f"flamegraph-{pid}.folded"),
+            interval=PROFILE_SAMPLE_INTERVAL_MS / 1000,
+        )
+    return sampler
+
+
+def _profile_authorized():
+    if not PROFILE_TOKEN:
+        return False
+    supplied = request.headers.get("X-Profile") or request.args.get("profile") or ""
+    return hmac.compare_digest(supplied, PROFILE_TOKEN)
+
+
+@app.before_request
+def start_profiling():
+    if not request.path.startswith("/api/") or request.path.startswith("/api/profiles"):
+        return
+    if _profile_authorized() and _profile_lock.acquire(blocking=False):
+        g.profile = profiling.begin_request(profiler=cProfile.Profile())
+        g.profile.profiler.enable()
+    elif PROFILE_SAMPLE_EVERY and next(_sampled_requests) % PROFILE_SAMPLE_EVERY == 0:
+        g.profile = profiling.begin_request(sampler=stack_sampler())
+        g.sampled_thread = threading.get_ident()
+        g.profile.sampler.add(g.sampled_thread)
+
+
+@app.after_request
+def finish_profiling(response):
+    global _last_sample_flush
+    profile = g.pop("profile", None)
+    if profile is None:
+        return response
+    profiling.end_request()
+
+    if profile.profiler is not None:
+        profile.profiler.disable()
+        _profile_lock.release()
+        try:
+            # The path only: the query string may carry the profile token
+            profile_id = profile_store.save(
+                profile.profiler,
+                f"{request.method} {request.path} -> {response.status_code}",
+                profile.task_profilers(),
+            )
+            response.headers["X-Profile-Id"] = profile_id
+        except OSError as e:
+            logger.error("Saving request profile failed: %s", e)
+
+    sampled_thread = g.pop("sampled_thread", None)
+    if sampled_thread is not None:
+        sampler = profile.sampler
+        sampler.remove(sampled_thread)
+        if time.monotonic() - _last_sample_flush >= PROFILE_FLUSH_SECONDS:
+            _last_sample_flush = time.monotonic()
+            try:
+                sampler.flush()
+            except OSError as e:
+                logger.error("Writing sampled stacks failed: %s", e)
+    return response
+
+
+@app.teardown_request
+def stop_profiling(exc):
+    # Only reached with state left over when the response was never finished
+    profile = g.pop("profile", None)
+    if profile is None:
+        return
+    profiling.end_request()
+    if profile.profiler is not None:
+        profile.profiler.disable()
+        _profile_lock.release()
+    sampled_thread = g.pop("sampled_thread", None)
+    if sampled_thread is not None:
+        profile.sampler.remove(sampled_thread)
+
+
+@app.before_request
+def reject_unsupported_body():
+    if request.mimetype in MSGPACK_MIMETYPES and not msgpack_available():
+        return jsonify({"error": "MessagePack bodies need the msgpack package"}), 415
+
+
+@app.before_request
+def parse_request_body():
+    """Decode the body up front, so parsing is its own timing stage"""
+    if timings.current() is None or request.method == "GET":
+        return
+    with stage("parse"):
+        try:
+            _request_data()
+        except Exception:
+            # A failed parse is not cached; the endpoint reports it when it
+            # reads the body
+            pass
+
+
+def _timings_requested():
+    return request.headers.get("X-Timings", "").lower() in (
+        "1",
+        "true",
+        "yes",
+    ) or request.args.get("timings", "").lower() in ("1", "true", "yes")
+
+
+@app.after_request
+def add_server_timing(response):
+    """
+    Report the request's timing stages in a Server-Timing header.
+
+    Stages are parse, embedding-funder/-fundee/-query, similarity, scoring
+    and serialize, plus the total. Concurrent stages (the two embedding
+    sides) each count their full duration. With "X-Timings: 1" or
+    "?timings=1", JSON object responses also get the stages as *_ms keys in
+    a "timings" field, merged into any timings the endpoint already returns;
+    such responses are not cacheable.
+
+    Like request_duration_seconds, this stops when the headers are sent. For
+    /api/rank-matches/stream that is before any candidate is scored, so it
+    only covers validation; the scoring is in the body that follows.
+    """
+    request_timings = timings.current()
+    if request_timings is None:
+        return response
+
+    response.headers["Server-Timing"] = request_timings.server_timing()
+    response.headers["Timing-Allow-Origin"] = "*"
+    if (
+        _timings_requested()
+        and response.is_json
+        and not response.is_streamed
+        and response.status_code != 304
+    ):
+        body = response.get_json(silent=True)
+        if isinstance(body, dict):
+            existing = body.get("timings")
+            body["timings"] = {
+                **(existing if isinstance(existing, dict) else {}),
+                **request_timings.as_dict(),
+            }
+            response.set_data(app.json.dumps(body) + "\n")
+            response.headers.pop("ETag", None)
+            response.cache_control.no_store = True
+            response.cache_control.public = False
+            response.cache_control.max_age = None
+    return response
+
+
+@app.teardown_request
+def end_request_timings(exc):
+    timings.end_request()
+
+
+# Add debugging for incoming requests
+@app.before_request
+def log_request_info():
+    # Detailed calculation traces log request bodies, so they are only
+    # turned on for callers that know DEBUG_TRACE_TOKEN
+    trace_header = request.headers.get("X-Debug-Trace", "")
+    set_request_trace(
+        bool(DEBUG_TRACE_TOKEN) and hmac.compare_digest(trace_header, DEBUG_TRACE_TOKEN)
+    )
+
+    # Skip header lookups and JSON parsing entirely unless they will be logged
+    if not trace_enabled():
+        return
+    logger.debug("[REQUEST] %s %s", request.method, request.path)
+    if request.headers:
+        logger.debug("[HEADERS] Content-Type: %s", request.headers.get("Content-Type"))
+    if request.is_json or request.mimetype in MSGPACK_MIMETYPES:
+        logger.debug("[DATA] Body received: %s", _request_data())
+
+
+@app.route("/api/profiles/<profile_id>", methods=["GET"])
+def profile_report_endpoint(profile_id):
+    if not _profile_authorized():
+        return jsonify({"error": "Profiling is not enabled for this caller"}), 403
+    report = profile_store.report(profile_id)
+    if report is None:
+        return jsonify({"error": f"No profile {profile_id}"}), 404
+    return Response(report, mimetype="text/plain")
+
+
+@app.route("/api/profiles/flamegraph", methods=["GET"])
+def sampled_profile_endpoint():
+    if not _profile_authorized():
+        return jsonify({"error": "Profiling is not enabled for this caller"}), 403
+    sampler = stack_sampler()
+    sampler.flush()
+    try:
+        with open(sampler.output_path) as f:
+            folded = f.read()
+    except OSError:
+        folded = ""
+    return Response(folded, mimetype="text/plain")
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    return Response(metrics.render(), content_type=MetricsRegistry.CONTENT_TYPE)
+
+
+@app.route("/api/embedding-provider", methods=["GET"])
+def embedding_provider_status():
+    return jsonify(
+        {
+            "success": True,
+            "embedding_provider": embedding_provider.name,
+            "circuit_breaker": embedding_breaker.stats(),
+        }
+    )
+
+
+@app.route("/api/score-cache", methods=["GET"])
+def score_cache_stats():
+    return jsonify({"success": True, "score_cache": score_cache.stats()})
+
+
+@app.route("/api/embedding-cache", methods=["GET"])
+def embedding_cache_stats():
+    return jsonify(
+        {
+            "success": True,
+            "embedding_provider": embedding_provider.name,
+            "embedding_cache": embedding_cache.stats(),
+        }
+    )
+
+
+# Add a test endpoint for checking Gemini connectivity
+@app.route("/api/test-gemini", methods=["GET"])
+def test_gemini():
+    try:
+        logger.debug("[ENDPOINT] Testing Gemini API connection")
+        result, age = gemini_health()
+        if result:
+            return jsonify(
+                {
+                    "success": True,
+                    "message": "Gemini API connection successful",
+                    "checked_seconds_ago": age,
+                }
+            )
+        else:
+            return (
+                jsonify(
+                    {
+                        "success": False,
+                        "message": "Failed to connect to Gemini API",
+                        "checked_seconds_ago": age,
+                    }
+                ),
+                500,
+            )
+    except Exception as e:
+        logger.error("Gemini API test failed: %s", e)
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+# Libraries that are imported lazily on the request path
+WARM_UP_MODULES = ("sklearn.metrics.pairwise", "sklearn.neighbors")
+
+# "background" (default) warms up after the app is ready to serve, "eager"
+# before create_app returns, "off" leaves it to the first requests. A
+# process that forks workers after create_app (gunicorn's preload_app)
+# must not use "background": a fork in the middle of the warm-up would
+# copy half-imported modules and held locks into the worker, so
+# gunicorn.conf.py turns it into "eager".
+WARM_UP = os.getenv("WARM_UP", "background")
+
+
+def warm_up():
+    """Import lazily loaded libraries and check Gemini before requests need them"""
+    start_time = time.time()
+    try:
+        for module in WARM_UP_MODULES:
+            importlib.import_module(module)
+        embedding_provider.warm_up()
+        _fallback_provider.warm_up()
+        if embedding_provider.name == "gemini":
+            logger.info("Testing Gemini API connection...")
+            if not gemini_health()[0]:
+                logger.warning(
+                    "Could not connect to Gemini API. Please check your API key and internet connection."
+                )
+    except Exception as e:
+        logger.error("Warm-up failed: %s", e)
+    logger.info("Warm-up finished (%.2fs)", time.time() - start_time)
+
+
+_state_loaded = False
+
+
+def create_app():
+    """
+    WSGI app factory.
+
+    Loads the semantic and geo indexes once per process. Under gunicorn with
+    preload_app (see gunicorn.conf.py) this runs in the master before it
+    forks, so every worker shares the loaded matrices copy-on-write. After
+    that, each worker replays the other workers' changes from the stores'
+    change logs as it serves requests.
+    """
+    global _state_loaded
+    if not _state_loaded:
+        start_time = time.time()
+        logger.info("Loading semantic search indexes...")
+        load_semantic_indexes()
+        logger.info(
+            "Loaded %s fundee locations into geo index", fundee_geo_index.load()
+        )
+        logger.info("Loaded %s x %s funder/fundee score matrix", *score_matrix.load())
+        load_catalog()
+        if WARM_UP == "eager":
+            warm_up()
+        elif WARM_UP == "background":
+            threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+        _state_loaded = True
+        logger.info("App ready (%.2fs)", time.time() - start_time)
+    return app
+
+
+if __name__ == "__main__":
+    # Development server only; production runs gunicorn with wsgi:app
+    logger.info("====== STARTING CARBON API SERVER ======")
+    logger.info("Starting Flask server...")
+    create_app()
+
+    logger.info("Server is ready to accept requests")
+    logger.info("======================================")
+    app.run(
+        debug=os.getenv("FLASK_DEBUG") == "1",
+        host="0.0.0.0",
+        port=int(os.getenv("PORT", "5001")),
+    )
@@ -0,0 +1,396 @@
+import atexit
+import bisect
+import fcntl
+import json
+import math
+import os
+import threading
+import time
+import uuid
+
+from atomic_files import atomic_write
+
+# Latency buckets in seconds, from sub-millisecond cache hits to slow
+# provider calls
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _add(total, value):
+    """Sum of two counter values or two histogram states"""
+    if isinstance(total, list):
+        return [a + b for a, b in zip(total, value)]
+    return total + value
+
+
+def _merge(totals, values):
+    for labels, value in values.items():
+        total = totals.get(labels)
+        totals[labels] = (
+            (list(value) if isinstance(value, list) else value)
+            if total is None
+            else _add(total, value)
+        )
+    return totals
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class _Sharded:
+    """
+    Base for metrics whose updates go to a shard owned by the calling thread.
+
+    Only the owning thread ever writes a shard, so updates take no lock; a
+    lock is taken once per thread to register its shard. Scrapes copy every
+    shard and add them up. When a new shard is registered or the metric is
+    scraped, the shards of threads that have exited are folded into a base
+    total, so a server starting a thread per request keeps one shard per
+    live thread and totals never go backwards.
+    """
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.reset()
+
+    def reset(self):
+        """Drop every value; used in forked children, which start from zero"""
+        self._local = threading.local()
+        self._shards = []
+        self._base = {}
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._fold_finished()
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _fold_finished(self):
+        """Add the shards of exited threads to the base; call with _lock held"""
+        live = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                # The thread is gone, so nothing writes the shard any more
+                _merge(self._base, shard)
+        self._shards = live
+
+    def values(self):
+        with self._lock:
+            self._fold_finished()
+            totals = _merge({}, self._base)
+            shards = [shard for _, shard in self._shards]
+        for shard in shards:
+            # dict.copy() is a single C call, so it cannot race the owner's update
+            _merge(totals, shard.copy())
+        return totals
+
+    def shard_count(self):
+        with self._lock:
+            return len(self._shards)
+
+
+class Counter(_Sharded):
+    """Monotonic count per label combination"""
+
+    type = "counter"
+
+    def inc(self, *labels, amount=1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def samples(self, values=None):
+        values = self.values() if values is None else values
+        for labels, value in sorted(values.items()):
+            yield self.name, _labels(self.labelnames, labels), value
+
+
+class Histogram(_Sharded):
+    """Cumulative-bucket histogram of observations (seconds) per label combination"""
+
+    type = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        shard = self._shard()
+        # Per bucket counts (non-cumulative, last one is +Inf), then the sum.
+        # The count is derived from the buckets on scrape, so it always
+        # matches the +Inf bucket even if a scrape lands mid-update
+        state = shard.get(labels)
+        if state is None:
+            state = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    def samples(self, values=None):
+        values = self.values() if values is None else values
+        bounds = self.buckets + (math.inf,)
+        for labels, state in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, state):
+                cumulative += count
+                yield (
+                    f"{self.name}_bucket",
+                    _labels(self.labelnames, labels, [("le", _format_value(bound))]),
+                    cumulative,
+                )
+            yield f"{self.name}_sum", _labels(self.labelnames, labels), state[-1]
+            yield f"{self.name}_count", _labels(self.labelnames, labels), cumulative
+
+
+class GaugeCallback:
+    """
+    Gauge or counter read from existing state when scraped.
+
+    callback returns a number, or a dict mapping label value tuples to numbers.
+    """
+
+    def __init__(self, name, help_text, callback, labelnames=(), type="gauge"):
+        self.name = name
+        self.help = help_text
+        self.callback = callback
+        self.labelnames = tuple(labelnames)
+        self.type = type
+
+    def values(self):
+        values = self.callback()
+        return values if isinstance(values, dict) else {(): values}
+
+    def samples(self, values=None, labelnames=None):
+        values = self.values() if values is None else values
+        labelnames = self.labelnames if labelnames is None else labelnames
+        for labels, value in sorted(values.items()):
+            yield self.name, _labels(labelnames, labels), value
+
+
+class MetricsRegistry:
+    """
+    Named metrics rendered together in the Prometheus text format.
+
+    Each process counts on its own. With a directory, processes sharing it
+    (gunicorn workers) are reported together: each one writes its values to
+    <directory>/<pid>-<id>.json every flush_interval seconds, on exit and
+    when it renders, and render() adds up every file. Counters and
+    histograms are summed; the files of exited processes are folded into
+    archive.json so their counts are kept. Gauges are reported per live
+    process with a pid label.
+    """
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+    ARCHIVE = "archive.json"
+
+    def __init__(self, prefix="", directory=None, flush_interval=5.0):
+        self.prefix = prefix
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._metrics = []
+        self._file_names = {}
+        self._flusher = None
+        if directory:
+            atexit.register(self.flush)
+            self._start_flusher()
+
+    def _register(self, metric):
+        metric.name = self.prefix + metric.name
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def gauge_callback(self, name, help_text, callback, labelnames=(), type="gauge"):
+        return self._register(
+            GaugeCallback(name, help_text, callback, labelnames, type)
+        )
+
+    def after_fork(self):
+        """Start a forked child from zero, with its own file and flusher"""
+        for metric in self._metrics:
+            if isinstance(metric, _Sharded):
+                metric.reset()
+        if self.directory:
+            self._start_flusher()
+
+    def _start_flusher(self):
+        self._flusher = threading.Thread(
+            target=self._flush_periodically, name="metrics-flush", daemon=True
+        )
+        self._flusher.start()
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError:
+                pass  # Retried on the next tick
+
+    @staticmethod
+    def _summed(metric):
+        return metric.type != "gauge"
+
+    def _file_path(self):
+        pid = os.getpid()
+        name = self._file_names.get(pid)
+        if name is None:
+            # The id keeps a reused pid from taking over an old file
+            name = self._file_names[pid] = f"{pid}-{uuid.uuid4().hex[:8]}.json"
+        return os.path.join(self.directory, name)
+
+    def flush(self):
+        """Write this process's values to its file in directory"""
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._write(
+            self._file_path(),
+            {metric.name: metric.values() for metric in self._metrics},
+        )
+
+    @staticmethod
+    def _write(path, values):
+        """Save values (metric name -> {labels: value}), the inverse of _read"""
+        with atomic_write(path) as f:
+            json.dump(
+                {
+                    name: [[list(labels), value] for labels, value in by_labels.items()]
+                    for name, by_labels in values.items()
+                },
+                f,
+            )
+
+    @staticmethod
+    def _read(path):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return {
+            name: {tuple(labels): value for labels, value in values}
+            for name, values in data.items()
+        }
+
+    @staticmethod
+    def _alive(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def _collect(self):
+        """
+        Values of every process sharing the directory.
+
+        Returns:
+        tuple: (summed values by metric name, [(pid, values)] of live processes)
+        """
+        self.flush()
+        summed_names = {m.name for m in self._metrics if self._summed(m)}
+        archive_path = os.path.join(self.directory, self.ARCHIVE)
+        with open(os.path.join(self.directory, ".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                archive = self._read(archive_path)
+                live = []
+                exited = []
+                for name in os.listdir(self.directory):
+                    pid = name.split("-", 1)[0]
+                    if not name.endswith(".json") or not pid.isdigit():
+                        continue
+                    path = os.path.join(self.directory, name)
+                    if self._alive(int(pid)):
+                        live.append((pid, self._read(path)))
+                    else:
+                        exited.append(path)
+                        for metric_name, values in self._read(path).items():
+                            if metric_name in summed_names:
+                                _merge(archive.setdefault(metric_name, {}), values)
+                if exited:
+                    self._write(archive_path, archive)
+                    for path in exited:
+                        os.remove(path)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+        summed = {name: dict(values) for name, values in archive.items()}
+        for _, values in live:
+            for name, metric_values in values.items():
+                if name in summed_names:
+                    _merge(summed.setdefault(name, {}), metric_values)
+        return summed, live
+
+    def _samples(self):
+        if not self.directory:
+            for metric in self._metrics:
+                yield metric, metric.samples()
+            return
+
+        summed, live = self._collect()
+        for metric in self._metrics:
+            if self._summed(metric):
+                yield metric, metric.samples(summed.get(metric.name, {}))
+            else:
+                per_process = {
+                    labels + (pid,): value
+                    for pid, values in live
+                    for labels, value in values.get(metric.name, {}).items()
+                }
+                yield metric, metric.samples(per_process, metric.labelnames + ("pid",))
+
+    def render(self):
+        lines = []
+        for metric, samples in self._samples():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in samples:
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
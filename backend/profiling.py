@@ -0,0 +1,318 @@
+import contextlib
+import contextvars
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from atomic_files import atomic_write
+
+# Named groups reported separately in every profile. A group's time is
+# the cumulative time of its outermost calls, so nested calls within the
+# same group (get_embeddings -> get_embedding) are not counted twice.
+FOCUS_GROUPS = {
+    "embedding": lambda filename, name: name
+    in ("get_embedding", "get_embeddings", "_provider_embed", "_fallback_embedding"),
+    "similarity": lambda filename, name: name
+    in ("cosine_similarity", "goal_alignments_from_embeddings"),
+    "scoring": lambda filename, name: (
+        name.startswith("calculate_") and "goal_alignment" not in name
+    )
+    or name == "_composite_scores",
+    "json": lambda filename, name: "json" in filename
+    or "orjson" in name
+    or "msgpack" in name,
+}
+
+
+# Profiling state of the request being handled, None unless it is profiled
+# or sampled. Work submitted to the embedding pool runs in a copy of the
+# request's context and wraps itself in profiled_task(), so its thread is
+# profiled for the request too.
+_current = contextvars.ContextVar("request_profile", default=None)
+
+
+class RequestProfile:
+    """
+    How one request is being profiled: a cProfile.Profile for the request
+    thread and/or a StackSampler sampling it. Tasks run for the request on
+    other threads add their own profilers, merged into the saved report.
+    """
+
+    def __init__(self, profiler=None, sampler=None):
+        self.profiler = profiler
+        self.sampler = sampler
+        self._task_profilers = []
+        self._lock = threading.Lock()
+
+    def add_task_profiler(self, profiler):
+        with self._lock:
+            self._task_profilers.append(profiler)
+
+    def task_profilers(self):
+        """Profilers of the tasks finished so far"""
+        with self._lock:
+            return list(self._task_profilers)
+
+
+def begin_request(profiler=None, sampler=None):
+    """Make a RequestProfile current for the rest of the request and return it"""
+    profile = RequestProfile(profiler, sampler)
+    _current.set(profile)
+    return profile
+
+
+def end_request():
+    # Threads serve many requests, so the state must not outlive this one
+    _current.set(None)
+
+
+@contextlib.contextmanager
+def profiled_task():
+    """
+    Profile the enclosed work for the current request, if it is profiled.
+
+    Meant for tasks on pool threads: a fresh cProfile.Profile records the
+    task, and the sampler samples the task's thread while it runs. From
+    Python 3.12, cProfile sees every thread and only one can be enabled at
+    a time, so the request's own profiler already covers the task.
+    """
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+
+    profiler = None
+    if profile.profiler is not None:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            profiler = None
+    thread_id = threading.get_ident()
+    if profile.sampler is not None:
+        profile.sampler.add(thread_id)
+    try:
+        yield
+    finally:
+        if profile.sampler is not None:
+            profile.sampler.remove(thread_id)
+        if profiler is not None:
+            profiler.disable()
+            profile.add_task_profiler(profiler)
+
+
+def _label(key):
+    filename, lineno, name = key
+    if filename == "~":
+        return name
+    return f"{os.path.basename(filename)}:{lineno}({name})"
+
+
+def focus_times(stats):
+    """Seconds spent in each FOCUS_GROUPS group, from a pstats.Stats"""
+    members = {
+        group: {key for key in stats.stats if match(key[0], key[2])}
+        for group, match in FOCUS_GROUPS.items()
+    }
+    times = {}
+    for group, keys in members.items():
+        times[group] = sum(
+            stats.stats[key][3]
+            for key in keys
+            if not any(caller in keys for caller in stats.stats[key][4])
+        )
+    return times
+
+
+def call_tree(stats, total, max_depth=12, min_fraction=0.01):
+    """
+    Indented call tree from the profile's caller/callee edges.
+
+    Each line is a call edge with its cumulative time; edges under
+    min_fraction of the total are left out. cProfile records edges rather
+    than full stacks, so a function called from several places shows its
+    per-caller time under each.
+    """
+    children = {}
+    roots = []
+    for key, (_, _, _, cumulative, callers) in stats.stats.items():
+        if not callers:
+            roots.append((key, cumulative))
+        for caller, edge in callers.items():
+            children.setdefault(caller, []).append((key, edge[3]))
+
+    lines = []
+
+    def visit(key, cumulative, depth, path):
+        if cumulative < total * min_fraction or depth > max_depth or key in path:
+            return
+        lines.append(f"{'  ' * depth}{cumulative * 1000:9.2f} ms  {_label(key)}")
+        for child, child_time in sorted(children.get(key, []), key=lambda c: -c[1]):
+            visit(child, child_time, depth + 1, path | {key})
+
+    for key, cumulative in sorted(roots, key=lambda r: -r[1]):
+        visit(key, cumulative, 0, frozenset())
+    return lines
+
+
+class ProfileStore:
+    """
+    Reports of individually profiled requests, kept on disk.
+
+    Each profile is saved as <id>.prof (pstats format, for snakeviz or
+    pstats.Stats) and <id>.txt, a text report with the focus group times,
+    the call tree and the functions with the most cumulative time. Only the
+    newest max_profiles are kept.
+    """
+
+    def __init__(self, directory, max_profiles=200):
+        self.directory = directory
+        self.max_profiles = max_profiles
+
+    def save(self, profiler, title, task_profilers=()):
+        """
+        Write the reports for a disabled cProfile.Profile; returns the profile id.
+
+        task_profilers are disabled profilers of work done for the request
+        on other threads, merged into the same report. Their time adds to
+        the total, which can then exceed the request's wall time.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+        buffer = io.StringIO()
+        stats = pstats.Stats(profiler, stream=buffer)
+        for task_profiler in task_profilers:
+            stats.add(task_profiler)
+        stats.dump_stats(os.path.join(self.directory, f"{profile_id}.prof"))
+        total = stats.total_tt
+        lines = [title, f"total {total * 1000:.2f} ms"]
+        if task_profilers:
+            lines.append(f"including {len(task_profilers)} tasks on pool threads")
+        lines += ["", "focus:"]
+        for group, seconds in focus_times(stats).items():
+            lines.append(f"  {group:12s} {seconds * 1000:9.2f} ms")
+        lines += ["", "call tree:"] + call_tree(stats, total) + [""]
+        stats.sort_stats("cumulative").print_stats(30)
+        report = "\n".join(lines) + buffer.getvalue()
+
+        with open(os.path.join(self.directory, f"{profile_id}.txt"), "w") as f:
+            f.write(report)
+        self._prune()
+        return profile_id
+
+    def report(self, profile_id):
+        """Text report for profile_id, or None if there is no such profile"""
+        if not profile_id.replace("-", "").isalnum():
+            return None
+        try:
+            with open(os.path.join(self.directory, f"{profile_id}.txt")) as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _prune(self):
+        reports = sorted(
+            name for name in os.listdir(self.directory) if name.endswith(".txt")
+        )
+        for name in reports[: max(0, len(reports) - self.max_profiles)]:
+            for suffix in (".txt", ".prof"):
+                try:
+                    os.remove(os.path.join(self.directory, name[:-4] + suffix))
+                except OSError:
+                    pass
+
+
+class StackSampler:
+    """
+    Statistical profiler for a changing set of request threads, and the
+    pool threads while they work for those requests (see profiled_task).
+
+    While any thread is registered, a daemon thread wakes every interval
+    seconds and records the current Python stack of each registered thread.
+    Stacks are aggregated in the collapsed format ("outer;inner;leaf count")
+    read by flamegraph.pl, speedscope and similar tools, and written to
+    output_path by flush().
+    """
+
+    def __init__(self, output_path, interval=0.005):
+        self.output_path = output_path
+        self.interval = interval
+        self._threads = set()
+        self._stacks = Counter()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._sampler = None
+        self.samples = 0
+
+    def add(self, thread_id):
+        with self._lock:
+            self._threads.add(thread_id)
+            if self._sampler is None or not self._sampler.is_alive():
+                self._sampler = threading.Thread(
+                    target=self._run, name="stack-sampler", daemon=True
+                )
+                self._sampler.start()
+        self._wake.set()
+
+    def remove(self, thread_id):
+        with self._lock:
+            self._threads.discard(thread_id)
+
+    def _run(self):
+        while True:
+            # Cleared before checking, so an add() in between still wakes us
+            self._wake.clear()
+            with self._lock:
+                threads = set(self._threads)
+            if not threads:
+                self._wake.wait()
+                continue
+
+            frames = sys._current_frames()
+            collected = []
+            for thread_id in threads:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    collected.append(self._collapse(frame))
+            with self._lock:
+                self._stacks.update(collected)
+                self.samples += len(collected)
+            time.sleep(self.interval)
+
+    @staticmethod
+    def _collapse(frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def flush(self):
+        """Write every stack sampled so far to output_path, atomically"""
+        with self._lock:
+            stacks = dict(self._stacks)
+        if not stacks:
+            return
+        directory = os.path.dirname(self.output_path) or "."
+        os.makedirs(directory, exist_ok=True)
+        with atomic_write(self.output_path) as f:
+            for stack, count in sorted(stacks.items()):
+                f.write(f"{stack} {count}\n")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "output_path": self.output_path,
+                "interval_seconds": self.interval,
+                "active_threads": len(self._threads),
+                "samples": self.samples,
+                "distinct_stacks": len(self._stacks),
+            }
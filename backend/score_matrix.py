@@ -0,0 +1,255 @@
+import numpy as np
+
+from change_log import LoggedStore
+from top_k import top_indices
+
+
+class ScoreMatrix(LoggedStore):
+    """
+    Materialized funder x fundee composite scores, maintained incrementally.
+
+    Funder and fundee profiles are kept next to a dense float32 matrix with
+    one row per funder and one column per fundee. Upserting a fundee
+    recomputes only its column against every funder, and upserting a funder
+    only its row, through score_block(funders, fundees), which returns the
+    (len(funders), len(fundees)) block of scores. The matrix grows by
+    doubling along either axis; removals move the last row or column into
+    the freed slot, so no change rebuilds the whole matrix.
+
+    Profile changes are appended to a change log shared by every process
+    serving the matrix, and each one replays the log before answering, so
+    gunicorn workers see each other's updates; see change_log.py. Records
+    replayed together are scored in at most two blocks (the changed rows
+    and the changed columns), so loading the log on startup computes the
+    matrix in one block.
+    """
+
+    def __init__(self, score_block, log_path=None, capacity=64):
+        super().__init__(log_path)
+        self.score_block = score_block
+        self._capacity = capacity
+        self.cells_computed = 0
+        self._clear()
+
+    def __len__(self):
+        return len(self._funder_ids) + len(self._fundee_ids)
+
+    def _clear(self):
+        self._scores = np.zeros((self._capacity, self._capacity), dtype=np.float32)
+        self._funder_ids = []
+        self._fundee_ids = []
+        self._funder_rows = {}
+        self._fundee_cols = {}
+        self._funders = {}
+        self._fundees = {}
+
+    @property
+    def shape(self):
+        return len(self._funder_ids), len(self._fundee_ids)
+
+    def _allocate(self, rows, cols):
+        """Zeroed matrix at the current capacity, doubled along each axis until it fits"""
+        capacity_rows, capacity_cols = self._scores.shape
+        while capacity_rows < rows:
+            capacity_rows *= 2
+        while capacity_cols < cols:
+            capacity_cols *= 2
+        return np.zeros((capacity_rows, capacity_cols), dtype=np.float32)
+
+    def _ensure_shape(self, rows, cols):
+        capacity_rows, capacity_cols = self._scores.shape
+        if rows <= capacity_rows and cols <= capacity_cols:
+            return
+        grown = self._allocate(rows, cols)
+        used_rows, used_cols = self.shape
+        grown[:used_rows, :used_cols] = self._scores[:used_rows, :used_cols]
+        self._scores = grown
+
+    def _add(self, ids, positions, item_id):
+        position = positions.get(item_id)
+        if position is None:
+            position = len(ids)
+            ids.append(item_id)
+            positions[item_id] = position
+        return position
+
+    def _remove_funder_row(self, funder_id):
+        row = self._funder_rows.pop(funder_id)
+        last = len(self._funder_ids) - 1
+        if row != last:
+            moved_id = self._funder_ids[last]
+            self._scores[row] = self._scores[last]
+            self._funder_ids[row] = moved_id
+            self._funder_rows[moved_id] = row
+        self._funder_ids.pop()
+        del self._funders[funder_id]
+
+    def _remove_fundee_col(self, fundee_id):
+        col = self._fundee_cols.pop(fundee_id)
+        last = len(self._fundee_ids) - 1
+        if col != last:
+            moved_id = self._fundee_ids[last]
+            self._scores[:, col] = self._scores[:, last]
+            self._fundee_ids[col] = moved_id
+            self._fundee_cols[moved_id] = col
+        self._fundee_ids.pop()
+        del self._fundees[fundee_id]
+
+    def _replay(self, records):
+        """
+        Apply change records, then recompute the rows and columns they touched.
+
+        Returns:
+        int: Cells computed
+        """
+        changed_funders = set()
+        changed_fundees = set()
+        for record in records:
+            item_id = record["id"]
+            if record["kind"] == "funder":
+                if record["op"] == "upsert":
+                    self._funders[item_id] = record["profile"]
+                    self._ensure_shape(len(self._funder_ids) + 1, len(self._fundee_ids))
+                    self._add(self._funder_ids, self._funder_rows, item_id)
+                    changed_funders.add(item_id)
+                elif item_id in self._funder_rows:
+                    self._remove_funder_row(item_id)
+                    changed_funders.discard(item_id)
+            else:
+                if record["op"] == "upsert":
+                    self._fundees[item_id] = record["profile"]
+                    self._ensure_shape(len(self._funder_ids), len(self._fundee_ids) + 1)
+                    self._add(self._fundee_ids, self._fundee_cols, item_id)
+                    changed_fundees.add(item_id)
+                elif item_id in self._fundee_cols:
+                    self._remove_fundee_col(item_id)
+                    changed_fundees.discard(item_id)
+
+        rows, cols = self.shape
+        if not rows or not cols or not (changed_funders or changed_fundees):
+            return 0
+        all_funders = [self._funders[i] for i in self._funder_ids]
+        all_fundees = [self._fundees[i] for i in self._fundee_ids]
+        if len(changed_funders) * cols + rows * len(changed_fundees) >= rows * cols:
+            self._scores[:rows, :cols] = self.score_block(all_funders, all_fundees)
+            computed = rows * cols
+        else:
+            computed = 0
+            if changed_funders:
+                funder_rows = [self._funder_rows[i] for i in changed_funders]
+                self._scores[funder_rows, :cols] = self.score_block(
+                    [self._funders[i] for i in changed_funders], all_fundees
+                )
+                computed += len(funder_rows) * cols
+            if changed_fundees:
+                fundee_cols = [self._fundee_cols[i] for i in changed_fundees]
+                self._scores[:rows, fundee_cols] = self.score_block(
+                    all_funders, [self._fundees[i] for i in changed_fundees]
+                )
+                computed += rows * len(fundee_cols)
+        self.cells_computed += computed
+        return computed
+
+    def _live_records(self):
+        return [
+            {"op": "upsert", "kind": "funder", "id": i, "profile": self._funders[i]}
+            for i in self._funder_ids
+        ] + [
+            {"op": "upsert", "kind": "fundee", "id": i, "profile": self._fundees[i]}
+            for i in self._fundee_ids
+        ]
+
+    def _profiles(self, kind):
+        return self._funders if kind == "funder" else self._fundees
+
+    def _upsert(self, kind, item_id, profile):
+        with self._writing():
+            # Read after catching up, which may have replaced the dicts
+            if self._profiles(kind).get(item_id) == profile:
+                return 0
+            record = {"op": "upsert", "kind": kind, "id": item_id, "profile": profile}
+            self._log_records([record])
+            return self._replay([record])
+
+    def _remove(self, kind, item_id):
+        with self._writing():
+            if item_id not in self._profiles(kind):
+                return False
+            record = {"op": "remove", "kind": kind, "id": item_id}
+            self._log_records([record])
+            self._replay([record])
+            return True
+
+    def upsert_funder(self, funder_id, profile):
+        """
+        Insert or replace a funder and recompute its row.
+
+        Returns:
+        int: Cells computed, 0 when the profile is unchanged
+        """
+        return self._upsert("funder", funder_id, profile)
+
+    def upsert_fundee(self, fundee_id, profile):
+        """
+        Insert or replace a fundee and recompute its column.
+
+        Returns:
+        int: Cells computed, 0 when the profile is unchanged
+        """
+        return self._upsert("fundee", fundee_id, profile)
+
+    def remove_funder(self, funder_id):
+        """Drop a funder's row by moving the last row into it; False if absent"""
+        return self._remove("funder", funder_id)
+
+    def remove_fundee(self, fundee_id):
+        """Drop a fundee's column by moving the last column into it; False if absent"""
+        return self._remove("fundee", fundee_id)
+
+    def score(self, funder_id, fundee_id):
+        """Stored composite score for one pair, or None if either is unknown"""
+        with self._lock:
+            self.sync()
+            row = self._funder_rows.get(funder_id)
+            col = self._fundee_cols.get(fundee_id)
+            if row is None or col is None:
+                return None
+            return float(self._scores[row, col])
+
+    def top_matches(self, funder_id, top_k=10):
+        """
+        Returns:
+        list: (fundee id, composite score) pairs for the funder's top_k fundees,
+            best first, or None if the funder is unknown
+        """
+        with self._lock:
+            self.sync()
+            row = self._funder_rows.get(funder_id)
+            if row is None:
+                return None
+            n = len(self._fundee_ids)
+            if n == 0 or top_k <= 0:
+                return []
+
+            scores = self._scores[row, :n]
+            return [
+                (self._fundee_ids[i], float(scores[i]))
+                for i in top_indices(scores, top_k)
+            ]
+
+    def load(self):
+        """Replay the change log, computing the matrix in one block"""
+        with self._lock:
+            self.sync()
+            return self.shape
+
+    def stats(self):
+        with self._lock:
+            self.sync()
+            rows, cols = self.shape
+            return {
+                "funders": rows,
+                "fundees": cols,
+                "capacity": list(self._scores.shape),
+                "cells_computed": self.cells_computed,
+            }
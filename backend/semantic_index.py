@@ -0,0 +1,310 @@
+import hashlib
+
+import numpy as np
+
+from change_log import LoggedStore
+from top_k import top_indices
+
+
+class SemanticIndex(LoggedStore):
+    """
+    In-memory embedding matrix for one kind of profile (fundees or funders).
+
+    Rows are L2-normalized float32 embeddings, so scoring a query is a single
+    matrix-vector product. Rows live in a preallocated buffer that grows by
+    doubling; removals move the last row into the freed slot, so neither
+    inserts nor deletes rebuild the matrix.
+
+    Changes (ids and descriptions) are appended to a change log shared by
+    every process serving the index, and each one replays the log before
+    answering; see change_log.py. Replayed descriptions are embedded with
+    embed_many, which maps a list of descriptions to a 2-D embedding matrix
+    and a bool array marking fallback embeddings, and is expected to serve
+    previously seen ones from the embedding cache, so rebuilding the matrix
+    on startup costs no network calls. New descriptions are embedded before
+    any lock is taken, so a slow provider does not hold up searches.
+
+    Rows with a fallback embedding are searchable but not final: upserting
+    the same description again embeds it again.
+
+    Each row also has a content key, a hash of its description, and every
+    applied change bumps a version, so copies taken with snapshot() can be
+    brought up to date with changes_since() and key().
+    """
+
+    # Journal entries kept for changes_since() beyond the number of rows
+    JOURNAL_MIN = 1024
+
+    def __init__(self, log_path=None, embed_many=None, capacity=64):
+        super().__init__(log_path)
+        self.embed_many = embed_many
+        self._capacity = capacity
+        self._clear()
+
+    def _clear(self):
+        self._matrix = None
+        self._ids = []
+        self._rows = {}
+        self._descriptions = {}
+        self._keys = {}
+        self._fallbacks = set()
+        # description -> (embedding, fallback), embedded ahead of a replay
+        self._prepared = getattr(self, "_prepared", {})
+        # A reset invalidates every version handed out before it
+        self._version = getattr(self, "_version", 0) + 1
+        self._journal_base = self._version
+        self._journal = []
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, item_id):
+        return item_id in self._rows
+
+    def _ensure_capacity(self, dim):
+        if self._matrix is None:
+            self._matrix = np.zeros((self._capacity, dim), dtype=np.float32)
+        elif self._matrix.shape[1] != dim:
+            raise ValueError(
+                f"Embedding has {dim} dimensions, index expects {self._matrix.shape[1]}"
+            )
+        elif len(self._ids) == self._matrix.shape[0]:
+            grown = np.zeros((self._matrix.shape[0] * 2, dim), dtype=np.float32)
+            grown[: len(self._ids)] = self._matrix
+            self._matrix = grown
+
+    def _set_row(self, item_id, embedding):
+        embedding = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(embedding)
+        if norm > 0:
+            embedding = embedding / norm
+
+        row = self._rows.get(item_id)
+        if row is None:
+            self._ensure_capacity(embedding.shape[0])
+            row = len(self._ids)
+            self._ids.append(item_id)
+            self._rows[item_id] = row
+        self._matrix[row] = embedding
+
+    def _remove_row(self, item_id):
+        row = self._rows.pop(item_id, None)
+        if row is None:
+            return False
+
+        last = len(self._ids) - 1
+        if row != last:
+            moved_id = self._ids[last]
+            self._matrix[row] = self._matrix[last]
+            self._ids[row] = moved_id
+            self._rows[moved_id] = row
+        self._ids.pop()
+        self._descriptions.pop(item_id, None)
+        self._keys.pop(item_id, None)
+        self._fallbacks.discard(item_id)
+        return True
+
+    def _apply(self, records, embeddings):
+        """
+        Apply change records; embeddings maps upserted descriptions to
+        (vector, fallback) pairs
+        """
+        for record in records:
+            if record["op"] == "upsert":
+                item_id, description = record["id"], record["description"]
+                embedding, fallback = embeddings[description]
+                self._set_row(item_id, embedding)
+                self._descriptions[item_id] = description
+                self._keys[item_id] = content_key(description, fallback)
+                if fallback:
+                    self._fallbacks.add(item_id)
+                else:
+                    self._fallbacks.discard(item_id)
+            else:
+                self._remove_row(record["id"])
+            self._version += 1
+            self._journal.append(record["id"])
+        if len(self._journal) > max(self.JOURNAL_MIN, 2 * len(self._ids)):
+            self._journal_base = self._version
+            self._journal = []
+
+    def _embed(self, descriptions):
+        """description -> (vector, fallback) for each of descriptions"""
+        descriptions = list(dict.fromkeys(descriptions))
+        if not descriptions:
+            return {}
+        vectors, fallbacks = self.embed_many(descriptions)
+        return {
+            description: (vector, bool(fallback))
+            for description, vector, fallback in zip(descriptions, vectors, fallbacks)
+        }
+
+    def sync(self):
+        if self._log is not None:
+            records, _ = self._log.peek()
+            descriptions = [r["description"] for r in records if r["op"] == "upsert"]
+            with self._lock:
+                descriptions = [d for d in descriptions if d not in self._prepared]
+            if descriptions:
+                embedded = self._embed(descriptions)
+                with self._lock:
+                    self._prepared.update(embedded)
+        return super().sync()
+
+    def _replay(self, records):
+        descriptions = [r["description"] for r in records if r["op"] == "upsert"]
+        embeddings = {
+            description: self._prepared.pop(description)
+            for description in descriptions
+            if description in self._prepared
+        }
+        # Only records appended since sync() peeked are embedded here
+        embeddings.update(self._embed(d for d in descriptions if d not in embeddings))
+        self._apply(records, embeddings)
+        # Whatever is left was peeked but compacted away before it was read
+        self._prepared.clear()
+
+    def _live_records(self):
+        return [
+            {"op": "upsert", "id": item_id, "description": self._descriptions[item_id]}
+            for item_id in self._ids
+        ]
+
+    def upsert(self, item_id, description, embedding, fallback=False):
+        """Insert or replace the row for item_id"""
+        fallback_ids = {item_id} if fallback else ()
+        return self.upsert_many([(item_id, description, embedding)], fallback_ids)
+
+    def upsert_many(self, items, fallback_ids=()):
+        """
+        Insert or replace (id, description, embedding) rows.
+
+        Rows whose description is unchanged are left alone, so re-sending a
+        whole table only logs what changed, unless their current embedding
+        is a fallback. fallback_ids are the ids in items whose embedding is
+        itself a fallback.
+
+        Returns:
+        int: Rows inserted or replaced
+        """
+        items = list(items)
+        fallback_ids = set(fallback_ids)
+        with self._writing():
+            records = []
+            embeddings = {}
+            for item_id, description, embedding in items:
+                if (
+                    self._descriptions.get(item_id) == description
+                    and item_id not in self._fallbacks
+                ):
+                    continue
+                records.append(
+                    {"op": "upsert", "id": item_id, "description": description}
+                )
+                embeddings[description] = (embedding, item_id in fallback_ids)
+            self._log_records(records)
+            self._apply(records, embeddings)
+            return len(records)
+
+    def remove(self, item_id):
+        """Remove item_id by moving the last row into its slot; returns False if absent"""
+        return self.remove_many([item_id]) == 1
+
+    def remove_many(self, item_ids):
+        """Remove every id in item_ids present in the index; returns how many were"""
+        with self._writing():
+            records = [
+                {"op": "remove", "id": item_id}
+                for item_id in dict.fromkeys(item_ids)
+                if item_id in self._rows
+            ]
+            self._log_records(records)
+            self._apply(records, {})
+            return len(records)
+
+    def ids(self):
+        self.sync()
+        with self._lock:
+            return list(self._ids)
+
+    def fallback_count(self):
+        """Rows whose embedding is a fallback, to be replaced when upserted again"""
+        with self._lock:
+            return len(self._fallbacks)
+
+    def key(self, item_id):
+        """Content key of item_id's description, None if it is not indexed"""
+        with self._lock:
+            return self._keys.get(item_id)
+
+    def changes_since(self, version):
+        """
+        Ids upserted or removed since version, a value from a previous call.
+
+        Returns:
+        tuple: (ids, version). ids is None when the changes are no longer
+            known (the index was reset or the journal trimmed), in which case
+            every id should be treated as changed.
+        """
+        self.sync()
+        with self._lock:
+            if version is None or version < self._journal_base:
+                return None, self._version
+            return set(self._journal[version - self._journal_base :]), self._version
+
+    def snapshot(self):
+        """
+        Copies of the ids, their normalized rows and content keys, in row order.
+
+        Returns:
+        tuple: (ids, matrix, keys, version)
+        """
+        self.sync()
+        with self._lock:
+            n = len(self._ids)
+            if self._matrix is None:
+                return [], np.zeros((0, 0), dtype=np.float32), [], self._version
+            keys = [self._keys[item_id] for item_id in self._ids]
+            return list(self._ids), self._matrix[:n].copy(), keys, self._version
+
+    def vectors(self, item_ids):
+        """Normalized rows for item_ids, None for ids not in the index"""
+        self.sync()
+        with self._lock:
+            return [
+                self._matrix[self._rows[item_id]].copy()
+                if item_id in self._rows
+                else None
+                for item_id in item_ids
+            ]
+
+    def search(self, query_embedding, top_k=10):
+        """
+        Score every row against the query.
+
+        Returns:
+        list: (id, cosine similarity) pairs for the top_k rows, best first
+        """
+        self.sync()
+        with self._lock:
+            n = len(self._ids)
+            if n == 0 or top_k <= 0:
+                return []
+
+            query = np.asarray(query_embedding, dtype=np.float32).ravel()
+            norm = np.linalg.norm(query)
+            if norm > 0:
+                query = query / norm
+
+            scores = self._matrix[:n] @ query
+
+            return [
+                (self._ids[i], float(scores[i])) for i in top_indices(scores, top_k)
+            ]
+
+
+def content_key(description, fallback=False):
+    """Short stable hash identifying a description's embedding"""
+    key = hashlib.blake2b(description.encode("utf-8"), digest_size=8).hexdigest()
+    # A fallback and a real embedding of the same text are different rows
+    return key + "-fallback" if fallback else key
@@ -76,6 +76,11 @@ test_data = {
     "impact-score": {
         "total_credits": 1000
     },
+    "bulk-scores": {
+        "total_credits": [300, 1000, 0],
+        "expected_credits": [1200, 800, 500],
+        "amount_invested": [50000, 250000, 0]
+    },
     "goal-alignment": {
         "funder_description": "We fund innovative direct air capture technologies focused on scalable solutions.",
         "fundee_description": "Our startup develops direct ocean capture technology to remove CO2 from seawater."
@@ -87,6 +92,77 @@ test_data = {
     "funding-capability-match": {
         "funder_capability": 750000,
         "fundee_needs": 500000
+    },
+    "dynamic-scores": {
+        "funder_description": "We fund innovative direct air capture technologies focused on scalable solutions.",
+        "fundee_description": "Our startup develops direct ocean capture technology to remove CO2 from seawater.",
+        "funder_location": [37.7749, -122.4194],
+        "fundee_location": [37.8719, -122.2585],
+        "funder_capability": 750000,
+        "fundee_needs": 500000
+    },
+    "rank-matches": {
+        "funder": {
+            "funder_description": "We fund innovative direct air capture technologies focused on scalable solutions.",
+            "funder_location": [37.7749, -122.4194],
+            "funder_capability": 750000
+        },
+        "fundees": [
+            {
+                "id": 1,
+                "fundee_description": "Our startup develops direct ocean capture technology to remove CO2 from seawater.",
+                "fundee_location": [37.8719, -122.2585],
+                "fundee_needs": 500000,
+                "total_credits": 300,
+                "expected_credits": 1200,
+                "amount_invested": 50000
+            },
+            {
+                "id": 2,
+                "fundee_description": "We restore kelp forests along the Pacific coast to sequester blue carbon.",
+                "fundee_location": [49.2827, -123.1207],
+                "fundee_needs": 1500000,
+                "total_credits": 1000,
+                "expected_credits": 800,
+                "amount_invested": 120000
+            }
+        ],
+        "top_k": 1
+    },
+    "cascade-rank-matches": {
+        "funder": {
+            "funder_description": "We fund innovative direct air capture technologies focused on scalable solutions.",
+            "funder_location": [37.7749, -122.4194],
+            "funder_capability": 750000,
+            "funding_stages": ["Pilot", "Seed"],
+            "focus_areas": ["Direct Ocean Capture", "Ocean Alkalinity Enhancement"]
+        },
+        "fundees": [
+            {
+                "id": 1,
+                "fundee_description": "Our startup develops direct ocean capture technology to remove CO2 from seawater.",
+                "fundee_location": [37.8719, -122.2585],
+                "fundee_needs": 500000,
+                "stage": "Pilot",
+                "mcdr_type": "Direct Ocean Capture",
+                "total_credits": 300,
+                "expected_credits": 1200,
+                "amount_invested": 50000
+            },
+            {
+                "id": 2,
+                "fundee_description": "We restore kelp forests along the Pacific coast to sequester blue carbon.",
+                "fundee_location": [49.2827, -123.1207],
+                "fundee_needs": 500000,
+                "stage": "Seed",
+                "mcdr_type": "Macroalgae",
+                "total_credits": 1000,
+                "expected_credits": 800,
+                "amount_invested": 120000
+            }
+        ],
+        "max_distance_km": 2000,
+        "top_k": 1
     }
 }
 
@@ -118,7 +194,10 @@ def main():
         ("Funding Capability Match", "funding-capability-match", test_data["funding-capability-match"]),
         ("Efficiency Score", "efficiency-score", test_data["efficiency-score"]),
         ("Impact Score", "impact-score", test_data["impact-score"]),
-        ("Location Match", "location-match", test_data["location-match"])
+        ("Location Match", "location-match", test_data["location-match"]),
+        ("Bulk Risk Scores", "risk-score/bulk", test_data["bulk-scores"]),
+        ("Bulk Efficiency Scores", "efficiency-score/bulk", test_data["bulk-scores"]),
+        ("Bulk Impact Scores", "impact-score/bulk", test_data["bulk-scores"])
     ]
     
     simple_results = []
@@ -136,13 +215,16 @@ def main():
     print_separator()
     print("STEP 5: Testing goal alignment (embeddings)...\n")
     alignment_result = test_endpoint("Goal Alignment", f"{BASE_URL}/api/goal-alignment", "POST", test_data["goal-alignment"])
+    dynamic_result = test_endpoint("Dynamic Scores", f"{BASE_URL}/api/dynamic-scores", "POST", test_data["dynamic-scores"])
+    rank_result = test_endpoint("Rank Matches", f"{BASE_URL}/api/rank-matches", "POST", test_data["rank-matches"])
+    cascade_result = test_endpoint("Cascade Rank Matches", f"{BASE_URL}/api/cascade-rank-matches", "POST", test_data["cascade-rank-matches"])
     
     # Summary
     print_separator()
     print("TEST SUMMARY\n")
     
-    total_tests = len(simple_endpoints) + 3  # health, risk, goal alignment
-    successful_tests = sum([1 for result in [server_ok, risk_result, alignment_result] + simple_results if result])
+    total_tests = len(simple_endpoints) + 6  # health, risk, goal alignment, dynamic scores, rank matches, cascade
+    successful_tests = sum([1 for result in [server_ok, risk_result, alignment_result, dynamic_result, rank_result, cascade_result] + simple_results if result])
     
     print(f"Total tests: {total_tests}")
     print(f"Successful: {successful_tests}")
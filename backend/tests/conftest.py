@@ -0,0 +1,21 @@
+import os
+import sys
+import tempfile
+
+# The backend is a set of top-level modules run from backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importing main must not call out to a provider or touch backend/.*
+os.environ.setdefault("EMBEDDING_PROVIDER", "local")
+os.environ.setdefault("WARM_UP", "off")
+_data_dir = tempfile.mkdtemp(prefix="backend-tests-")
+for name in (
+    "EMBEDDING_CACHE_DIR",
+    "SEMANTIC_INDEX_DIR",
+    "GEO_INDEX_DIR",
+    "SCORE_MATRIX_DIR",
+    "EMBEDDING_STORE_DIR",
+    "CATALOG_DIR",
+    "PROFILE_DIR",
+):
+    os.environ.setdefault(name, os.path.join(_data_dir, name.lower()))
@@ -0,0 +1,78 @@
+import pytest
+
+import main
+
+# Each row is (total_credits, expected_credits, amount_invested); includes
+# missing values and zeros, which take the scalar functions' early returns
+ROWS = [
+    (100, 80, 5000),
+    (2500, 3000, 120000),
+    (0, 80, 5000),
+    (100, 0, 5000),
+    (100, 80, 0),
+    (0, 0, 0),
+    (None, 80, 5000),
+    (100, None, 5000),
+    (100, 80, None),
+    (None, None, None),
+    (1e7, 1, 1e9),
+]
+KEYS = ("total_credits", "expected_credits", "amount_invested")
+
+
+def _scalar_payload(row, keys=KEYS):
+    return {key: value for key, value in zip(KEYS, row) if key in keys}
+
+
+def _columns(rows):
+    return {key: [row[i] for row in rows] for i, key in enumerate(KEYS)}
+
+
+@pytest.mark.parametrize(
+    "endpoint, scalar_key, bulk_key, keys",
+    [
+        ("risk-score", "risk_score", "risk_scores", KEYS),
+        ("efficiency-score", "efficiency_score", "efficiency_scores", KEYS),
+        ("impact-score", "impact_score", "impact_scores", ("total_credits",)),
+    ],
+)
+def test_bulk_matches_scalar(endpoint, scalar_key, bulk_key, keys):
+    client = main.app.test_client()
+    expected = []
+    for row in ROWS:
+        response = client.post(f"/api/{endpoint}", json=_scalar_payload(row, keys))
+        assert response.status_code == 200, row
+        expected.append(response.get_json()[scalar_key])
+
+    columns = {key: column for key, column in _columns(ROWS).items() if key in keys}
+    response = client.post(f"/api/{endpoint}/bulk", json=columns)
+    assert response.status_code == 200
+    assert response.get_json()[bulk_key] == expected
+
+
+def test_base_scores_match_scalar():
+    client = main.app.test_client()
+    response = client.post(
+        "/api/base-scores", json={"ids": list(range(len(ROWS))), **_columns(ROWS)}
+    )
+    assert response.status_code == 200
+    scores = {score["id"]: score for score in response.get_json()["scores"]}
+
+    for i, row in enumerate(ROWS):
+        payload = _scalar_payload(row)
+        for endpoint, key in (
+            ("risk-score", "risk_score"),
+            ("efficiency-score", "efficiency_score"),
+            ("impact-score", "impact_score"),
+        ):
+            scalar = client.post(f"/api/{endpoint}", json=payload).get_json()[key]
+            assert scores[i][key] == scalar, (row, key)
+
+
+def test_bulk_rejects_ragged_columns():
+    client = main.app.test_client()
+    response = client.post(
+        "/api/risk-score/bulk",
+        json={"total_credits": [1, 2], "expected_credits": [1]},
+    )
+    assert response.status_code == 400
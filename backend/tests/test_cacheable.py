@@ -0,0 +1,36 @@
+import main
+
+
+def test_get_is_cacheable_and_conditional():
+    client = main.app.test_client()
+    response = client.get(
+        "/api/risk-score?total_credits=100&expected_credits=80&amount_invested=5000"
+    )
+    assert response.status_code == 200
+    assert "public" in response.headers["Cache-Control"]
+    etag = response.headers["ETag"]
+
+    repeat = client.get(
+        "/api/risk-score?total_credits=100&expected_credits=80&amount_invested=5000",
+        headers={"If-None-Match": etag},
+    )
+    assert repeat.status_code == 304
+    assert repeat.get_data() == b""
+
+
+def test_post_is_not_cached_or_conditional():
+    client = main.app.test_client()
+    payload = {"total_credits": 100, "expected_credits": 80, "amount_invested": 5000}
+    response = client.post("/api/risk-score", json=payload)
+    assert response.status_code == 200
+    assert "ETag" not in response.headers
+    assert "public" not in response.headers.get("Cache-Control", "")
+
+    etag = client.get(
+        "/api/risk-score?total_credits=100&expected_credits=80&amount_invested=5000"
+    ).headers["ETag"]
+    repeat = client.post(
+        "/api/risk-score", json=payload, headers={"If-None-Match": etag}
+    )
+    assert repeat.status_code == 200
+    assert repeat.get_json() == response.get_json()
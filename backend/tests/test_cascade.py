@@ -0,0 +1,98 @@
+import main
+
+FUNDER = {
+    "funder_description": "Funds ocean carbon removal with monitoring",
+    "funder_location": [42.0, -70.0],
+    "funder_capability": 100000.0,
+    "funding_stages": ["Seed", "series a"],
+    "focus_areas": ["Kelp"],
+}
+
+
+def fundee(
+    item_id, needs=50000.0, stage="seed", mcdr_type="kelp", location=(43.0, -69.0)
+):
+    return {
+        "id": item_id,
+        "fundee_description": f"Kelp project {item_id} sinking biomass offshore",
+        "fundee_location": list(location) if location else None,
+        "fundee_needs": needs,
+        "total_credits": 100.0 * item_id,
+        "expected_credits": 900.0,
+        "amount_invested": 40000.0 + 1000 * item_id,
+        "stage": stage,
+        "mcdr_type": mcdr_type,
+    }
+
+
+FUNDEES = [
+    fundee(1),
+    fundee(2, needs=500000.0),  # funding
+    fundee(3, needs=500000.0, stage="series c"),  # funding, counted there only
+    fundee(4, stage="Series C"),  # stage
+    fundee(5, mcdr_type="alkalinity"),  # focus_area
+    fundee(6, location=(-33.0, 151.0)),  # distance
+    # Missing fields pass every filter
+    fundee(7, needs=None, stage=None, mcdr_type=None, location=None),
+    fundee(8, stage=" SERIES A "),
+    fundee(9),
+    fundee(10),
+]
+
+
+def ids(matches):
+    return [match["id"] for match in matches]
+
+
+def test_filters_and_report():
+    matches, report = main.cascade_rank_matches(
+        FUNDER, FUNDEES, top_k=None, semantic_top_m=3, max_distance_km=1000
+    )
+    filters, cheap, semantic = report["stages"]
+    assert report["candidates"] == 10
+    assert filters["dropped_by"] == {
+        "funding": 2,
+        "stage": 1,
+        "focus_area": 1,
+        "distance": 1,
+    }
+    assert (filters["dropped"], filters["remaining"]) == (5, 5)
+    assert (cheap["dropped"], cheap["remaining"]) == (2, 3)
+    assert (semantic["dropped"], semantic["remaining"]) == (0, 3)
+    assert report["embedded"] == 3
+    assert set(ids(matches)) <= {1, 7, 8, 9, 10}
+    assert len(matches) == 3
+
+
+def test_filters_apply_only_when_the_funder_states_them():
+    funder = {"funder_description": FUNDER["funder_description"]}
+    matches, report = main.cascade_rank_matches(
+        funder, FUNDEES, top_k=None, semantic_top_m=len(FUNDEES), max_distance_km=1000
+    )
+    assert report["stages"][0]["dropped_by"] == {}
+    assert len(matches) == len(FUNDEES)
+
+
+def test_matches_rank_matches_on_the_survivors():
+    survivors = [FUNDEES[i] for i in (0, 6, 7, 8, 9)]
+    expected = main.rank_matches(FUNDER, survivors, top_k=4)
+    matches, report = main.cascade_rank_matches(
+        FUNDER, FUNDEES, top_k=4, semantic_top_m=10, max_distance_km=1000
+    )
+    # Same scores and order; index still points into the full fundees list
+    assert [FUNDEES[match.pop("index")]["id"] for match in matches] == ids(matches)
+    for match in expected:
+        del match["index"]
+    assert matches == expected
+    assert report["stages"][2]["remaining"] == 4
+
+
+def test_no_embedding_without_alignment_weight():
+    weights = {"mission_alignment": 0}
+    matches, report = main.cascade_rank_matches(
+        FUNDER, FUNDEES, weights=weights, top_k=None, semantic_top_m=1
+    )
+    # Without a semantic stage every survivor is returned
+    assert report["embedded"] == 0
+    assert report["stages"][1]["dropped"] == 0
+    assert len(matches) == report["stages"][0]["remaining"]
@@ -0,0 +1,78 @@
+import pytest
+
+import main
+from catalog import Catalog
+
+FUNDEES = [
+    {
+        "id": "seed:1",
+        "name": "Kelp Co",
+        "fundee_description": "Kelp farming that sinks biomass offshore",
+        "fundee_location": [44.0, -68.0],
+        "fundee_needs": 250000.0,
+        "total_credits": 1200.0,
+        "expected_credits": 900.0,
+        "amount_invested": 50000.0,
+    },
+    # Missing numeric fields, which the scores default rather than treat as 0
+    {
+        "id": "seed:2",
+        "name": "Alkalinity Labs",
+        "fundee_description": "Ocean alkalinity enhancement pilots",
+        "fundee_location": None,
+    },
+    {
+        "id": "seed:3",
+        "name": "Zero Reef",
+        "fundee_description": "Seagrass restoration",
+        "fundee_location": [10.0, 120.0],
+        "fundee_needs": 0.0,
+        "total_credits": 0.0,
+        "expected_credits": 0.0,
+        "amount_invested": 0.0,
+    },
+]
+FUNDER = {
+    "funder_description": "Funds ocean carbon removal with monitoring",
+    "funder_location": [42.0, -70.0],
+    "funder_capability": 1000000.0,
+}
+
+
+def test_missing_numbers_round_trip_as_none(tmp_path):
+    embeddings = main.get_embeddings([f["fundee_description"] for f in FUNDEES])
+    catalog = Catalog.write(
+        str(tmp_path),
+        {"fundee": [(f["id"], "hash", f, e) for f, e in zip(FUNDEES, embeddings)]},
+        {},
+        embeddings.shape[1],
+    )
+    profiles = {profile["id"]: profile for profile in catalog.profiles("fundee")}
+    assert profiles["seed:2"]["total_credits"] is None
+    assert profiles["seed:2"]["fundee_needs"] is None
+    assert profiles["seed:3"]["total_credits"] == 0.0
+
+
+def test_catalog_ranking_matches_rank_matches(tmp_path, monkeypatch):
+    embeddings = main.get_embeddings([f["fundee_description"] for f in FUNDEES])
+    catalog = Catalog.write(
+        str(tmp_path),
+        {"fundee": [(f["id"], "hash", f, e) for f, e in zip(FUNDEES, embeddings)]},
+        {},
+        embeddings.shape[1],
+    )
+    monkeypatch.setattr(main, "catalog", catalog)
+
+    expected = main.rank_matches(FUNDER, catalog.profiles("fundee"))
+    actual = main.rank_catalog_matches(FUNDER, top_k=len(FUNDEES))
+    assert [m["id"] for m in actual] == [m["id"] for m in expected]
+    for got, want in zip(actual, expected):
+        for key, value in want.items():
+            if isinstance(value, float):
+                assert got[key] == pytest.approx(value, abs=1e-6), key
+
+    # The same profiles as sent to /api/rank-matches, without the catalog columns
+    direct = main.rank_matches(FUNDER, FUNDEES)
+    assert [m["composite_score"] for m in actual] == pytest.approx(
+        [m["composite_score"] for m in direct], abs=1e-6
+    )
@@ -0,0 +1,91 @@
+import pytest
+
+import circuit_breaker
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class FakeClock:
+    """Stands in for the time module; advanced by hand"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(circuit_breaker, "time", clock)
+    return clock
+
+
+def trip(breaker):
+    for _ in range(breaker.failure_threshold):
+        assert breaker.allow()
+        breaker.record_failure()
+
+
+def test_trips_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=10)
+    assert breaker.allow()
+    assert not breaker.record_failure()
+    assert not breaker.record_failure()
+    # A success resets the count
+    assert not breaker.record_success()
+    assert not breaker.record_failure()
+    assert not breaker.record_failure()
+    assert breaker.state == CLOSED
+
+    assert breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.stats()["trips"] == 1
+    assert breaker.stats()["rejected"] == 1
+    assert breaker.stats()["retry_in_seconds"] == 10
+
+
+def test_half_open_lets_one_probe_through(clock):
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=10)
+    trip(breaker)
+
+    clock.now += 9.9
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+    clock.now += 0.1
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+    assert breaker.stats()["rejected"] == 2
+
+
+def test_successful_probe_closes(clock):
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=10)
+    trip(breaker)
+    clock.now += 10
+    assert breaker.allow()
+
+    assert breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+    assert breaker.allow()
+    # One failure is no longer enough to trip it
+    assert not breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_failed_probe_reopens_for_another_cooldown(clock):
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=10)
+    trip(breaker)
+    clock.now += 10
+    assert breaker.allow()
+
+    assert breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.stats()["trips"] == 2
+    clock.now += 5
+    assert not breaker.allow()
+    clock.now += 5
+    assert breaker.allow()
@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+
+from embedding_store import QuantizedEmbeddingStore
+from semantic_index import SemanticIndex
+
+DIMENSIONS = 384
+
+
+def clustered_vectors(rng, n, clusters=50):
+    """
+    float64 unit vectors around a few centres, like embeddings of similar
+    profiles; the exact baseline is scored in float64, so the accuracy
+    checks measure quantization error only
+    """
+    centres = rng.standard_normal((clusters, DIMENSIONS))
+    matrix = centres[rng.integers(clusters, size=n)]
+    matrix += 0.5 * rng.standard_normal((n, DIMENSIONS))
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    rng = np.random.default_rng(7)
+    matrix = clustered_vectors(rng, 5000)
+    ids = list(range(len(matrix)))
+    store = QuantizedEmbeddingStore.write(str(tmp_path), ids, matrix)
+    queries = clustered_vectors(rng, 50)
+    return store, matrix, queries
+
+
+def exact_top(matrix, query, k):
+    scores = matrix.astype(np.float64) @ query.astype(np.float64)
+    return set(np.argsort(-scores, kind="stable")[:k].tolist())
+
+
+def test_recall_and_score_error(corpus):
+    store, matrix, queries = corpus
+    k = 10
+    recalls = []
+    for query in queries:
+        hits = store.search(query, k)
+        recalls.append(
+            len({item_id for item_id, _ in hits} & exact_top(matrix, query, k)) / k
+        )
+        exact = matrix[[item_id for item_id, _ in hits]] @ query
+        assert np.max(np.abs(exact - [score for _, score in hits])) < 0.01
+    assert np.mean(recalls) >= 0.95
+
+
+def test_rerank_restores_exact_results(corpus):
+    store, matrix, queries = corpus
+    rerank = lambda item_ids: matrix[item_ids]  # noqa: E731
+    for query in queries:
+        hits = store.search(query, 10, rerank=rerank)
+        assert {item_id for item_id, _ in hits} == exact_top(matrix, query, 10)
+        exact = matrix[[item_id for item_id, _ in hits]] @ query
+        assert np.allclose([score for _, score in hits], exact, atol=1e-5)
+
+
+def test_exclude(corpus):
+    store, matrix, queries = corpus
+    best = [item_id for item_id, _ in store.search(queries[0], 5)]
+    hits = store.search(queries[0], 5, exclude=best[:2] + [-1])
+    assert not set(best[:2]) & {item_id for item_id, _ in hits}
+    assert len(hits) == 5
+
+
+def test_quantized_search_follows_live_index(tmp_path, monkeypatch):
+    import main
+
+    rng = np.random.default_rng(11)
+    vectors = clustered_vectors(rng, 100)
+    index = SemanticIndex()
+    index.upsert_many((i, f"profile {i}", vectors[i]) for i in range(100))
+    monkeypatch.setitem(main.semantic_indexes, "fundee", index)
+    monkeypatch.setitem(main.embedding_stores, "fundee", None)
+    monkeypatch.setattr(main, "EMBEDDING_STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "_snapshot_staleness", {})
+    main.snapshot_semantic_index("fundee")
+
+    query = vectors[3]
+    assert main.quantized_search("fundee", query, 1)[0][0] == 3
+
+    # Deleted ids drop out, new ids are found, edits are scored live
+    index.remove(3)
+    index.upsert(100, "profile 100", query)
+    index.upsert(4, "profile 4, edited", -query)
+    hits = dict(main.quantized_search("fundee", query, 100))
+    assert 3 not in hits
+    assert hits[100] == pytest.approx(1.0, abs=1e-5)
+    assert hits[4] == pytest.approx(-1.0, abs=1e-5)
+    assert len(hits) == 100
+    assert main.embedding_stores["fundee"].key(3) is not None
+
+    # Reverting an edit makes the snapshot row current again
+    index.upsert(4, "profile 4", vectors[4])
+    main.quantized_search("fundee", query, 1)
+    assert 4 not in main._snapshot_staleness["fundee"][2]
+
+    # Too many changes rewrite the snapshot
+    monkeypatch.setattr(main, "SNAPSHOT_STALE_MIN", 0)
+    monkeypatch.setattr(main, "SNAPSHOT_STALE_RATIO", 0.01)
+    main.quantized_search("fundee", query, 1)
+    store = main.embedding_stores["fundee"]
+    assert 3 not in store and 100 in store
+    assert main._snapshot_staleness["fundee"][2] == set()
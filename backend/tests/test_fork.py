@@ -0,0 +1,32 @@
+import os
+import threading
+
+import embedding_providers
+import main
+
+
+def held_at_fork(get_lock):
+    """Fork while another thread holds a lock; True if the child can take it"""
+    holding = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with get_lock():
+            holding.set()
+            release.wait()
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    holding.wait()
+    pid = os.fork()
+    if pid == 0:
+        os._exit(0 if get_lock().acquire(timeout=2) else 1)
+    release.set()
+    thread.join()
+    _, status = os.waitpid(pid, 0)
+    return os.WEXITSTATUS(status) == 0
+
+
+def test_gemini_locks_are_fresh_in_forked_workers():
+    assert held_at_fork(lambda: main._gemini_health_lock)
+    assert held_at_fork(lambda: embedding_providers._genai_lock)
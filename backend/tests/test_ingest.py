@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+import ingest
+from catalog import Catalog
+
+DIMENSIONS = 8
+
+
+def organizations(path, chunk_size):
+    yield pd.DataFrame(
+        [
+            {"Company": name, "Description": f"{name} restores kelp", "Sector": "NGO"}
+            for name in ("Alpha", "Beta", "Gamma")
+        ]
+    )
+
+
+SOURCES = {
+    "organizations": ("organizations.csv", organizations, ingest.organization_records)
+}
+
+
+class FlakyEmbedder:
+    """Embeds texts, returning fallback rows for those in failing"""
+
+    def __init__(self):
+        self.failing = set()
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        fallbacks = np.array([text in self.failing for text in texts])
+        return np.ones((len(texts), DIMENSIONS), dtype=np.float32), fallbacks
+
+
+def run(directory, embed):
+    return ingest.ingest(
+        directory, embed, "model", dimensions=DIMENSIONS, sources=SOURCES
+    )
+
+
+def test_fallback_rows_are_retried(tmp_path):
+    embed = FlakyEmbedder()
+    embed.failing = {"Beta restores kelp"}
+    result = run(str(tmp_path), embed)
+    assert (result["new"], result["embedded"], result["fallback"]) == (3, 2, 1)
+    catalog = Catalog.open(str(tmp_path))
+    hashes = dict(zip(catalog.ids("funder"), catalog.hashes("funder")))
+    assert hashes["organizations:Beta"] == ingest.RETRY_HASH
+
+    # Only the fallback row is embedded again, and then kept
+    embed.failing = set()
+    result = run(str(tmp_path), embed)
+    assert embed.calls[-1] == ["Beta restores kelp"]
+    assert (result["unchanged"], result["changed"], result["fallback"]) == (2, 1, 0)
+    assert result["written"]
+
+    result = run(str(tmp_path), embed)
+    assert (result["unchanged"], result["written"]) == (3, False)
+    assert len(embed.calls) == 2
+
+
+def test_get_embeddings_with_fallbacks_marks_failed_texts(monkeypatch):
+    import main
+
+    def provider_embed(texts):
+        if "down" in texts[0] or len(texts) > 1:
+            raise RuntimeError("provider unavailable")
+        return [np.ones(main.embedding_provider.dimensions)]
+
+    monkeypatch.setattr(main, "_provider_embed", provider_embed)
+    monkeypatch.setattr(main.embedding_cache, "get", lambda key: None)
+    monkeypatch.setattr(main.embedding_cache, "put", lambda key, value: None)
+    matrix, fallbacks = main.get_embeddings_with_fallbacks(["up", "down", "up"])
+    assert matrix.shape[0] == 3
+    assert fallbacks.tolist() == [False, True, False]
@@ -0,0 +1,86 @@
+import pytest
+
+import memo_cache
+from memo_cache import MemoCache
+
+
+class FakeClock:
+    """Stands in for the time module; advanced by hand"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(memo_cache, "time", clock)
+    return clock
+
+
+def counting(value):
+    calls = []
+
+    def compute():
+        calls.append(value)
+        return value
+
+    return compute, calls
+
+
+def test_hits_until_ttl_expires(clock):
+    cache = MemoCache(ttl=5)
+    compute, calls = counting("a")
+    assert cache.get_or_compute("k", compute) == "a"
+    clock.now += 4.9
+    assert cache.get_or_compute("k", compute) == "a"
+    assert len(calls) == 1
+
+    clock.now += 0.1
+    assert cache.get_or_compute("k", compute) == "a"
+    assert len(calls) == 2
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["expirations"]) == (1, 2, 1)
+
+
+def test_ttl_counts_from_compute_not_last_hit(clock):
+    cache = MemoCache(ttl=5)
+    compute, calls = counting("a")
+    cache.get_or_compute("k", compute)
+    for _ in range(4):
+        clock.now += 1.5
+        cache.get_or_compute("k", compute)
+    # Hits at 1.5, 3.0 and 4.5; the miss at 6.0 recomputes
+    assert len(calls) == 2
+
+
+def test_evicts_least_recently_used(clock):
+    cache = MemoCache(max_entries=2)
+    cache.get_or_compute("a", lambda: 1)
+    cache.get_or_compute("b", lambda: 2)
+    # Touching a makes b the least recently used
+    cache.get_or_compute("a", lambda: pytest.fail("a should be cached"))
+    cache.get_or_compute("c", lambda: 3)
+
+    assert len(cache) == 2
+    assert cache.stats()["evictions"] == 1
+    assert cache.get_or_compute("a", lambda: pytest.fail("a was evicted")) == 1
+    assert cache.get_or_compute("c", lambda: pytest.fail("c was evicted")) == 3
+    compute, calls = counting(2)
+    assert cache.get_or_compute("b", compute) == 2
+    assert calls == [2]
+
+
+def test_exceptions_are_not_cached(clock):
+    cache = MemoCache()
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        cache.get_or_compute("k", fail)
+    assert len(cache) == 0
+    assert cache.get_or_compute("k", lambda: 7) == 7
@@ -0,0 +1,62 @@
+import os
+import re
+import threading
+
+from metrics import MetricsRegistry
+
+
+def sample(text, name):
+    return float(re.search(rf"^{re.escape(name)} (\S+)$", text, re.M).group(1))
+
+
+def test_finished_threads_are_folded():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests", ("route",))
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+
+    def handle():
+        requests.inc("/")
+        latency.observe(0.5)
+
+    for _ in range(300):
+        thread = threading.Thread(target=handle)
+        thread.start()
+        thread.join()
+
+    assert requests.values() == {("/",): 300}
+    assert requests.shard_count() == 0
+    assert latency.values()[()] == [0, 300, 0, 150.0]
+    requests.inc("/")
+    assert requests.shard_count() == 1
+    assert requests.values() == {("/",): 301}
+
+
+def test_processes_sharing_a_directory_are_summed(tmp_path):
+    directory = str(tmp_path)
+    registry = MetricsRegistry(directory=directory, flush_interval=3600)
+    requests = registry.counter("requests_total", "Requests")
+    registry.gauge_callback("queue_depth", "Queue depth", lambda: 2)
+    requests.inc(amount=5)
+
+    pid = os.fork()
+    if pid == 0:
+        # A worker: starts from zero, counts, writes its file and exits
+        registry.after_fork()
+        requests.inc(amount=7)
+        registry.flush()
+        os._exit(0)
+    os.waitpid(pid, 0)
+
+    text = registry.render()
+    assert sample(text, "requests_total") == 12
+    # The exited worker's counts were archived; its gauge is gone
+    assert set(os.listdir(directory)) == {
+        ".lock",
+        MetricsRegistry.ARCHIVE,
+        os.path.basename(registry._file_path()),
+    }
+    assert sample(text, f'queue_depth{{pid="{os.getpid()}"}}') == 2
+    assert len(re.findall("^queue_depth", text, re.M)) == 1
+
+    requests.inc()
+    assert sample(registry.render(), "requests_total") == 13
@@ -0,0 +1,45 @@
+import re
+
+import main
+from profiling import ProfileStore, StackSampler
+
+
+def test_profile_includes_embedding_pool_and_hides_token(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "PROFILE_TOKEN", "secret")
+    monkeypatch.setattr(main, "profile_store", ProfileStore(str(tmp_path)))
+    # Embedding work happens on the pool, not the request thread
+    monkeypatch.setattr(main.embedding_cache, "get", lambda key: None)
+
+    response = main.app.test_client().post(
+        "/api/goal-alignment?profile=secret",
+        json={"funder_description": "kelp farms", "fundee_description": "seaweed"},
+    )
+    assert response.status_code == 200
+    report = main.profile_store.report(response.headers["X-Profile-Id"])
+
+    assert report.splitlines()[0] == "POST /api/goal-alignment -> 200"
+    assert "secret" not in report
+    assert "tasks on pool threads" in report
+    embedding_ms = float(re.search(r"embedding\s+([\d.]+) ms", report).group(1))
+    assert embedding_ms > 0
+
+
+def test_sampler_covers_embedding_pool(tmp_path, monkeypatch):
+    sampler = StackSampler(str(tmp_path / "stacks.folded"), interval=0.001)
+    monkeypatch.setattr(main, "PROFILE_SAMPLE_EVERY", 1)
+    monkeypatch.setattr(main, "stack_sampler", lambda: sampler)
+    added = []
+    monkeypatch.setattr(
+        sampler,
+        "add",
+        lambda thread_id, add=sampler.add: (added.append(thread_id), add(thread_id)),
+    )
+
+    response = main.app.test_client().post(
+        "/api/goal-alignment",
+        json={"funder_description": "kelp", "fundee_description": "reefs"},
+    )
+    assert response.status_code == 200
+    # The request thread and both embedding tasks were registered, then removed
+    assert len(added) == 3
+    assert sampler.stats()["active_threads"] == 0
@@ -0,0 +1,36 @@
+import pytest
+
+import main
+
+msgpack = pytest.importorskip("msgpack")
+
+BASE_SCORES = {
+    "ids": [1, 2],
+    "total_credits": [100, None],
+    "expected_credits": [80, 0],
+    "amount_invested": [5000, 0],
+}
+
+
+@pytest.mark.parametrize("timings", [False, True])
+def test_msgpack_body_matches_json(timings):
+    client = main.app.test_client()
+    headers = {"X-Timings": "1"} if timings else {}
+    expected = client.post("/api/base-scores", json=BASE_SCORES, headers=headers)
+    response = client.post(
+        "/api/base-scores",
+        data=msgpack.packb(BASE_SCORES),
+        content_type="application/msgpack",
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert response.get_json()["scores"] == expected.get_json()["scores"]
+
+
+def test_missing_body_is_reported_by_the_endpoint():
+    client = main.app.test_client()
+    response = client.post(
+        "/api/base-scores", data=msgpack.packb({}), content_type="application/msgpack"
+    )
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Missing ids"}
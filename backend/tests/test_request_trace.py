@@ -0,0 +1,33 @@
+import logging
+
+import pytest
+
+import main
+
+PAYLOAD = {"total_credits": 100, "expected_credits": 80, "amount_invested": 5000}
+
+
+def traced(caplog, headers):
+    # The API logger does not propagate; at INFO only a trace logs bodies
+    caplog.clear()
+    level = main.logger.level
+    main.logger.setLevel(logging.INFO)
+    main.logger.addHandler(caplog.handler)
+    try:
+        main.app.test_client().post("/api/risk-score", json=PAYLOAD, headers=headers)
+    finally:
+        main.logger.removeHandler(caplog.handler)
+        main.logger.setLevel(level)
+    return any("[DATA] Body received" in r.getMessage() for r in caplog.records)
+
+
+@pytest.mark.parametrize("header", ["1", "true", "", "secret"])
+def test_no_traces_without_a_token(caplog, monkeypatch, header):
+    monkeypatch.setattr(main, "DEBUG_TRACE_TOKEN", None)
+    assert not traced(caplog, {"X-Debug-Trace": header})
+
+
+def test_trace_needs_the_token(caplog, monkeypatch):
+    monkeypatch.setattr(main, "DEBUG_TRACE_TOKEN", "secret")
+    assert not traced(caplog, {"X-Debug-Trace": "1"})
+    assert traced(caplog, {"X-Debug-Trace": "secret"})
@@ -0,0 +1,76 @@
+import random
+
+import numpy as np
+
+from score_matrix import ScoreMatrix
+
+
+def score_block(funders, fundees):
+    a = np.array([[funder["a"], funder["b"]] for funder in funders])
+    b = np.array([[fundee["a"], fundee["b"]] for fundee in fundees])
+    return np.tanh(a @ b.T)
+
+
+def assert_matches_full_recompute(matrix):
+    # Catch up on the log before reading the profiles
+    matrix.load()
+    funders = {i: matrix._funders[i] for i in matrix._funder_ids}
+    fundees = {i: matrix._fundees[i] for i in matrix._fundee_ids}
+    if not funders or not fundees:
+        return
+    full = score_block(list(funders.values()), list(fundees.values()))
+    for r, funder_id in enumerate(funders):
+        for c, fundee_id in enumerate(fundees):
+            assert matrix.score(funder_id, fundee_id) == np.float32(full[r, c])
+
+
+def random_changes(rng, steps):
+    """Upserts of 12 funders and 20 fundees, with updates and removals mixed in"""
+    for _ in range(steps):
+        kind = rng.choice(["funder", "fundee"])
+        item_id = rng.randrange(12 if kind == "funder" else 20)
+        if rng.random() < 0.2:
+            yield "remove", kind, item_id, None
+        else:
+            yield "upsert", kind, item_id, {"a": rng.uniform(-1, 1), "b": rng.random()}
+
+
+def apply(matrix, change):
+    op, kind, item_id, profile = change
+    if op == "remove":
+        getattr(matrix, f"remove_{kind}")(item_id)
+    else:
+        getattr(matrix, f"upsert_{kind}")(item_id, profile)
+
+
+def test_incremental_matches_full_recompute():
+    matrix = ScoreMatrix(score_block, capacity=2)
+    for change in random_changes(random.Random(0), 300):
+        apply(matrix, change)
+        assert_matches_full_recompute(matrix)
+
+    # Only rows and columns were recomputed along the way
+    rows, cols = matrix.shape
+    assert rows and cols
+    assert matrix.cells_computed < 300 * rows * cols
+
+
+def test_instances_sharing_a_log_match_full_recompute(tmp_path):
+    log_path = str(tmp_path / "profiles.log")
+    first = ScoreMatrix(score_block, log_path=log_path, capacity=2)
+    second = ScoreMatrix(score_block, log_path=log_path, capacity=2)
+    rng = random.Random(1)
+    for change in random_changes(rng, 200):
+        apply(rng.choice([first, second]), change)
+        assert_matches_full_recompute(rng.choice([first, second]))
+
+    assert_matches_full_recompute(first)
+    assert_matches_full_recompute(second)
+    for funder_id in first._funder_ids:
+        assert first.top_matches(funder_id, 5) == second.top_matches(funder_id, 5)
+
+    # A process starting later loads the same matrix from the log
+    late = ScoreMatrix(score_block, log_path=log_path)
+    late.load()
+    assert late.shape == first.shape
+    assert_matches_full_recompute(late)
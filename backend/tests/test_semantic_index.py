@@ -0,0 +1,67 @@
+import fcntl
+import threading
+
+import numpy as np
+
+from semantic_index import SemanticIndex
+
+DIMENSIONS = 16
+
+
+def vector(text):
+    rng = np.random.default_rng(abs(hash(text)) % 2**32)
+    return rng.standard_normal(DIMENSIONS).astype(np.float32)
+
+
+def test_fallback_rows_are_embedded_again():
+    index = SemanticIndex()
+    assert index.upsert(1, "kelp", vector("fallback"), fallback=True) == 1
+    assert index.fallback_count() == 1
+    fallback_key = index.key(1)
+
+    # The same description is not skipped while its row is a fallback
+    assert index.upsert(1, "kelp", vector("kelp")) == 1
+    assert index.fallback_count() == 0
+    assert index.key(1) != fallback_key
+    assert index.upsert(1, "kelp", vector("kelp")) == 0
+
+
+def test_replay_embeds_outside_locks(tmp_path):
+    log_path = str(tmp_path / "fundee.log")
+    held = []
+
+    def embed_many(texts):
+        # Neither the other instance's index lock nor the log's file lock
+        # may be held while embedding, which can mean a network call
+        attempt = []
+
+        def try_lock():
+            acquired = reader._lock.acquire(blocking=False)
+            if acquired:
+                reader._lock.release()
+            attempt.append(acquired)
+
+        thread = threading.Thread(target=try_lock)
+        thread.start()
+        thread.join()
+        with open(log_path + ".lock", "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                file_locked = False
+            except BlockingIOError:
+                file_locked = True
+        held.append(not attempt[0] or file_locked)
+        return np.vstack([vector(t) for t in texts]), np.zeros(len(texts), bool)
+
+    writer = SemanticIndex(log_path=log_path, embed_many=embed_many)
+    reader = SemanticIndex(log_path=log_path, embed_many=embed_many)
+    writer.upsert_many((i, f"profile {i}", vector(f"profile {i}")) for i in range(5))
+
+    assert reader.search(vector("profile 3"), 1)[0][0] == 3
+    # Catching up before a write embeds the writer's records first, too
+    writer.upsert(5, "profile 5", vector("profile 5"))
+    reader.upsert(6, "profile 6", vector("profile 6"))
+    assert sorted(reader.ids()) == list(range(7))
+    assert held and not any(held)
+    assert reader._prepared == {}
@@ -0,0 +1,98 @@
+import contextlib
+import contextvars
+import functools
+import threading
+import time
+
+# Timings of the request being handled, None outside /api/* requests. Work
+# submitted to the embedding pool runs in a copy of the request's context,
+# so it records into the same RequestTimings.
+_current = contextvars.ContextVar("request_timings", default=None)
+# Stages already being timed further up the stack, so nested calls of the
+# same stage are not counted twice
+_active = contextvars.ContextVar("active_stages", default=frozenset())
+
+
+class RequestTimings:
+    """Seconds spent per named stage of one request, in first-seen order"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            self._stages[name] = self._stages.get(name, 0.0) + seconds
+
+    def stages(self):
+        with self._lock:
+            return dict(self._stages)
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def as_dict(self):
+        """Stage durations and the total so far in milliseconds, as *_ms keys"""
+        timings = {
+            f"{name.replace('-', '_')}_ms": seconds * 1000
+            for name, seconds in self.stages().items()
+        }
+        timings["total_ms"] = self.elapsed() * 1000
+        return timings
+
+    def server_timing(self):
+        """Server-Timing header value; stages that overlap in time each count in full"""
+        entries = [
+            f"{name};dur={seconds * 1000:.2f}"
+            for name, seconds in self.stages().items()
+        ]
+        entries.append(f"total;dur={self.elapsed() * 1000:.2f}")
+        return ", ".join(entries)
+
+
+def begin_request():
+    timings = RequestTimings()
+    _current.set(timings)
+    _active.set(frozenset())
+    return timings
+
+
+def end_request():
+    _current.set(None)
+
+
+def current():
+    return _current.get()
+
+
+@contextlib.contextmanager
+def stage(name):
+    """Add the time spent in the block to the current request's stage name"""
+    timings = _current.get()
+    active = _active.get()
+    if timings is None or name in active:
+        yield
+        return
+
+    token = _active.set(active | {name})
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+        _active.reset(token)
+
+
+def timed(name):
+    """Decorator recording every call of a function as stage name"""
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
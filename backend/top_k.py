@@ -0,0 +1,24 @@
+import numpy as np
+
+
+def top_indices(scores, k=None):
+    """
+    Indices of the k highest scores, best first.
+
+    Selects the top k with a partial partition and sorts only those, so the
+    cost stays close to linear when k is much smaller than the array. Ties
+    keep their original order.
+
+    Parameters:
+    scores (np.ndarray): 1-D array of scores
+    k (int): How many to return; None for all of them
+
+    Returns:
+    np.ndarray: Up to k indices into scores
+    """
+    n = len(scores)
+    k = n if k is None else max(0, min(int(k), n))
+    if k == 0:
+        return np.array([], dtype=np.intp)
+    top = np.argpartition(-scores, k - 1)[:k] if k < n else np.arange(n)
+    return top[np.argsort(-scores[top], kind="stable")]
@@ -0,0 +1,10 @@
+"""
+Production entry point.
+
+    cd backend && gunicorn wsgi:app
+
+gunicorn picks up gunicorn.conf.py from the working directory.
+"""
+from main import create_app
+
+app = create_app()
@@ -9,6 +9,8 @@ import mcdrRoutes from "./routes/mcdrRoutes.js";
 import uploadRoutes from "./routes/uploadRoutes.js";
 // import { Fundee } from "./models/models.js";
 import { Fundee, Funders } from "./models/models.js";
+import { computeFundeeBaseScores, precomputeBaseScores } from "./jobs/baseScores.js";
+import { syncSearchIndexes } from "./jobs/searchIndexes.js";
 
 import axios from "axios";
 import path from "path";
@@ -59,43 +61,19 @@ sequelize
 
 // call kenny apis
 // called whem fundee signs up
+// goes through the same bulk job as the scheduled run, so the stored
+// base_scores_inputs fingerprint stays in step with the scores
 app.get("/api/calc-base-scores/:id", async (req, res) => {
 	try {
-		const fundee = await Fundee.findByPk(req.params.id);
-		const fundee_reformatted = {
-			expected_credits: fundee.dataValues.expected_credits,
-			amount_invested: fundee.dataValues.current_funding,
-			total_credits: fundee.dataValues.total_credits_issued,
-			fundee_description: fundee.dataValues.company_description,
-			fundee_location: [
-				fundee.dataValues.longitude,
-				fundee.dataValues.latitude,
-			],
-			fundee_needs: fundee.dataValues.current_funding,
-		};
-		const risk_score_data = await axios.post(
-			"http://127.0.0.1:5001/api/risk-score",
-			fundee_reformatted
-		);
-		const efficiency_score_data = await axios.post(
-			"http://127.0.0.1:5001/api/efficiency-score",
-			fundee_reformatted
-		);
-		const impact_score = await axios.post(
-			"http://127.0.0.1:5001/api/impact-score",
-			fundee_reformatted
-		);
-
-		await fundee.update({
-			risk_score: risk_score_data.data.risk_score,
-			efficiency_score: efficiency_score_data.data.efficiency_score,
-			impact_score: impact_score.data.impact_score,
-		});
+		const score = await computeFundeeBaseScores(req.params.id);
+		if (!score) {
+			return res.status(404).json({ error: "Fundee not found" });
+		}
 
 		res.status(200).send([
-			risk_score_data.data,
-			efficiency_score_data.data,
-			impact_score.data,
+			{ success: true, risk_score: score.risk_score },
+			{ success: true, efficiency_score: score.efficiency_score },
+			{ success: true, impact_score: score.impact_score },
 		]);
 	} catch (error) {
 		console.log(error);
@@ -103,6 +81,17 @@ app.get("/api/calc-base-scores/:id", async (req, res) => {
 	}
 });
 
+// recomputes base scores for every fundee whose inputs changed
+app.post("/api/calc-base-scores", async (req, res) => {
+	try {
+		const result = await precomputeBaseScores();
+		res.status(200).json({ success: true, ...result });
+	} catch (error) {
+		console.log(error);
+		res.status(500).json({ error: "Failed to precompute base scores" });
+	}
+});
+
 // //called when funder makes query
 app.post("/api/calc-dynamic-scores", async (req, res) => {
 	const { fundee_id, funder_id, funder_query } = req.body;
@@ -127,23 +116,27 @@ app.post("/api/calc-dynamic-scores", async (req, res) => {
 			fundee_needs: fundee.dataValues.current_funding,
 		};
 
-		const goal_alignment = await axios.post(
-			"http://127.0.0.1:5001/api/goal-alignment",
-			data_reformatted
-		);
-		const location_match = await axios.post(
-			"http://127.0.0.1:5001/api/location-match",
-			data_reformatted
-		);
-		const funding_capability_match = await axios.post(
-			"http://127.0.0.1:5001/api/funding-capability-match",
+		// one round trip for all three scores; the stages run concurrently.
+		// The response keeps the shape of the three separate calls.
+		const { data: dynamic_scores } = await axios.post(
+			"http://127.0.0.1:5001/api/dynamic-scores",
 			data_reformatted
 		);
 
 		res.status(200).send([
-			goal_alignment.data,
-			location_match.data,
-			funding_capability_match.data,
+			{
+				success: true,
+				goal_alignment_score: dynamic_scores.goal_alignment_score,
+			},
+			{
+				success: true,
+				location_match_score: dynamic_scores.location_match_score,
+			},
+			{
+				success: true,
+				funding_capability_match_score:
+					dynamic_scores.funding_capability_match_score,
+			},
 		]);
 	} catch (error) {
 		console.log(error);
@@ -159,6 +152,15 @@ sequelize
 	})
 	.then(() => {
 		console.log("Database synchronized successfully");
+		// Seed the scoring API's search indexes; a failure (API not up yet)
+		// is logged and repaired by `npm run sync-search-indexes`
+		syncSearchIndexes()
+			.then(({ fundees, funders, located }) =>
+				console.log(
+					`Indexed ${fundees} fundees (${located} located) and ${funders} funders for search`
+				)
+			)
+			.catch((err) => console.error("Search index sync failed:", err.message));
 	})
 	.catch((err) => {
 		console.error("Database connection/sync error:", err);
@@ -1,4 +1,6 @@
 import { Fundee } from '../models/models.js';
+import { notifyFundeeChanged, notifyFundeeDeleted } from '../jobs/scoreMatrix.js';
+import { notifyFundeeIndexed, notifyFundeeUnindexed } from '../jobs/searchIndexes.js';
 
 // Get all fundees
 const getAllFundees = async (req, res) => {
@@ -30,6 +32,8 @@ const createFundee = async (req, res) => {
     try {
         const fundee = await Fundee.create(req.body);
         console.log(fundee);
+        notifyFundeeChanged(fundee);
+        notifyFundeeIndexed(fundee);
         res.status(201).json({success: true, data: fundee});
     } catch (error) {
         console.log(error);
@@ -45,6 +49,8 @@ const updateFundee = async (req, res) => {
             return res.status(404).json({ error: 'Fundee not found' });
         }
         await fundee.update(req.body);
+        notifyFundeeChanged(fundee);
+        notifyFundeeIndexed(fundee);
         res.status(200).json({success: true, data: fundee});
     } catch (error) { 
         res.status(500).json({ error: 'Failed to update fundee' });
@@ -59,6 +65,8 @@ const deleteFundee = async (req, res) => {
             return res.status(404).json({ error: 'Fundee not found' });
         }
         await fundee.destroy();
+        notifyFundeeDeleted(fundee.id);
+        notifyFundeeUnindexed(fundee.id);
         res.status(204).json({success: true, message: 'Fundee deleted successfully' });   
     } catch (error) {
         res.status(500).json({ error: 'Failed to delete fundee' });
@@ -1,4 +1,6 @@
 import { Funders } from '../models/models.js';
+import { notifyFunderChanged, notifyFunderDeleted } from '../jobs/scoreMatrix.js';
+import { notifyFunderIndexed, notifyFunderUnindexed } from '../jobs/searchIndexes.js';
 
 const getAllFunders = async (req, res) => {
     try {
@@ -21,6 +23,8 @@ const getFunderById = async (req, res) => {
 const createFunder = async (req, res) => {
     try {
         const funder = await Funders.create(req.body);
+        notifyFunderChanged(funder);
+        notifyFunderIndexed(funder);
         res.status(201).json({success: true, data: funder});
     } catch (error) {
         console.log(error)
@@ -35,6 +39,8 @@ const updateFunder = async (req, res) => {
             return res.status(404).json({ error: 'Funder not found' });
         }
         await funder.update(req.body);
+        notifyFunderChanged(funder);
+        notifyFunderIndexed(funder);
         res.status(200).json({success: true, data: funder});
     } catch (error) {
         res.status(500).json({ error: 'Failed to update funder' });
@@ -48,6 +54,8 @@ const deleteFunder = async (req, res) => {
             return res.status(404).json({ error: 'Funder not found' });
         }
         await funder.destroy();
+        notifyFunderDeleted(funder.id);
+        notifyFunderUnindexed(funder.id);
         res.status(204).json({success: true, message: 'Funder deleted successfully' });
     } catch (error) {
         res.status(500).json({ error: 'Failed to delete funder' });
@@ -0,0 +1,93 @@
+// server/jobs/baseScores.js
+// Precomputes risk, efficiency and impact scores for every fundee in one
+// vectorized call to the Python scoring API and writes back only the rows
+// whose inputs changed since the last run.
+//
+// Run on a schedule with `npm run precompute-base-scores`, or trigger it
+// through POST /api/calc-base-scores.
+import axios from "axios";
+import { fileURLToPath } from "url";
+import { sequelize } from "../config/database.js";
+import { Fundee } from "../models/models.js";
+import { SCORING_API_URL } from "./scoringApi.js";
+
+const BASE_SCORE_ATTRIBUTES = [
+	"id",
+	"total_credits_issued",
+	"expected_credits",
+	"current_funding",
+	"base_scores_inputs",
+];
+
+// Scores the fundees in one call, sent as columns. With force, every row is
+// recomputed; otherwise rows whose stored base_scores_inputs still match
+// are skipped by the API.
+const fetchBaseScores = async (fundees, { force = false } = {}) => {
+	const { data } = await axios.post(`${SCORING_API_URL}/api/base-scores`, {
+		ids: fundees.map((fundee) => fundee.id),
+		total_credits: fundees.map((fundee) => fundee.total_credits_issued),
+		expected_credits: fundees.map((fundee) => fundee.expected_credits),
+		amount_invested: fundees.map((fundee) => fundee.current_funding),
+		previous_inputs: fundees.map((fundee) =>
+			force ? null : fundee.base_scores_inputs
+		),
+	});
+	return data;
+};
+
+// Writes the scores together with the inputs fingerprint, so the next
+// scheduled run skips rows that have not changed since
+const saveBaseScores = (scores) =>
+	sequelize.transaction(async (transaction) => {
+		for (const score of scores) {
+			await Fundee.update(
+				{
+					risk_score: score.risk_score,
+					efficiency_score: score.efficiency_score,
+					impact_score: score.impact_score,
+					base_scores_inputs: score.base_scores_inputs,
+				},
+				{ where: { id: score.id }, transaction }
+			);
+		}
+	});
+
+export const precomputeBaseScores = async () => {
+	const fundees = await Fundee.findAll({
+		attributes: BASE_SCORE_ATTRIBUTES,
+		raw: true,
+	});
+
+	const data = await fetchBaseScores(fundees);
+	await saveBaseScores(data.scores);
+
+	return { total: data.total, recomputed: data.recomputed };
+};
+
+// Recomputes one fundee's base scores whether or not its inputs changed;
+// null when there is no such fundee
+export const computeFundeeBaseScores = async (id) => {
+	const fundee = await Fundee.findByPk(id, {
+		attributes: BASE_SCORE_ATTRIBUTES,
+		raw: true,
+	});
+	if (!fundee) return null;
+
+	const {
+		scores: [score],
+	} = await fetchBaseScores([fundee], { force: true });
+	await saveBaseScores([score]);
+	return score;
+};
+
+if (process.argv[1] === fileURLToPath(import.meta.url)) {
+	precomputeBaseScores()
+		.then(({ total, recomputed }) => {
+			console.log(`Recomputed base scores for ${recomputed} of ${total} fundees`);
+			return sequelize.close();
+		})
+		.catch((error) => {
+			console.error("Base score precomputation failed:", error);
+			process.exit(1);
+		});
+}
@@ -0,0 +1,99 @@
+// server/jobs/scoreMatrix.js
+// Keeps the Python scoring API's funder x fundee score matrix in step with
+// the database. The controllers call the notify* helpers after a create,
+// update or delete, and the API recomputes only that funder's row or that
+// fundee's column.
+//
+// Run `npm run sync-score-matrix` once to load existing rows.
+import axios from "axios";
+import { fileURLToPath } from "url";
+import { sequelize } from "../config/database.js";
+import { Fundee, Funders } from "../models/models.js";
+import { SCORING_API_URL, notifier } from "./scoringApi.js";
+
+const funderProfile = (funder) => ({
+	id: funder.id,
+	funder_description: funder.description,
+	funder_location: [funder.latitude, funder.longitude],
+	funder_capability: funder.avg_investment_size,
+	funding_stages: funder.funding_stages,
+	focus_areas: funder.focus_areas,
+});
+
+const fundeeProfile = (fundee) => ({
+	id: fundee.id,
+	fundee_description: fundee.company_description,
+	fundee_location: [fundee.latitude, fundee.longitude],
+	fundee_needs: fundee.funding_requested,
+	total_credits: fundee.total_credits_issued,
+	expected_credits: fundee.expected_credits,
+	amount_invested: fundee.current_funding,
+	stage: fundee.stage,
+	mcdr_type: fundee.mcdr_type,
+});
+
+const notify = notifier("Score matrix");
+
+export const notifyFunderChanged = (funder) =>
+	notify(
+		() =>
+			axios.post(
+				`${SCORING_API_URL}/api/score-matrix/funder`,
+				funderProfile(funder.get({ plain: true }))
+			),
+		`update for funder ${funder.id}`
+	);
+
+export const notifyFundeeChanged = (fundee) =>
+	notify(
+		() =>
+			axios.post(
+				`${SCORING_API_URL}/api/score-matrix/fundee`,
+				fundeeProfile(fundee.get({ plain: true }))
+			),
+		`update for fundee ${fundee.id}`
+	);
+
+export const notifyFunderDeleted = (id) =>
+	notify(
+		() => axios.delete(`${SCORING_API_URL}/api/score-matrix/funder/${id}`),
+		`delete for funder ${id}`
+	);
+
+export const notifyFundeeDeleted = (id) =>
+	notify(
+		() => axios.delete(`${SCORING_API_URL}/api/score-matrix/fundee/${id}`),
+		`delete for fundee ${id}`
+	);
+
+export const syncScoreMatrix = async () => {
+	const funders = await Funders.findAll({ raw: true });
+	const fundees = await Fundee.findAll({ raw: true });
+
+	for (const funder of funders) {
+		await axios.post(
+			`${SCORING_API_URL}/api/score-matrix/funder`,
+			funderProfile(funder)
+		);
+	}
+	for (const fundee of fundees) {
+		await axios.post(
+			`${SCORING_API_URL}/api/score-matrix/fundee`,
+			fundeeProfile(fundee)
+		);
+	}
+
+	return { funders: funders.length, fundees: fundees.length };
+};
+
+if (process.argv[1] === fileURLToPath(import.meta.url)) {
+	syncScoreMatrix()
+		.then(({ funders, fundees }) => {
+			console.log(`Synced ${funders} funders and ${fundees} fundees to the score matrix`);
+			return sequelize.close();
+		})
+		.catch((error) => {
+			console.error("Score matrix sync failed:", error);
+			process.exit(1);
+		});
+}
@@ -0,0 +1,14 @@
+// server/jobs/scoringApi.js
+// Shared by the jobs that talk to the Python scoring API.
+export const SCORING_API_URL = process.env.SCORING_API_URL || "http://127.0.0.1:5001";
+
+// Notifications never fail the request that triggered them; a missed one is
+// repaired by the next sync. subject names what is being kept in step in
+// the log line, e.g. "Search index".
+export const notifier = (subject) => async (request, description) => {
+	try {
+		await request();
+	} catch (error) {
+		console.log(`${subject} ${description} failed:`, error.message);
+	}
+};
@@ -0,0 +1,118 @@
+// server/jobs/searchIndexes.js
+// Keeps the Python scoring API's search indexes in step with the database:
+// the semantic indexes over fundee and funder descriptions and the radius
+// index over fundee coordinates. The server loads every row once it has
+// connected to the database, and the controllers call the notify* helpers
+// after a create, update or delete.
+//
+// Run `npm run sync-search-indexes` to reload them by hand.
+import axios from "axios";
+import { fileURLToPath } from "url";
+import { sequelize } from "../config/database.js";
+import { Fundee, Funders } from "../models/models.js";
+import { SCORING_API_URL, notifier } from "./scoringApi.js";
+
+const semanticItem = {
+	fundee: (fundee) => ({ id: fundee.id, description: fundee.company_description }),
+	funder: (funder) => ({ id: funder.id, description: funder.description }),
+};
+
+const geoPoint = (fundee) => ({
+	id: fundee.id,
+	latitude: fundee.latitude,
+	longitude: fundee.longitude,
+});
+
+const notify = notifier("Search index");
+
+const notifyChanged = (kind, row) =>
+	notify(
+		() =>
+			axios.post(
+				`${SCORING_API_URL}/api/semantic-index/${kind}`,
+				semanticItem[kind](row.get({ plain: true }))
+			),
+		`update for ${kind} ${row.id}`
+	);
+
+const notifyDeleted = (kind, id) =>
+	notify(async () => {
+		try {
+			await axios.delete(`${SCORING_API_URL}/api/semantic-index/${kind}/${id}`);
+		} catch (error) {
+			// Rows without a description were never indexed
+			if (error.response?.status !== 404) throw error;
+		}
+	}, `delete for ${kind} ${id}`);
+
+// Fundees without coordinates are dropped from the radius index by the API
+const notifyFundeeLocated = (fundee) =>
+	notify(
+		() =>
+			axios.post(`${SCORING_API_URL}/api/geo-index`, {
+				fundees: [geoPoint(fundee.get({ plain: true }))],
+			}),
+		`location update for fundee ${fundee.id}`
+	);
+
+const notifyFundeeUnlocated = (id) =>
+	notify(async () => {
+		try {
+			await axios.delete(`${SCORING_API_URL}/api/geo-index/${id}`);
+		} catch (error) {
+			if (error.response?.status !== 404) throw error;
+		}
+	}, `location delete for fundee ${id}`);
+
+export const notifyFundeeIndexed = (fundee) =>
+	Promise.all([notifyChanged("fundee", fundee), notifyFundeeLocated(fundee)]);
+export const notifyFunderIndexed = (funder) => notifyChanged("funder", funder);
+export const notifyFundeeUnindexed = (id) =>
+	Promise.all([notifyDeleted("fundee", id), notifyFundeeUnlocated(id)]);
+export const notifyFunderUnindexed = (id) => notifyDeleted("funder", id);
+
+// One request per index with every row; the API skips unchanged
+// descriptions and, with replace, drops ids that are no longer in the table
+export const syncSearchIndexes = async () => {
+	const fundees = await Fundee.findAll({
+		attributes: ["id", "company_description", "latitude", "longitude"],
+		raw: true,
+	});
+	const funders = await Funders.findAll({
+		attributes: ["id", "description"],
+		raw: true,
+	});
+
+	const { data: fundeeResult } = await axios.post(
+		`${SCORING_API_URL}/api/semantic-index/fundee`,
+		{ items: fundees.map(semanticItem.fundee), replace: true }
+	);
+	const { data: funderResult } = await axios.post(
+		`${SCORING_API_URL}/api/semantic-index/funder`,
+		{ items: funders.map(semanticItem.funder), replace: true }
+	);
+	const { data: geoResult } = await axios.post(
+		`${SCORING_API_URL}/api/geo-index`,
+		{ fundees: fundees.map(geoPoint), replace: true }
+	);
+
+	return {
+		fundees: fundeeResult.size,
+		funders: funderResult.size,
+		located: geoResult.size,
+	};
+};
+
+if (process.argv[1] === fileURLToPath(import.meta.url)) {
+	syncSearchIndexes()
+		.then(({ fundees, funders, located }) => {
+			console.log(
+				`Indexed ${fundees} fundees (${located} located) and ${funders} funders for search`
+			);
+			return sequelize.close();
+		})
+		.catch((error) => {
+			console.error("Search index sync failed:", error);
+			process.exit(1);
+		});
+}
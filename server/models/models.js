@@ -103,6 +103,11 @@ const Fundee = sequelize.define(
 			type: DataTypes.FLOAT,
 			defaultValue: 0,
 		},
+		// Inputs the stored base scores were computed from (see jobs/baseScores.js)
+		base_scores_inputs: {
+			type: DataTypes.STRING(255),
+			defaultValue: null,
+		},
 	},
 	{
 		timestamps: false,